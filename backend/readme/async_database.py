@@ -0,0 +1,392 @@
+"""Async access to the routing database for `async def` routes.
+
+Writes are serialized through one writer thread fed by a queue, so they never
+contend for the sqlite write lock; reads run concurrently on a small thread
+pool. Each helper mirrors the synchronous one in database.py.
+"""
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import database as db
+
+READ_WORKERS = 4
+
+_write_queue: "queue.Queue" = queue.Queue()
+_writer_thread: Optional[threading.Thread] = None
+_read_pool: Optional[ThreadPoolExecutor] = None
+_start_lock = threading.Lock()
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[BaseException] = None):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+def _writer_loop():
+    """Run queued writes one at a time, in submission order"""
+    while True:
+        item = _write_queue.get()
+        if item is None:
+            break
+        fn, args, kwargs, loop, future = item
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            loop.call_soon_threadsafe(_resolve, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_resolve, future, result)
+
+def start():
+    """Start the writer thread and read pool (idempotent)"""
+    global _writer_thread, _read_pool
+    with _start_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            db.init_db()
+            _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer_thread.start()
+        if _read_pool is None:
+            _read_pool = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-reader")
+
+async def shutdown():
+    """Drain pending writes and stop the worker threads"""
+    global _writer_thread, _read_pool
+    with _start_lock:
+        writer, pool = _writer_thread, _read_pool
+        _writer_thread, _read_pool = None, None
+
+    if writer is not None:
+        _write_queue.put(None)
+        await asyncio.to_thread(writer.join)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+async def _write(fn, *args, **kwargs):
+    start()
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _write_queue.put((fn, args, kwargs, loop, future))
+    return await future
+
+async def _read(fn, *args, **kwargs):
+    start()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_pool, functools.partial(fn, *args, **kwargs))
+
+def write_queue_depth() -> int:
+    """Number of writes waiting for the writer thread"""
+    return _write_queue.qsize()
+
+# ========== BUFFERED RUN WRITES ==========
+
+class BufferedWriter:
+    """Collects one processing run's classification, review-queue, ledger and outbox
+    rows and commits them together with executemany in a single transaction.
+    
+    Flushes once `max_rows` rows are buffered, `max_delay` seconds after the
+    first buffered row, and on close(). Callbacks passed to when_durable() run
+    only after every row buffered before them is committed, so an email is
+    never marked read before its classification is on disk.
+    """
+    
+    def __init__(self, max_rows: int = 50, max_delay: float = 2.0):
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+        self._classifications: List[tuple] = []
+        self._reviews: List[tuple] = []
+        self._steps: List[tuple] = []
+        self._outbox: List[tuple] = []
+        self._after_flush: List[Callable[[], Awaitable[Any]]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+    
+    def _buffered(self) -> int:
+        return len(self._classifications) + len(self._reviews) + len(self._steps) + len(self._outbox)
+    
+    async def _added(self):
+        if self._buffered() >= self.max_rows:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ Timed flush of buffered rows failed: {e}")
+    
+    async def save_classification(self, email_id: str, sender: str, subject: str, content: str,
+                                  categories: str, confidence: float, recipients: str, status: str = "forwarded",
+                                  thread_id: Optional[str] = None, source: str = "llm"):
+        """Buffer a classification row"""
+        self._classifications.append((email_id, sender, subject, content, categories, confidence,
+                                      recipients, status, thread_id, source))
+        await self._added()
+    
+    async def add_to_review_queue(self, email_id: str, sender: str, subject: str, content: str, reason: str):
+        """Buffer a review queue row"""
+        self._reviews.append((email_id, sender, subject, content, reason))
+        await self._added()
+    
+    async def record_step(self, email_id: str, step: str):
+        """Buffer a pipeline ledger row"""
+        self._steps.append((email_id, step))
+        await self._added()
+    
+    async def enqueue_message(self, email_id: str, kind: str, user_email: str, recipient: str, raw: str):
+        """Buffer an outbox message (raw is the base64url message for messages.send)"""
+        self._outbox.append((email_id, kind, user_email, recipient, raw))
+        await self._added()
+    
+    async def when_durable(self, callback: Callable[[], Awaitable[Any]]):
+        """Run `callback()` once everything buffered so far is committed"""
+        if self._buffered() == 0 and not self._lock.locked():
+            await callback()
+            return
+        self._after_flush.append(callback)
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+    
+    async def flush(self):
+        """Commit buffered rows in one transaction, then run the callbacks waiting on them"""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            classifications, reviews, steps, outbox = self._classifications, self._reviews, self._steps, self._outbox
+            callbacks = self._after_flush
+            self._classifications, self._reviews, self._steps, self._outbox, self._after_flush = [], [], [], [], []
+            
+            if classifications or reviews or steps or outbox:
+                try:
+                    await _write(db.save_run_rows, classifications, reviews, steps, outbox)
+                except Exception:
+                    # Keep the rows, ahead of any buffered meanwhile, and their callbacks for the next
+                    # flush; if none succeeds nothing is marked read, so the emails come back next run
+                    self._classifications = classifications + self._classifications
+                    self._reviews = reviews + self._reviews
+                    self._steps = steps + self._steps
+                    self._outbox = outbox + self._outbox
+                    self._after_flush = callbacks + self._after_flush
+                    raise
+        
+        # Outside the lock: callbacks may buffer rows and trigger another flush
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                print(f"⚠️ Post-commit action failed: {e}")
+    
+    async def close(self):
+        """Flush until nothing is left (callbacks may buffer more rows)"""
+        while self._buffered() or self._after_flush:
+            await self.flush()
+
+# ========== CLASSIFICATIONS / REVIEW QUEUE ==========
+
+async def save_classification(email_id: str, sender: str, subject: str, content: str,
+                              categories: str, confidence: float, recipients: str, status: str = "forwarded",
+                              thread_id: Optional[str] = None, source: str = "llm"):
+    """Save email classification to database"""
+    await _write(db.save_classification, email_id, sender, subject, content,
+                 categories, confidence, recipients, status, thread_id, source)
+
+async def add_to_review_queue(email_id: str, sender: str, subject: str, content: str, reason: str):
+    """Add email to review queue for team lead"""
+    await _write(db.add_to_review_queue, email_id, sender, subject, content, reason)
+
+async def get_pending_reviews() -> List[Dict[str, Any]]:
+    """Get all pending reviews from queue"""
+    return await _read(db.get_pending_reviews)
+
+async def get_review(review_id: int) -> Optional[Dict[str, Any]]:
+    """Get a single review queue item"""
+    return await _read(db.get_review, review_id)
+
+async def mark_review_completed(review_id: int):
+    """Mark a review as completed"""
+    await _write(db.mark_review_completed, review_id)
+
+async def get_reviews(review_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Get review queue items by id (missing ids are left out)"""
+    return await _read(db.get_reviews, review_ids)
+
+async def complete_reviews(review_ids: List[int], forwarded_email_ids: List[str], sender_routes: List[tuple]):
+    """Apply a bulk review in one transaction"""
+    await _write(db.complete_reviews, review_ids, forwarded_email_ids, sender_routes)
+
+async def get_classification_history(limit: int = 50) -> List[Dict[str, Any]]:
+    """Get recent classification history"""
+    return await _read(db.get_classification_history, limit)
+
+async def search_emails(query: str, tables: List[str], department: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Full-text search over classifications and/or the review queue, best matches first"""
+    return await _read(db.search_emails, query, tables, department, since, until, limit, offset)
+
+async def get_thread_classifications(thread_id: str, exclude_email_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get earlier classifications in a Gmail thread, newest first"""
+    return await _read(db.get_thread_classifications, thread_id, exclude_email_id)
+
+# ========== TRENDS ==========
+
+async def get_trends(granularity: str, since: datetime, until: datetime,
+                     department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One entry per bucket from `since` up to `until` (UTC), read from the rollups and zero-filled"""
+    return await _read(db.get_trends, granularity, since, until, department)
+
+async def get_department_totals() -> Dict[str, int]:
+    """All-time classified emails per department, summed from the daily rollups"""
+    return await _read(db.get_department_totals)
+
+# ========== RETENTION / ARCHIVE ==========
+
+async def compact_classifications(cutoff: str, limit: int, archive: bool = False) -> int:
+    """Drop the body of up to `limit` classifications created before `cutoff`, keeping metadata"""
+    return await _write(db.compact_classifications, cutoff, limit, archive)
+
+async def purge_reviewed(cutoff: str, limit: int, archive: bool = False) -> int:
+    """Delete up to `limit` reviewed review-queue items created before `cutoff`"""
+    return await _write(db.purge_reviewed, cutoff, limit, archive)
+
+async def incremental_vacuum() -> int:
+    """Return free pages to the filesystem; returns how many pages were freed"""
+    return await _write(db.incremental_vacuum)
+
+async def incremental_vacuum_enabled() -> bool:
+    return await _read(db.incremental_vacuum_enabled)
+
+async def convert_to_incremental_vacuum() -> bool:
+    """One-off full VACUUM on the writer thread; every other write waits until it finishes"""
+    return await _write(db.convert_to_incremental_vacuum)
+
+async def list_archive_months() -> List[str]:
+    """Months that have an archive database, newest first"""
+    return await _read(db.list_archive_months)
+
+async def get_archived_history(month: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Get classifications from a month's archive database"""
+    return await _read(db.get_archived_history, month, limit)
+
+# ========== OUTBOX ==========
+
+async def claim_outbox(limit: int, lease_seconds: float, max_attempts: int) -> List[Dict[str, Any]]:
+    """Claim up to `limit` due messages for sending, oldest first"""
+    return await _write(db.claim_outbox, limit, lease_seconds, max_attempts)
+
+async def finish_outbox(sent_ids: List[int], retries: List[tuple], dead: List[tuple]):
+    """Record a send round: sent ids, (id, error, next_attempt_at) retries and (id, error) dead letters"""
+    await _write(db.finish_outbox, sent_ids, retries, dead)
+
+async def get_outbox_stats() -> Dict[str, Any]:
+    """Message counts per status, the age of the oldest unsent message and the latest dead letters"""
+    return await _read(db.get_outbox_stats)
+
+async def retry_dead_outbox() -> int:
+    """Put every dead-lettered message back in the queue"""
+    return await _write(db.retry_dead_outbox)
+
+async def purge_sent_outbox(cutoff: str, limit: int) -> int:
+    """Delete up to `limit` messages sent before `cutoff`"""
+    return await _write(db.purge_sent_outbox, cutoff, limit)
+
+# ========== SENDER ROUTES ==========
+
+async def get_sender_routes() -> List[Dict[str, Any]]:
+    """Get all learned sender/domain -> department counts"""
+    return await _read(db.get_sender_routes)
+
+async def record_sender_routes(route_keys: List[str], department: str, weight: float = 1.0):
+    """Add `weight` observations of `department` for each sender/domain key"""
+    await _write(db.record_sender_routes, route_keys, department, weight)
+
+async def add_sender_routes(rows: List[tuple]):
+    """Add many (route_key, department, weight) observations in one transaction"""
+    await _write(db.add_sender_routes, rows)
+
+async def get_learnable_classifications(min_confidence: float) -> List[Dict[str, Any]]:
+    """Get confident LLM decisions, used to backfill sender_routes"""
+    return await _read(db.get_learnable_classifications, min_confidence)
+
+# ========== SENDER PRIORITIES ==========
+
+async def get_sender_priorities() -> List[Dict[str, Any]]:
+    """Get the sender importance table"""
+    return await _read(db.get_sender_priorities)
+
+async def add_sender_priority(pattern: str, weight: int) -> int:
+    """Add or update an important sender address or '@domain'"""
+    return await _write(db.add_sender_priority, pattern, weight)
+
+async def delete_sender_priority(priority_id: int):
+    """Remove a sender from the importance table"""
+    await _write(db.delete_sender_priority, priority_id)
+
+# ========== PIPELINE LEDGER ==========
+
+async def get_pipeline_progress(email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get finished steps and the saved classification for a batch of emails in one query"""
+    return await _read(db.get_pipeline_progress, email_ids)
+
+async def record_step(email_id: str, step: str):
+    """Mark one pipeline step as done for an email"""
+    await _write(db.record_step, email_id, step)
+
+# ========== EMAIL CLAIMS ==========
+
+async def claim_emails(email_ids: List[str], owner: str, lease_seconds: float) -> List[str]:
+    """Lease unclaimed or expired emails to `owner`; returns the ids `owner` now holds"""
+    return await _write(db.claim_emails, email_ids, owner, lease_seconds)
+
+async def renew_claims(owner: str, lease_seconds: float) -> int:
+    """Extend every lease held by `owner`; returns how many are still held"""
+    return await _write(db.renew_claims, owner, lease_seconds)
+
+async def release_claims(owner: str):
+    """Drop every lease held by `owner`"""
+    await _write(db.release_claims, owner)
+
+# ========== OAUTH TOKENS ==========
+
+async def save_oauth_token(user_email: str, access_token: str, refresh_token: str, token_expiry: str):
+    """Save OAuth tokens for user"""
+    await _write(db.save_oauth_token, user_email, access_token, refresh_token, token_expiry)
+
+async def get_oauth_token(user_email: str) -> Optional[Dict[str, Any]]:
+    """Get stored OAuth tokens for user"""
+    return await _read(db.get_oauth_token, user_email)
+
+# ========== TEAM MEMBERS ==========
+
+async def get_team_members() -> List[Dict[str, Any]]:
+    """Get all team members"""
+    return await _read(db.get_team_members)
+
+async def get_all_team_members() -> List[Dict[str, Any]]:
+    """Alias for get_team_members() - used by dashboard.py"""
+    return await _read(db.get_all_team_members)
+
+async def add_team_member(name: str, email: str, department: str) -> int:
+    """Add a new team member"""
+    return await _write(db.add_team_member, name, email, department)
+
+async def update_team_member(member_id: int, name: str, email: str, department: str):
+    """Update team member"""
+    await _write(db.update_team_member, member_id, name, email, department)
+
+async def delete_team_member(member_id: int):
+    """Delete team member"""
+    await _write(db.delete_team_member, member_id)
+
+async def get_team_members_by_department() -> Dict[str, List[Dict[str, Any]]]:
+    """Get team members grouped by department"""
+    return await _read(db.get_team_members_by_department)
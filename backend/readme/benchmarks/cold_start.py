@@ -0,0 +1,112 @@
+"""Cold-start budget check: time from process spawn to the first `/health` response.
+
+Each sample spawns a fresh interpreter that imports `main`, runs the ASGI
+lifespan startup and serves one `GET /health` through a minimal in-process ASGI
+driver (no server, no extra dependencies). Exits non-zero when the median
+exceeds the budget, so it can gate deploys.
+
+Usage (from backend/readme):
+    python -m benchmarks.cold_start --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.profile_imports import BACKEND_DIR, BENCH_ENV, LAZY_MODULES
+
+CHILD = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_health():
+    app = main.app
+    lifespan_in, lifespan_out = asyncio.Queue(), asyncio.Queue()
+    await lifespan_in.put({"type": "lifespan.startup"})
+    lifespan = asyncio.create_task(app(
+        {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+        lifespan_in.get, lifespan_out.put,
+    ))
+    started = await lifespan_out.get()
+    assert started["type"] == "lifespan.startup.complete", started
+
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    await app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/health", "raw_path": b"/health",
+        "root_path": "", "query_string": b"", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 80), "state": {},
+    }, receive, send)
+
+    await lifespan_in.put({"type": "lifespan.shutdown"})
+    await lifespan
+    return messages[0]["status"]
+
+status = asyncio.run(first_health())
+done = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (done - imported) * 1000,
+    "lazy_loaded": [m for m in LAZY_MODULES if m in sys.modules],
+}))
+"""
+
+
+def sample() -> dict:
+    env = {**BENCH_ENV, **os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    code = f"LAZY_MODULES = {LAZY_MODULES!r}\n{CHILD}"
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                                   capture_output=True, text=True, check=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500,
+                        help="median spawn-to-first-/health budget in milliseconds")
+    args = parser.parse_args(argv)
+
+    samples = [sample() for _ in range(args.runs)]
+    wall = [s["wall_ms"] for s in samples]
+    median = statistics.median(wall)
+
+    for s in samples:
+        print(f"  wall {s['wall_ms']:7.1f}ms  import main {s['import_ms']:7.1f}ms  "
+              f"lifespan+/health {s['first_response_ms']:6.1f}ms  status {s['status']}")
+    print(f"\nmedian {median:.1f}ms, max {max(wall):.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    if any(s["status"] != 200 for s in samples):
+        failures.append("/health did not return 200")
+    eager = sorted({m for s in samples for m in s["lazy_loaded"]})
+    if eager:
+        failures.append(f"heavy SDKs loaded before first use: {', '.join(eager)}")
+    if median > args.budget_ms:
+        failures.append(f"median cold start {median:.1f}ms exceeds budget {args.budget_ms:.0f}ms")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
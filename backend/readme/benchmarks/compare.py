@@ -0,0 +1,44 @@
+"""Compare two benchmark result files, e.g. before and after a commit.
+
+Usage (from backend/readme):
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+"""
+import json
+import sys
+from pathlib import Path
+
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "   n/a"
+    change = (after - before) / before * 100
+    return f"{change:+6.1f}%"
+
+
+def compare(base: dict, head: dict):
+    print(f"base {base['commit']} ({base['timestamp']})  →  head {head['commit']} ({head['timestamp']})")
+
+    for mode in sorted(set(base["results"]) & set(head["results"])):
+        old, new = base["results"][mode], head["results"][mode]
+        print(f"\n{mode}")
+        for key in ("emails_per_minute", "elapsed_s", "peak_rss_mb", "gemini_calls", "routing_accuracy"):
+            print(f"  {key:<20} {old.get(key, 0):>10} → {new.get(key, 0):>10}  {_delta(old.get(key, 0), new.get(key, 0))}")
+
+        for stage in sorted(set(old["stages"]) | set(new["stages"])):
+            a = old["stages"].get(stage, {"p50_ms": 0, "p95_ms": 0})
+            b = new["stages"].get(stage, {"p50_ms": 0, "p95_ms": 0})
+            print(f"  {stage:<12} p50 {a['p50_ms']:>9.2f} → {b['p50_ms']:>9.2f}ms {_delta(a['p50_ms'], b['p50_ms'])}"
+                  f"   p95 {a['p95_ms']:>9.2f} → {b['p95_ms']:>9.2f}ms {_delta(a['p95_ms'], b['p95_ms'])}")
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print(__doc__)
+        sys.exit(2)
+    base, head = (json.loads(Path(p).read_text()) for p in argv)
+    compare(base, head)
+
+
+if __name__ == "__main__":
+    main()
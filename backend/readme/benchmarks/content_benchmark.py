@@ -0,0 +1,225 @@
+"""Content preparation micro-benchmark: how much of each email reaches the classifier prompt.
+
+Builds a corpus of real-world-shaped emails: the end-to-end corpus (plain,
+multipart/alternative, nested multipart/mixed and HTML-only messages with
+quoted replies and signatures), plus Outlook reply chains, Gmail HTML replies
+with a gmail_quote block, forwards, mobile replies and HTML-only mail nested
+in multipart/related with tracking links. Quoted history is about another
+department's topic, as it often is in a long thread. Each body is decoded
+with `get_email_body()` and then prepared three ways:
+
+- raw: the decoded body as-is (what the classifier used to be sent)
+- legacy: `clean_email_content()` then `truncate_content()`
+- prepared: `classifier_service.prepare_content()`
+
+Reports per-email p50/p95 time, estimated tokens per email and the share of
+emails where a keyword scorer still finds the expected department in the
+text, a proxy for how much routing signal survives.
+
+Usage (from backend/readme):
+    python -m benchmarks.content_benchmark --emails 2000
+    python -m benchmarks.content_benchmark --budget-tokens 200 --tail-tokens 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SHAPES = ["corpus", "outlook_chain", "gmail_html_reply", "forward", "mobile_reply", "nested_html"]
+
+
+def _quoted_history(rng: random.Random, topic: str, person: dict, levels: int) -> str:
+    from benchmarks.corpus import _plain_body
+
+    return "\n\n".join(_plain_body(rng, topic, rng.randint(600, 1500), person) for _ in range(levels))
+
+
+def _outlook_chain(rng, text, other_topic, person, sender) -> str:
+    history = _quoted_history(rng, other_topic, person, rng.randint(2, 4))
+    return (f"{text}\n\n________________________________\n"
+            f"From: {person['name']} <{person['email']}>\nSent: Monday, January 8, 2024 9:14 AM\n"
+            f"To: {sender['name']} <{sender['email']}>\nSubject: RE: {other_topic}\n\n{history}")
+
+
+def _gmail_html_reply(rng, text, other_topic, person, sender) -> str:
+    from benchmarks.corpus import _html_body
+
+    history = _html_body(_quoted_history(rng, other_topic, person, rng.randint(1, 3)))
+    return _html_body(text).replace(
+        "</body>",
+        f'<div class="gmail_quote"><div dir="ltr" class="gmail_attr">On Mon, Jan 8, 2024 at 9:14 AM '
+        f'{person["name"]} &lt;{person["email"]}&gt; wrote:<br></div>'
+        f'<blockquote class="gmail_quote" style="margin:0 0 0 .8ex;border-left:1px #ccc solid">'
+        f'{history}</blockquote></div></body>')
+
+
+def _forward(rng, text, other_topic, person, sender) -> str:
+    return (f"FYI, see below. Can someone pick this up?\n\n---------- Forwarded message ---------\n"
+            f"From: {sender['name']} <{sender['email']}>\nDate: Mon, Jan 8, 2024 at 9:14 AM\n"
+            f"Subject: {other_topic}\nTo: <inbox@company.com>\n\n{text}")
+
+
+def _mobile_reply(rng, text, other_topic, person, sender) -> str:
+    history = "\n".join(f"> {line}" for line in _quoted_history(rng, other_topic, person, 1).splitlines())
+    return (f"{text.split(chr(10) + '--' + chr(10))[0]}\n\nSent from my iPhone\n\n"
+            f"On Jan 8, 2024, at 9:14 AM, {person['name']} <{person['email']}> wrote:\n\n{history}")
+
+
+def _nested_html(rng, text, other_topic, person, sender) -> str:
+    tracked = " ".join(
+        f'<a href="https://click.mail.example.com/ls/click?upn={rng.getrandbits(256):064x}">{word}</a>'
+        if i % 12 == 0 else word for i, word in enumerate(text.split(" ")))
+    return ('<html><head><style>td { font-family: Helvetica; } .btn { color: #fff; }</style>'
+            '<script>var tracking = true;</script></head><body><table><tr><td>'
+            + "".join(f'<p style="margin:0">{p}</p>' for p in tracked.split("\n\n"))
+            + '<img src="cid:logo@company" width="1" height="1"></td></tr></table></body></html>')
+
+
+BUILDERS: Dict[str, Callable] = {
+    "outlook_chain": _outlook_chain,
+    "gmail_html_reply": _gmail_html_reply,
+    "forward": _forward,
+    "mobile_reply": _mobile_reply,
+    "nested_html": _nested_html,
+}
+
+
+def _payload(shape: str, body: str) -> dict:
+    """Wrap a body in the MIME structure each shape arrives in"""
+    from benchmarks.corpus import _part
+
+    if shape == "nested_html":
+        # HTML-only, inside multipart/related inside multipart/mixed
+        return {"mimeType": "multipart/mixed", "body": {"size": 0}, "parts": [
+            {"mimeType": "multipart/related", "body": {"size": 0}, "parts": [
+                _part("text/html", body), _part("image/png", filename="logo.png", size=4_096)]},
+            _part("application/pdf", filename="statement.pdf", size=120_000)]}
+    if shape == "gmail_html_reply":
+        return _part("text/html", body)
+    return {"mimeType": "multipart/alternative", "body": {"size": 0}, "parts": [_part("text/plain", body)]}
+
+
+def build_corpus(count: int, seed: int) -> List[Tuple[str, str, dict]]:
+    """(shape, expected department, Gmail payload) for `count` emails, half of them from the end-to-end corpus"""
+    from benchmarks.corpus import DEPARTMENT_TOPICS, _person, _plain_body, generate_corpus
+
+    rng = random.Random(seed)
+    emails = [("corpus", m["_expected_department"], m["payload"])
+              for m in generate_corpus(count // 2, seed=seed, duplicate_ratio=0)]
+    while len(emails) < count:
+        shape = rng.choice(SHAPES[1:])
+        department, other = rng.sample(list(DEPARTMENT_TOPICS), 2)
+        topic, other_topic = rng.choice(DEPARTMENT_TOPICS[department]), rng.choice(DEPARTMENT_TOPICS[other])
+        sender, person = _person(rng), _person(rng)
+        text = _plain_body(rng, topic, max(200, int(rng.lognormvariate(0, 0.6) * 1200)), sender)
+        emails.append((shape, department, _payload(shape, BUILDERS[shape](rng, text, other_topic, person, sender))))
+    rng.shuffle(emails)
+    return emails
+
+
+def keyword_department(text: str) -> Optional[str]:
+    """Department whose topics the text mentions most, as the fake Gemini would route it"""
+    from benchmarks.corpus import DEPARTMENT_TOPICS
+
+    text = text.lower()
+    hits = {dept: sum(text.count(topic) for topic in topics) for dept, topics in DEPARTMENT_TOPICS.items()}
+    best = max(hits, key=hits.get)
+    return best if hits[best] else None
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(name: str, prepare: Callable[[str], str], bodies: List[str], expected: List[str]) -> dict:
+    from utils.email_parser import estimate_tokens
+
+    timings, tokens, kept_signal = [], [], 0
+    for body, department in zip(bodies, expected):
+        start = time.perf_counter()
+        text = prepare(body)
+        timings.append(time.perf_counter() - start)
+        tokens.append(estimate_tokens(text))
+        kept_signal += keyword_department(text) == department
+    return {
+        "strategy": name,
+        "p50_us": round(percentile(timings, 50) * 1e6, 1),
+        "p95_us": round(percentile(timings, 95) * 1e6, 1),
+        "emails_per_s": round(len(bodies) / sum(timings)) if sum(timings) else None,
+        "mean_tokens": round(statistics.mean(tokens), 1),
+        "p95_tokens": percentile(tokens, 95),
+        "max_tokens": max(tokens),
+        "keyword_agreement": round(kept_signal / len(bodies), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--budget-tokens", type=int, default=None, help="CLASSIFY_CONTENT_TOKENS (default: config)")
+    parser.add_argument("--tail-tokens", type=int, default=None, help="CLASSIFY_CONTENT_TAIL_TOKENS (default: config)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    for key, value in {
+        "GOOGLE_CLIENT_ID": "bench-client-id.apps.googleusercontent.com",
+        "GOOGLE_CLIENT_SECRET": "bench-secret",
+        "GEMINI_API_KEY": "bench-key",
+        "TEAM_LEAD_EMAIL": "lead@company.com",
+    }.items():
+        os.environ.setdefault(key, value)
+    if args.budget_tokens is not None:
+        os.environ["CLASSIFY_CONTENT_TOKENS"] = str(args.budget_tokens)
+    if args.tail_tokens is not None:
+        os.environ["CLASSIFY_CONTENT_TAIL_TOKENS"] = str(args.tail_tokens)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from services import classifier_service
+    from services.gmail_service import get_email_body
+    from utils.email_parser import clean_email_content, truncate_content
+
+    corpus = build_corpus(args.emails, args.seed)
+    start = time.perf_counter()
+    bodies = [get_email_body(payload) for _, _, payload in corpus]
+    decode_s = time.perf_counter() - start
+    expected = [department for _, department, _ in corpus]
+
+    strategies = {
+        "raw": lambda body: body,
+        "legacy": lambda body: truncate_content(clean_email_content(body)),
+        "prepared": classifier_service.prepare_content,
+    }
+    results = [measure(name, prepare, bodies, expected) for name, prepare in strategies.items()]
+
+    shapes = {shape: sum(1 for s, _, _ in corpus if s == shape) for shape in SHAPES}
+    print(f"{len(corpus)} emails ({', '.join(f'{s} {n}' for s, n in shapes.items())}); "
+          f"decoded in {decode_s * 1000:.0f} ms")
+    print(f"budget {classifier_service.settings.CLASSIFY_CONTENT_TOKENS} tokens, "
+          f"tail {classifier_service.settings.CLASSIFY_CONTENT_TAIL_TOKENS}")
+    print(f"{'strategy':10} {'p50 us':>8} {'p95 us':>8} {'emails/s':>10} {'mean tok':>9} "
+          f"{'p95 tok':>8} {'max tok':>8} {'keyword agreement':>18}")
+    for r in results:
+        print(f"{r['strategy']:10} {r['p50_us']:>8} {r['p95_us']:>8} {r['emails_per_s']:>10} {r['mean_tokens']:>9} "
+              f"{r['p95_tokens']:>8} {r['max_tokens']:>8} {r['keyword_agreement']:>18.1%}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "emails": len(corpus),
+            "shapes": shapes,
+            "budget_tokens": classifier_service.settings.CLASSIFY_CONTENT_TOKENS,
+            "tail_tokens": classifier_service.settings.CLASSIFY_CONTENT_TAIL_TOKENS,
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Synthetic email corpus shaped like Gmail API `messages.get(format='full')` resources"""
+import base64
+import random
+import time
+import zlib
+from typing import Dict, List, Optional
+
+DEPARTMENT_TOPICS = {
+    "Finance": [
+        "invoice", "payment", "billing", "refund", "receipt", "accounting", "purchase order",
+    ],
+    "HR": [
+        "job application", "resume", "interview", "onboarding", "payroll", "leave request",
+    ],
+    "Marketing": [
+        "campaign", "brand", "social media", "press release", "advertising", "newsletter",
+    ],
+    "Support": [
+        "cannot log in", "error message", "bug", "not working", "help with", "complaint",
+    ],
+    "Business": [
+        "partnership", "proposal", "pricing", "contract", "enterprise plan", "quote",
+    ],
+}
+
+# Vendors, recruiters and other senders that always land in the same department
+STABLE_SENDERS = [
+    ("Paystream Billing", "billing@paystream.com", "Finance"),
+    ("SupplyHub Invoices", "invoices@supplyhub.net", "Finance"),
+    ("Hirewell Talent", "talent@hirewell.io", "HR"),
+    ("RecruitCo Jobs", "jobs@recruitco.com", "HR"),
+    ("StatusWatch", "alerts@statuswatch.io", "Support"),
+    ("BizDev Partners", "partners@bizdev.co", "Business"),
+    ("AdAgency News", "news@adagency.com", "Marketing"),
+]
+
+# Newsletters, notifications, bounces and auto-replies: (name, address, headers, labels, subject)
+AUTOMATED_SENDERS = [
+    ("Industry Weekly", "newsletter@industryweekly.com",
+     [("List-Unsubscribe", "<mailto:unsubscribe@industryweekly.com>"), ("Precedence", "bulk")],
+     ["CATEGORY_PROMOTIONS"], "This week in your industry"),
+    ("SaaS Tool", "noreply@saastool.io", [("Auto-Submitted", "auto-generated")],
+     ["CATEGORY_UPDATES"], "Your weekly usage report"),
+    ("Mail Delivery Subsystem", "mailer-daemon@googlemail.com", [("Return-Path", "<>")],
+     [], "Delivery Status Notification (Failure)"),
+    ("Out Of Office", "j.doe@partnerfirm.com", [("Auto-Submitted", "auto-replied"), ("X-Autoreply", "yes")],
+     [], "Automatic reply: your message"),
+    ("Dev Forum", "forum@devcommunity.org", [("List-Id", "<general.devcommunity.org>")],
+     ["CATEGORY_FORUMS"], "New replies in threads you follow"),
+]
+
+FIRST_NAMES = ["Alice", "Bob", "Carla", "Deepak", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas"]
+LAST_NAMES = ["Smith", "Khan", "Garcia", "Novak", "Okafor", "Tanaka", "Muller", "Rossi", "Silva", "Chen"]
+DOMAINS = ["acme.com", "globex.io", "initech.net", "umbrella.org", "example.co", "gmail.com"]
+
+SIGNATURE = """
+--
+{name}
+{title} | {company}
+Phone: +1 555 {phone}
+This email and any attachments are confidential and intended solely for the addressee.
+"""
+
+QUOTED_REPLY = """
+On Mon, Jan 8, 2024 at 9:14 AM {other} <{other_email}> wrote:
+> Thanks for getting back to us so quickly.
+> {quoted}
+>
+> > Earlier message in the chain with more context about the {topic}.
+> > Please let us know if anything else is needed.
+"""
+
+FILLER_WORDS = (
+    "please review the attached details regarding our recent conversation and let me know "
+    "if you need anything further from our side before we can move forward with the next steps"
+).split()
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def _sentence(rng: random.Random, topic: str, words: int) -> str:
+    body = [rng.choice(FILLER_WORDS) for _ in range(words)]
+    body.insert(rng.randrange(len(body) + 1), topic)
+    return " ".join(body).capitalize() + "."
+
+
+def _plain_body(rng: random.Random, topic: str, size: int, person: dict) -> str:
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = " ".join(_sentence(rng, topic, rng.randint(8, 20)) for _ in range(rng.randint(2, 5)))
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+
+    text = "Hello team,\n\n" + "\n\n".join(paragraphs)
+
+    if rng.random() < 0.4:
+        other = rng.choice(FIRST_NAMES)
+        text += QUOTED_REPLY.format(
+            other=other,
+            other_email=f"{other.lower()}@company.com",
+            quoted=_sentence(rng, topic, 10),
+            topic=topic,
+        )
+
+    if rng.random() < 0.7:
+        text += SIGNATURE.format(
+            name=person["name"],
+            title=rng.choice(["Account Manager", "Director", "Engineer", "Recruiter"]),
+            company=person["domain"].split(".")[0].title(),
+            phone=rng.randint(1000, 9999),
+        )
+
+    return text
+
+
+def _html_body(text: str) -> str:
+    paragraphs = "".join(f"<p>{p.replace(chr(10), '<br>')}</p>" for p in text.split("\n\n"))
+    return (
+        "<html><head><style>p { margin: 0 0 1em; font-family: Arial; }</style></head>"
+        f"<body><div dir=\"ltr\">{paragraphs}</div></body></html>"
+    )
+
+
+def _part(mime_type: str, text: Optional[str] = None, filename: str = "", size: int = 0) -> dict:
+    part = {"mimeType": mime_type, "filename": filename, "headers": [], "body": {"size": size}}
+    if text is not None:
+        data = _b64(text)
+        part["body"] = {"size": len(text), "data": data}
+    else:
+        part["body"]["attachmentId"] = f"ANGjdJ{zlib.crc32(f'{filename}:{size}'.encode()):08x}"
+    return part
+
+
+def _payload(rng: random.Random, text: str, headers: List[dict]) -> dict:
+    """Pick one of the MIME shapes Gmail commonly returns"""
+    shape = rng.choices(
+        ["plain", "alternative", "mixed", "html_only"],
+        weights=[0.3, 0.4, 0.2, 0.1],
+    )[0]
+
+    if shape == "plain":
+        payload = _part("text/plain", text)
+    elif shape == "alternative":
+        payload = {
+            "mimeType": "multipart/alternative",
+            "body": {"size": 0},
+            "parts": [_part("text/plain", text), _part("text/html", _html_body(text))],
+        }
+    elif shape == "mixed":
+        payload = {
+            "mimeType": "multipart/mixed",
+            "body": {"size": 0},
+            "parts": [
+                {
+                    "mimeType": "multipart/alternative",
+                    "body": {"size": 0},
+                    "parts": [_part("text/plain", text), _part("text/html", _html_body(text))],
+                },
+                _part("application/pdf", filename="document.pdf", size=rng.randint(20_000, 400_000)),
+            ],
+        }
+    else:
+        payload = _part("text/html", _html_body(text))
+
+    payload["headers"] = headers
+    return payload
+
+
+def _message(rng: random.Random, index: int, department: str, topic: str,
+             size: int, person: dict, thread_id: str, subject: str) -> dict:
+    text = _plain_body(rng, topic, size, person)
+    labels = ["UNREAD", "INBOX"]
+    if rng.random() < 0.1:
+        labels.append("IMPORTANT")
+    if department == "Marketing" and rng.random() < 0.5:
+        labels.append("CATEGORY_UPDATES")
+    if rng.random() < 0.08:
+        subject = f"URGENT: {subject}"
+    headers = [
+        {"name": "From", "value": f"{person['name']} <{person['email']}>"},
+        {"name": "To", "value": "inbox@company.com"},
+        {"name": "Subject", "value": subject},
+        {"name": "Date", "value": f"Mon, 8 Jan 2024 {index % 24:02d}:{index % 60:02d}:00 +0000"},
+        {"name": "Message-ID", "value": f"<{index}.{rng.randint(0, 10**9)}@{person['domain']}>"},
+    ]
+    return {
+        "id": f"msg{index:06d}",
+        "threadId": thread_id,
+        "labelIds": labels,
+        "internalDate": str(int((time.time() - rng.uniform(0, 36 * 3600)) * 1000)),
+        "snippet": text[:100],
+        "sizeEstimate": len(text),
+        "payload": _payload(rng, text, headers),
+        # Not part of the Gmail resource; lets reports check routing accuracy
+        "_expected_department": department,
+    }
+
+
+def _automated_message(rng: random.Random, index: int, mean_size: int) -> dict:
+    """Mail no person wrote, which should never reach the classifier or get a reply"""
+    name, email, extra_headers, extra_labels, subject = rng.choice(AUTOMATED_SENDERS)
+    person = {"name": name, "email": email, "domain": email.split("@")[1]}
+    size = max(200, int(rng.lognormvariate(0, 0.6) * mean_size))
+    message = _message(rng, index, "Marketing", "newsletter", size, person, f"thr{index:06d}", subject)
+    message["payload"]["headers"] += [{"name": n, "value": v} for n, v in extra_headers]
+    message["labelIds"] = ["UNREAD", "INBOX"] + extra_labels
+    message["_expected_department"] = None
+    return message
+
+
+def _person(rng: random.Random) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    domain = rng.choice(DOMAINS)
+    return {
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}@{domain}",
+        "domain": domain,
+    }
+
+
+def generate_corpus(count: int, seed: int = 42, duplicate_ratio: float = 0.15,
+                    reply_ratio: float = 0.2, mean_size: int = 1500,
+                    repeat_sender_ratio: float = 0.25, automated_ratio: float = 0.0) -> List[Dict]:
+    """Generate `count` unread Gmail messages.
+
+    `duplicate_ratio` of the messages are re-sends of an earlier message with a
+    different timestamp line (monitoring alerts, form letters), and `reply_ratio`
+    are follow-ups in an existing thread. `repeat_sender_ratio` of new threads
+    come from a small pool of senders that always map to one department. Body
+    sizes follow a long-tailed distribution around `mean_size` characters.
+    `automated_ratio` of the messages are bulk or automated mail (mailing
+    lists, noreply notifications, bounces, out-of-office replies) with no
+    expected department.
+    """
+    rng = random.Random(seed)
+    messages: List[Dict] = []
+    # Duplicates and replies only build on mail a person wrote
+    written: List[Dict] = []
+
+    for index in range(count):
+        if automated_ratio and rng.random() < automated_ratio:
+            messages.append(_automated_message(rng, index, mean_size))
+            continue
+
+        roll = rng.random()
+
+        if written and roll < duplicate_ratio:
+            original = rng.choice(written)
+            duplicate = _clone_with_timestamp(original, index, rng)
+            messages.append(duplicate)
+            written.append(duplicate)
+            continue
+
+        if written and roll < duplicate_ratio + reply_ratio:
+            original = rng.choice(written)
+            department = original["_expected_department"]
+            subject = "Re: " + _header(original, "Subject").removeprefix("Re: ")
+            person = {
+                "name": _header(original, "From").split(" <")[0],
+                "email": _header(original, "From").split("<")[-1].rstrip(">"),
+            }
+            person["domain"] = person["email"].split("@")[-1]
+            topic = rng.choice(DEPARTMENT_TOPICS[department])
+            size = max(200, int(rng.lognormvariate(0, 0.6) * mean_size))
+            messages.append(_message(rng, index, department, topic, size, person,
+                                     original["threadId"], subject))
+            written.append(messages[-1])
+            continue
+
+        if rng.random() < repeat_sender_ratio:
+            name, email, department = rng.choice(STABLE_SENDERS)
+            person = {"name": name, "email": email, "domain": email.split("@")[1]}
+        else:
+            department = rng.choice(list(DEPARTMENT_TOPICS))
+            person = _person(rng)
+        topic = rng.choice(DEPARTMENT_TOPICS[department])
+        size = max(200, int(rng.lognormvariate(0, 0.6) * mean_size))
+        subject = f"{topic.title()} - ref {rng.randint(1000, 99999)}"
+        messages.append(_message(rng, index, department, topic, size, person,
+                                 f"thr{index:06d}", subject))
+        written.append(messages[-1])
+
+    return messages
+
+
+def _header(message: dict, name: str) -> str:
+    return next((h["value"] for h in message["payload"]["headers"] if h["name"] == name), "")
+
+
+def _clone_with_timestamp(original: dict, index: int, rng: random.Random) -> dict:
+    """Copy a message, changing only its id, thread and an embedded timestamp"""
+    stamp = f"Alert time: 2024-01-08T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z\n\n"
+
+    def restamp(part: dict) -> dict:
+        part = dict(part)
+        if "parts" in part:
+            part["parts"] = [restamp(p) for p in part["parts"]]
+        elif part["mimeType"].startswith("text/") and "data" in part["body"]:
+            text = base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8")
+            text = stamp + text
+            part["body"] = {"size": len(text), "data": _b64(text)}
+        return part
+
+    clone = dict(original)
+    clone["id"] = f"msg{index:06d}"
+    clone["threadId"] = f"thr{index:06d}"
+    clone["labelIds"] = ["UNREAD", "INBOX"]
+    clone["payload"] = restamp(original["payload"])
+    return clone
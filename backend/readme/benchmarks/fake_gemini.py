@@ -0,0 +1,190 @@
+"""In-process stand-in for `google.generativeai.GenerativeModel`"""
+import asyncio
+import dataclasses
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.corpus import DEPARTMENT_TOPICS
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+
+class FakeResourceExhausted(Exception):
+    """Message matches google.api_core.exceptions.ResourceExhausted"""
+
+    def __init__(self):
+        super().__init__("429 Resource has been exhausted (e.g. check quota).")
+
+
+class FakeDeadlineExceeded(Exception):
+    """Message matches google.api_core.exceptions.DeadlineExceeded"""
+
+    def __init__(self):
+        super().__init__("504 Deadline Exceeded")
+
+
+@dataclasses.dataclass
+class FakeGenerationConfig:
+    """Fields of a `GenerationConfig` from an SDK with structured output"""
+
+    temperature: float = None
+    response_mime_type: str = None
+    response_schema: dict = None
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiBackend:
+    """Classifies prompts by keyword, with latency / failure / quota knobs.
+
+    `rpm` raises a 429 once more than that many calls land in a rolling 60s
+    window (0 disables it), `quota_error_rate` and `timeout_rate` inject 429s
+    and 504s at random, `fence_rate` wraps the JSON in a markdown fence and
+    `malformed_rate` returns a truncated reply. Requests carrying a
+    `response_schema` always get bare, complete JSON.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, rpm: int = 0,
+                 quota_error_rate: float = 0, timeout_rate: float = 0, error_rate: float = 0,
+                 fence_rate: float = 0.3, malformed_rate: float = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rpm = rpm
+        self.quota_error_rate = quota_error_rate
+        self.timeout_rate = timeout_rate
+        self.error_rate = error_rate
+        self.fence_rate = fence_rate
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self.prompt_chars = 0
+        self.reply_chars = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: List[float] = []
+
+    def model(self, model_name: str = "gemini-2.5-flash-lite", **_) -> "FakeGenerativeModel":
+        return FakeGenerativeModel(self, model_name)
+
+    def _admit(self) -> float:
+        """Apply quota and failure knobs, returning the latency to simulate"""
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            if self.rpm:
+                self._recent = [t for t in self._recent if now - t < 60]
+                if len(self._recent) >= self.rpm:
+                    raise FakeResourceExhausted()
+                self._recent.append(now)
+
+            roll = self._rng.random()
+            latency = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+
+        if roll < self.quota_error_rate:
+            raise FakeResourceExhausted()
+        if roll < self.quota_error_rate + self.timeout_rate:
+            time.sleep(max(latency, 0) / 1000)
+            raise FakeDeadlineExceeded()
+        if roll < self.quota_error_rate + self.timeout_rate + self.error_rate:
+            raise RuntimeError("500 An internal error has occurred")
+        return max(latency, 0) / 1000
+
+    def _answer(self, prompt: str, structured: bool = False) -> str:
+        with self._lock:
+            self.prompt_chars += len(prompt)
+            fence = self._rng.random() < self.fence_rate and not structured
+            malformed = self._rng.random() < self.malformed_rate and not structured
+
+        roster = _parse_roster(prompt)
+        email_text = prompt.split("Email to Classify", 1)[-1].lower()
+
+        best, best_hits = None, 0
+        for dept in roster:
+            keywords = DEPARTMENT_TOPICS.get(dept, []) + [dept.lower()]
+            hits = sum(email_text.count(k) for k in keywords)
+            if hits > best_hits:
+                best, best_hits = dept, hits
+
+        if best is None:
+            best = next(iter(roster), "General")
+            confidence = 0.45
+        else:
+            confidence = min(0.95, 0.6 + 0.1 * best_hits)
+
+        ref, members = roster.get(best, (best, []))
+        if members:
+            # Older prompts list each department's members and expect them echoed back
+            reply = json.dumps({
+                "categories": [best],
+                "confidence": round(confidence, 2),
+                "recipients": members,
+                "reasoning": f"Mentions {best.lower()} topics",
+            }, indent=2)
+        else:
+            reply = json.dumps({"departments": [ref], "confidence": round(confidence, 2)})
+
+        if malformed:
+            reply = reply[: len(reply) // 2]
+        if fence:
+            reply = f"```json\n{reply}\n```"
+        with self._lock:
+            self.reply_chars += len(reply)
+        return reply
+
+    def generate(self, prompt: str, structured: bool = False) -> FakeResponse:
+        time.sleep(self._admit())
+        return FakeResponse(self._answer(prompt, structured))
+
+    async def generate_async(self, prompt: str, structured: bool = False) -> FakeResponse:
+        await asyncio.sleep(self._admit())
+        return FakeResponse(self._answer(prompt, structured))
+
+
+class FakeGenerativeModel:
+    def __init__(self, backend: FakeGeminiBackend, model_name: str):
+        self._backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None, **_) -> FakeResponse:
+        return self._backend.generate(_prompt_text(contents), _structured(generation_config))
+
+    async def generate_content_async(self, contents, generation_config=None, **_) -> FakeResponse:
+        return await self._backend.generate_async(_prompt_text(contents), _structured(generation_config))
+
+
+def _structured(generation_config) -> bool:
+    if isinstance(generation_config, dict):
+        return bool(generation_config.get("response_schema"))
+    return bool(getattr(generation_config, "response_schema", None))
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(str(c) for c in contents)
+
+
+def _parse_roster(prompt: str) -> Dict[str, Tuple[str, List[str]]]:
+    """Read the department lines the classifier puts in its prompt: department -> (reference, member emails).
+
+    Lines are `- d1: Department` (compact IDs) or, in older prompts,
+    `- Department: members`, where the department name is its own reference.
+    """
+    roster: Dict[str, Tuple[str, List[str]]] = {}
+    section = prompt.split("Available Departments", 1)[-1].split("Email to Classify", 1)[0]
+    for line in section.splitlines():
+        line = line.strip()
+        if line.startswith("- ") and ":" in line:
+            left, right = (part.strip() for part in line[2:].split(":", 1))
+            members = EMAIL_PATTERN.findall(right)
+            if members:
+                roster[left] = (left, members)
+            else:
+                roster[right] = (left, [])
+    return roster
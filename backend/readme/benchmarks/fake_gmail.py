@@ -0,0 +1,189 @@
+"""In-process stand-in for the Gmail API client returned by `googleapiclient.discovery.build`"""
+import base64
+import copy
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient.errors.HttpError without needing httplib2 responses"""
+
+    def __init__(self, status: int, reason: str):
+        self.status_code = status
+        self.resp = {"status": str(status)}
+        self.content = json.dumps({"error": {"code": status, "message": reason}}).encode()
+        super().__init__(f"<HttpError {status} \"{reason}\">")
+
+
+class FakeGmailBackend:
+    """Shared mailbox state plus latency / failure knobs.
+
+    `latency_ms` is applied to every `execute()`, `error_rate` raises a 500 and
+    `rate_limit_per_second` raises a 429 once more than that many requests are
+    made within one second (0 disables it).
+    """
+
+    def __init__(self, messages: List[Dict], latency_ms: float = 0, error_rate: float = 0,
+                 rate_limit_per_second: int = 0, seed: int = 0):
+        self.messages = {m["id"]: copy.deepcopy(m) for m in messages}
+        self.order = [m["id"] for m in messages]
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit_per_second = rate_limit_per_second
+        self.sent: List[Dict] = []
+        self.calls: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def service(self) -> "FakeGmailService":
+        return FakeGmailService(self)
+
+    def _call(self, name: str, fn, delay: bool = True):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+            if self.rate_limit_per_second:
+                now = time.monotonic()
+                if now - self._window_start >= 1:
+                    self._window_start = now
+                    self._window_count = 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit_per_second:
+                    raise FakeHttpError(429, "User-rate limit exceeded")
+
+            failed = self._rng.random() < self.error_rate
+
+        if self.latency_ms and delay:
+            time.sleep(self.latency_ms / 1000)
+        if failed:
+            raise FakeHttpError(500, "Backend Error")
+        return fn()
+
+    # ---- users.messages ----
+
+    def list(self, q: str = "", maxResults: int = 100, pageToken: Optional[str] = None, **_) -> dict:
+        unread_only = "is:unread" in q
+        ids = [i for i in self.order
+               if not unread_only or "UNREAD" in self.messages[i]["labelIds"]]
+        # Page tokens are cursors (the last id returned), so messages that stop
+        # matching between pages don't shift later pages
+        start = 0
+        if pageToken:
+            position = self.order.index(pageToken)
+            start = next((n for n, i in enumerate(ids) if self.order.index(i) > position), len(ids))
+        page = ids[start:start + maxResults]
+        result = {
+            "messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in page],
+            "resultSizeEstimate": len(ids),
+        }
+        if start + maxResults < len(ids):
+            result["nextPageToken"] = page[-1]
+        return result
+
+    def get(self, id: str, format: str = "full", metadataHeaders=None, **_) -> dict:
+        if id not in self.messages:
+            raise FakeHttpError(404, "Requested entity was not found.")
+        message = self.messages[id]
+
+        if format == "raw":
+            raw = "\r\n".join(f"{h['name']}: {h['value']}" for h in message["payload"]["headers"])
+            raw += "\r\n\r\n" + message.get("snippet", "")
+            return {"id": id, "threadId": message["threadId"], "labelIds": list(message["labelIds"]),
+                    "raw": base64.urlsafe_b64encode(raw.encode()).decode()}
+
+        result = {k: copy.deepcopy(v) for k, v in message.items() if not k.startswith("_")}
+        if format == "metadata":
+            headers = result["payload"]["headers"]
+            if metadataHeaders:
+                wanted = {h.lower() for h in metadataHeaders}
+                headers = [h for h in headers if h["name"].lower() in wanted]
+            result["payload"] = {"mimeType": result["payload"]["mimeType"], "headers": headers}
+        return result
+
+    def modify(self, id: str, body: dict, **_) -> dict:
+        message = self.messages[id]
+        labels = [l for l in message["labelIds"] if l not in body.get("removeLabelIds", [])]
+        labels += [l for l in body.get("addLabelIds", []) if l not in labels]
+        message["labelIds"] = labels
+        return {"id": id, "labelIds": list(labels)}
+
+    def send(self, body: dict, **_) -> dict:
+        self.sent.append(body)
+        return {"id": f"sent{len(self.sent):06d}", "labelIds": ["SENT"]}
+
+    def get_profile(self, **_) -> dict:
+        return {"emailAddress": "inbox@company.com", "messagesTotal": len(self.messages),
+                "threadsTotal": len({m["threadId"] for m in self.messages.values()})}
+
+
+class _Request:
+    def __init__(self, backend: FakeGmailBackend, name: str, fn):
+        self._backend = backend
+        self._name = name
+        self._fn = fn
+
+    def execute(self, num_retries: int = 0):
+        return self._backend._call(self._name, self._fn)
+
+
+class _Batch:
+    """Batch request: one round trip, then each call's callback (each call still counts and can fail)"""
+
+    def __init__(self, backend: FakeGmailBackend, callback=None):
+        self._backend = backend
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request: _Request, callback=None, request_id: Optional[str] = None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests))))
+
+    def execute(self):
+        self._backend._call("batch", lambda: None)
+        for request, callback, request_id in self._requests:
+            try:
+                response, error = self._backend._call(request._name, request._fn, delay=False), None
+            except FakeHttpError as e:
+                response, error = None, e
+            if callback:
+                callback(request_id, response, error)
+
+
+class _Messages:
+    def __init__(self, backend: FakeGmailBackend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        target = getattr(self._backend, name)
+
+        def method(userId: str = "me", **kwargs):
+            return _Request(self._backend, f"messages.{name}", lambda: target(**kwargs))
+        return method
+
+
+class _Users:
+    def __init__(self, backend: FakeGmailBackend):
+        self._backend = backend
+
+    def messages(self):
+        return _Messages(self._backend)
+
+    def getProfile(self, userId: str = "me"):
+        return _Request(self._backend, "getProfile", self._backend.get_profile)
+
+
+class FakeGmailService:
+    """Mimics the `service.users().messages().<verb>(...).execute()` call chain"""
+
+    def __init__(self, backend: FakeGmailBackend):
+        self._backend = backend
+
+    def users(self):
+        return _Users(self._backend)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self._backend, callback)
@@ -0,0 +1,76 @@
+"""Import-time profile of the API entry point.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints
+the slowest modules by cumulative time, flagging SDKs that should only load on
+first use.
+
+Usage (from backend/readme):
+    python -m benchmarks.profile_imports --top 25
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Heavy SDKs that must not be imported just to serve /health
+LAZY_MODULES = [
+    "google.generativeai",
+    "googleapiclient.discovery",
+    "google_auth_oauthlib",
+]
+
+BENCH_ENV = {
+    "GOOGLE_CLIENT_ID": "bench-client-id",
+    "GOOGLE_CLIENT_SECRET": "bench-secret",
+    "GEMINI_API_KEY": "bench-key",
+    "TEAM_LEAD_EMAIL": "lead@company.com",
+}
+
+
+def profile(module: str = "main"):
+    """Return [(self_us, cumulative_us, name)] for every module imported"""
+    env = {**BENCH_ENV, **os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    with tempfile.TemporaryDirectory() as workdir:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True,
+        )
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rows = profile(args.module)
+    total = next((cum for _, cum, name in rows if name.strip() == args.module), 0)
+
+    print(f"import {args.module}: {total / 1000:.1f} ms cumulative, {len(rows)} modules\n")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+
+    loaded = {name.strip() for _, _, name in rows}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    print()
+    if eager:
+        print(f"⚠️ Imported eagerly: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"✅ None of {', '.join(LAZY_MODULES)} imported at startup")
+
+
+if __name__ == "__main__":
+    main()
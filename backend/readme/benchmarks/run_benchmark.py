@@ -0,0 +1,531 @@
+"""Offline end-to-end benchmark for the fetch-and-process pipeline.
+
+Runs the streaming (`process_emails_stream`) and non-streaming
+(`fetch_and_process_emails`) endpoints against in-process fakes of the Gmail
+and Gemini APIs, then reports emails per minute, per-stage p50/p95 latency and
+peak RSS. Each mode runs in its own interpreter so peak RSS is not shared.
+
+Usage (from backend/readme):
+    python -m benchmarks.run_benchmark --emails 100 --gemini-latency-ms 400
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BENCH_USER = "bench@company.com"
+
+TEAM = [
+    ("Fiona Price", "fiona@company.com", "Finance"),
+    ("Frank Ledger", "frank@company.com", "Finance"),
+    ("Hana Reyes", "hana@company.com", "HR"),
+    ("Mark Bloom", "mark@company.com", "Marketing"),
+    ("Sam Helper", "sam@company.com", "Support"),
+    ("Sue Fixit", "sue@company.com", "Support"),
+    ("Ben Deal", "ben@company.com", "Business"),
+]
+
+# (module, attribute or Class.method, stage name); attributes missing in this tree are skipped
+STAGES = [
+    # What the pipeline waits on; the list and page fetches below run ahead of it
+    ("services.inbox_service", "InboxStream.take", "fetch"),
+    ("services.gmail_service", "list_unread_page", "list"),
+    ("services.gmail_service", "fetch_emails", "fetch_page"),
+    ("services.gmail_service", "get_email_body", "mime_decode"),
+    ("services.routing_service", "route_email", "route"),
+    ("services.classifier_service", "classify_email", "classify"),
+    ("services.classifier_service", "classify_email_async", "classify"),
+    ("services.classifier_service", "build_classification_prompt", "prompt"),
+    ("database", "save_classification", "db_save"),
+    ("database", "add_to_review_queue", "db_review"),
+    ("database", "save_run_rows", "db_flush"),
+    ("services.gmail_service", "send_email", "reply"),
+    ("services.gmail_service", "send_batch", "outbox_send"),
+    ("services.gmail_service", "mark_as_read", "mark_read"),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def instrument(timings: Dict[str, List[float]]):
+    """Wrap each pipeline stage so its wall time is recorded per call"""
+    import importlib
+
+    for module_name, path, stage in STAGES:
+        owner = importlib.import_module(module_name)
+        *owners, attr = path.split(".")
+        for name in owners:
+            owner = getattr(owner, name, None)
+        original = getattr(owner, attr, None)
+        if original is None:
+            continue
+        samples = timings.setdefault(stage, [])
+
+        if inspect.iscoroutinefunction(original):
+            async def wrapper(*args, __fn=original, __samples=samples, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await __fn(*args, **kwargs)
+                finally:
+                    __samples.append(time.perf_counter() - start)
+        else:
+            def wrapper(*args, __fn=original, __samples=samples, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return __fn(*args, **kwargs)
+                finally:
+                    __samples.append(time.perf_counter() - start)
+
+        setattr(owner, attr, functools.wraps(original)(wrapper))
+
+
+def prepare_workdir(workdir: Path):
+    """Point the app at a scratch directory with a token file and seeded roster"""
+    for key, value in {
+        "GOOGLE_CLIENT_ID": "bench-client-id.apps.googleusercontent.com",
+        "GOOGLE_CLIENT_SECRET": "bench-secret",
+        "GEMINI_API_KEY": "bench-key",
+        "TEAM_LEAD_EMAIL": "lead@company.com",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    token_dir = workdir / "tokens"
+    token_dir.mkdir(exist_ok=True)
+    (token_dir / f"{BENCH_USER}_token.json").write_text(json.dumps({
+        "token": "bench-access-token",
+        "refresh_token": "bench-refresh-token",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "client_id": os.environ["GOOGLE_CLIENT_ID"],
+        "client_secret": os.environ["GOOGLE_CLIENT_SECRET"],
+        "scopes": [],
+    }))
+
+    import database as db
+    db.init_db()
+    for name, email, department in TEAM:
+        db.add_team_member(name, email, department)
+
+
+def install_fakes(args, corpus):
+    from benchmarks.fake_gemini import FakeGeminiBackend, FakeGenerationConfig
+    from benchmarks.fake_gmail import FakeGmailBackend
+    from services import classifier_service, gmail_service
+
+    gmail = FakeGmailBackend(
+        corpus,
+        latency_ms=args.gmail_latency_ms,
+        error_rate=args.gmail_error_rate,
+        rate_limit_per_second=args.gmail_rate_limit,
+        seed=args.seed,
+    )
+    gemini = FakeGeminiBackend(
+        latency_ms=args.gemini_latency_ms,
+        jitter_ms=args.gemini_jitter_ms,
+        rpm=args.gemini_rpm,
+        quota_error_rate=args.gemini_429_rate,
+        timeout_rate=args.gemini_timeout_rate,
+        error_rate=args.gemini_error_rate,
+        fence_rate=args.gemini_fence_rate,
+        malformed_rate=args.gemini_malformed_rate,
+        seed=args.seed,
+    )
+
+    gmail_service.get_service = lambda token_data: gmail.service()
+    classifier_service.genai = SimpleNamespace(GenerativeModel=gemini.model, configure=lambda **_: None)
+    if not args.legacy_sdk:
+        classifier_service.genai.types = SimpleNamespace(GenerationConfig=FakeGenerationConfig)
+
+    # The production limiter spaces calls 6s apart; benchmarks default to the
+    # fake backend's own quota so runs finish in seconds.
+    classifier_service.MIN_CALL_INTERVAL = args.llm_interval
+    classifier_service.MAX_CALLS_PER_MINUTE = args.llm_calls_per_minute
+
+    if args.db_commit_latency_ms:
+        slow_disk(args.db_commit_latency_ms)
+    return gmail, gemini
+
+
+def slow_disk(commit_latency_ms: float):
+    """Make every sqlite commit take `commit_latency_ms` longer, like an fsync on a network volume"""
+    import sqlite3
+
+    import database as db
+
+    class SlowCommitConnection(sqlite3.Connection):
+        def commit(self):
+            time.sleep(commit_latency_ms / 1000)
+            return super().commit()
+
+    db.sqlite3 = SimpleNamespace(
+        connect=lambda *a, **k: sqlite3.connect(*a, factory=SlowCommitConnection, **k),
+        Row=sqlite3.Row,
+    )
+
+
+async def run_stream(max_results: int) -> dict:
+    """One SSE run, followed by a run per continuation token while the run budget cuts it short"""
+    from routes import emails
+
+    events: Dict[str, int] = {}
+    first_complete = None
+    runs = 0
+    start = time.perf_counter()
+    requested = max_results
+    while requested:
+        runs += 1
+        continuation = None
+        async for chunk in emails.process_emails_stream(BENCH_USER, requested):
+            event = json.loads(chunk[len("data: "):])
+            events[event["type"]] = events.get(event["type"], 0) + 1
+            if event["type"] == "email_complete" and first_complete is None:
+                first_complete = time.perf_counter() - start
+            if event["type"] == "error":
+                raise RuntimeError(event["message"])
+            if event["type"] == "complete":
+                continuation = event.get("continuation")
+        requested = emails.requested_emails(BENCH_USER, 0, continuation) if continuation else 0
+    return {"events": events, "time_to_first_email_s": first_complete, "runs": runs}
+
+
+async def run_batch(max_results: int, workers: int = 1) -> dict:
+    """Run `workers` overlapping /fetch-and-process calls, as parallel workers or tabs would"""
+    from routes import emails
+
+    async def worker():
+        # Follow continuation tokens until the run budget no longer cuts runs short
+        request = emails.FetchEmailsRequest(user_email=BENCH_USER, max_results=max_results)
+        responses = []
+        while True:
+            response = await emails.fetch_and_process_emails(request)
+            responses.append(response)
+            if not response.get("continuation"):
+                return {**response, "runs": len(responses),
+                        "processed_count": sum(r["processed_count"] for r in responses)}
+            request = emails.FetchEmailsRequest(user_email=BENCH_USER, continuation=response["continuation"])
+
+    responses = await asyncio.gather(*(worker() for _ in range(workers)))
+    return {"response": responses[0]} if workers == 1 else {"responses": list(responses)}
+
+
+def routing_accuracy(corpus) -> float:
+    import database as db
+
+    # Automated mail has no right department; it is checked by the prefilter counters instead
+    expected = {m["id"]: m["_expected_department"] for m in corpus if m["_expected_department"]}
+    rows = [r for r in db.get_classification_history(limit=len(corpus) + 1) if r["email_id"] in expected]
+    if not rows:
+        return 0.0
+    correct = sum(1 for r in rows if expected.get(r["email_id"]) in json.loads(r["categories"] or "[]"))
+    return round(correct / len(rows), 4)
+
+
+def decision_sources() -> Dict[str, int]:
+    import database as db
+
+    with db.get_db() as conn:
+        rows = conn.execute("SELECT COALESCE(source, 'llm') AS source, COUNT(*) AS n FROM classifications GROUP BY 1")
+        return {row["source"]: row["n"] for row in rows}
+
+
+def scheduler_stats() -> dict:
+    try:
+        from services import scheduler_service
+    except ImportError:
+        return {}
+    return scheduler_service.stats()
+
+
+def prefilter_stats() -> dict:
+    try:
+        from services import prefilter_service
+    except ImportError:
+        return {}
+    return prefilter_service.stats()["decisions"]
+
+
+def gemini_replies() -> Dict[str, int]:
+    from services import classifier_service
+
+    return dict(getattr(classifier_service, "response_stats", {}))
+
+
+def gemini_tokens() -> dict:
+    from services import classifier_service
+
+    token_usage = getattr(classifier_service, "token_usage", None)
+    return token_usage()["per_call"] if token_usage else {}
+
+
+def content_prep() -> dict:
+    from services import classifier_service
+
+    content_usage = getattr(classifier_service, "content_usage", None)
+    return content_usage() if content_usage else {}
+
+
+async def drain_outbox() -> dict:
+    """Send everything the run queued, as the background sender would; timed separately from the run"""
+    try:
+        from services import outbox_service
+    except ImportError:
+        return {}
+    start = time.perf_counter()
+    await outbox_service.drain()
+    status = await outbox_service.status()
+    return {"drain_s": round(time.perf_counter() - start, 3), "counts": status["counts"]}
+
+
+async def run_redelivery(run_once, gmail, gemini) -> dict:
+    """Mark every message unread again and rerun, as if mark_as_read had been lost"""
+    for message in gmail.messages.values():
+        if "UNREAD" not in message["labelIds"]:
+            message["labelIds"].append("UNREAD")
+    calls, sent = gemini.calls, len(gmail.sent)
+
+    start = time.perf_counter()
+    await run_once()
+    await drain_outbox()
+    return {
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "gemini_calls": gemini.calls - calls,
+        "replies_sent": len(gmail.sent) - sent,
+    }
+
+
+def run_child(args) -> dict:
+    """Run one mode in this process and return its measurements"""
+    workdir = Path(tempfile.mkdtemp(prefix="emailia-bench-"))
+    if args.cascade:
+        os.environ["CLASSIFIER_CASCADE"] = args.cascade
+    if args.concurrency:
+        os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.concurrency)
+    if args.run_budget_s:
+        os.environ["RUN_TIME_BUDGET_SECONDS"] = str(args.run_budget_s)
+    # Every worker gets a run slot, and one run may take the whole corpus unless the budget says otherwise
+    os.environ["MAX_CONCURRENT_RUNS"] = str(max(args.workers, 2))
+    os.environ["RUN_MAX_EMAILS"] = str(args.run_max_emails or args.emails)
+    prepare_workdir(workdir)
+
+    from benchmarks.corpus import generate_corpus
+
+    corpus = generate_corpus(args.emails, seed=args.seed, duplicate_ratio=args.duplicate_ratio,
+                             reply_ratio=args.reply_ratio, mean_size=args.mean_size,
+                             repeat_sender_ratio=args.repeat_sender_ratio,
+                             automated_ratio=args.automated_ratio)
+    gmail, gemini = install_fakes(args, corpus)
+
+    timings: Dict[str, List[float]] = {}
+    instrument(timings)
+    if args.profile:
+        from services import profiling_service
+        profiling_service.arm(runs=10**6)
+
+    def run_once():
+        if args.child == "stream":
+            return run_stream(args.emails)
+        return run_batch(args.emails, args.workers)
+
+    async def run_all():
+        nonlocal elapsed, processed
+        start = time.perf_counter()
+        detail = await run_once()
+        elapsed = time.perf_counter() - start
+        processed = sum(1 for m in gmail.messages.values() if "UNREAD" not in m["labelIds"])
+        detail["outbox"] = await drain_outbox()
+        if args.redeliver:
+            detail["redelivery"] = await run_redelivery(run_once, gmail, gemini)
+        return detail
+
+    elapsed, processed = 0.0, 0
+    detail = asyncio.run(run_all())
+    if args.profile:
+        detail["profile"] = write_profile(args.profile, args.child)
+    stages = {
+        stage: {
+            "count": len(samples),
+            "total_s": round(sum(samples), 4),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        }
+        for stage, samples in timings.items() if samples
+    }
+
+    return {
+        "mode": args.child,
+        "emails": args.emails,
+        "processed": processed,
+        "elapsed_s": round(elapsed, 3),
+        "emails_per_minute": round(processed / elapsed * 60, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": stages,
+        "gemini_calls": gemini.calls,
+        "gemini_prompt_chars": gemini.prompt_chars,
+        "gemini_reply_chars": gemini.reply_chars,
+        "gemini_tokens_per_call": gemini_tokens(),
+        "content_prep": content_prep(),
+        "gemini_replies": gemini_replies(),
+        "gmail_calls": gmail.calls,
+        "replies_sent": len(gmail.sent),
+        "routing_accuracy": routing_accuracy(corpus),
+        "decision_sources": decision_sources(),
+        "scheduler": scheduler_stats(),
+        "prefilter": prefilter_stats(),
+        "detail": detail,
+    }
+
+
+def write_profile(path: Path, mode: str) -> str:
+    """Merge the runs' sampling profiles into one collapsed-stacks file (one per mode)"""
+    from collections import Counter
+    from services import profiling_service
+
+    stacks = Counter()
+    for profile in profiling_service.list_profiles():
+        stacks.update(profile["stacks"])
+    output = path.with_name(f"{path.stem}.{mode}{path.suffix or '.folded'}")
+    output.write_text(profiling_service.folded({"stacks": stacks}))
+    return str(output)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["stream", "batch", "both"], default="both")
+    parser.add_argument("--emails", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.15)
+    parser.add_argument("--reply-ratio", type=float, default=0.2)
+    parser.add_argument("--repeat-sender-ratio", type=float, default=0.25)
+    parser.add_argument("--automated-ratio", type=float, default=0,
+                        help="share of newsletters, noreply notifications, bounces and auto-replies")
+    parser.add_argument("--mean-size", type=int, default=1500, help="mean body size in characters")
+
+    parser.add_argument("--gmail-latency-ms", type=float, default=30)
+    parser.add_argument("--gmail-error-rate", type=float, default=0)
+    parser.add_argument("--gmail-rate-limit", type=int, default=0, help="requests/second before 429s (0 = off)")
+
+    parser.add_argument("--gemini-latency-ms", type=float, default=400)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--gemini-rpm", type=int, default=0, help="calls/minute before 429s (0 = off)")
+    parser.add_argument("--gemini-429-rate", type=float, default=0)
+    parser.add_argument("--gemini-timeout-rate", type=float, default=0)
+    parser.add_argument("--gemini-error-rate", type=float, default=0)
+    parser.add_argument("--gemini-malformed-rate", type=float, default=0)
+    parser.add_argument("--gemini-fence-rate", type=float, default=0.3)
+    parser.add_argument("--legacy-sdk", action="store_true",
+                        help="fake an SDK without structured output (google-generativeai < 0.5)")
+
+    parser.add_argument("--db-commit-latency-ms", type=float, default=0,
+                        help="extra time per sqlite commit, to model a slow disk")
+    parser.add_argument("--cascade", default=None,
+                        help="classifier tiers, e.g. 'gemini-2.5-flash-lite' (default: CLASSIFIER_CASCADE)")
+    parser.add_argument("--redeliver", action="store_true",
+                        help="after the run, mark everything unread and run again")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="overlapping batch runs over the same inbox (batch mode)")
+    parser.add_argument("--run-budget-s", type=float, default=None,
+                        help="time budget per processing run (default: RUN_TIME_BUDGET_SECONDS)")
+    parser.add_argument("--run-max-emails", type=int, default=None,
+                        help="most emails per processing run (default: all of them)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Gemini requests in flight (default: GEMINI_MAX_CONCURRENCY)")
+    parser.add_argument("--llm-interval", type=float, default=0,
+                        help="client-side spacing between Gemini calls in seconds (production: 6)")
+    parser.add_argument("--llm-calls-per-minute", type=int, default=10**6,
+                        help="client-side calls per minute (production: 9)")
+
+    parser.add_argument("--profile", type=Path, default=None,
+                        help="sample the runs and write collapsed stacks to <name>.<mode>.folded")
+    parser.add_argument("--output", type=Path, default=None, help="results file (default: results/<time>_<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline logs")
+    parser.add_argument("--child", choices=["stream", "batch"], help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", type=Path, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = run_child(args)
+        args.child_output.write_text(json.dumps(result))
+        return
+
+    modes = ["stream", "batch"] if args.mode == "both" else [args.mode]
+    passthrough = [a for a in (argv if argv is not None else sys.argv[1:])]
+    results = {}
+
+    for mode in modes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            child_output = Path(handle.name)
+        print(f"⏱️ Running {mode} benchmark with {args.emails} emails...", file=sys.stderr)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmark", *passthrough,
+             "--child", mode, "--child-output", str(child_output)],
+            cwd=BACKEND_DIR, check=True,
+            stdout=None if args.verbose else subprocess.DEVNULL,
+        )
+        results[mode] = json.loads(child_output.read_text())
+        child_output.unlink()
+
+    config = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+              if k not in ("child", "child_output", "output", "verbose")}
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": config,
+        "results": results,
+    }
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    for mode, result in results.items():
+        print(f"\n{mode}: {result['processed']}/{result['emails']} emails in {result['elapsed_s']}s "
+              f"→ {result['emails_per_minute']} emails/min, peak RSS {result['peak_rss_mb']} MB, "
+              f"{result['gemini_calls']} Gemini calls, {result['replies_sent']} replies, "
+              f"accuracy {result['routing_accuracy']:.0%}")
+        print(f"  decisions: {result['decision_sources']}")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<12} n={stats['count']:<5} p50={stats['p50_ms']:>9.2f}ms p95={stats['p95_ms']:>9.2f}ms")
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Search latency check: `/api/dashboard/search` queries against a large history.
+
+Fills a throwaway database with synthetic classifications and review-queue
+items (through the normal inserts, so the FTS triggers do the indexing) and
+times representative searches: a rare reference number, a sender domain plus
+topic, a prefix, a date-bounded department search and a term that matches
+nearly every row (the worst case for ranking).
+
+Usage (from backend/readme):
+    python -m benchmarks.search_benchmark --rows 200000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import database as db
+from benchmarks.corpus import DEPARTMENT_TOPICS, _html_body, _person, _plain_body
+
+QUERIES = [
+    ("rare reference", {"query": "ref 4242"}),
+    ("sender + topic", {"query": "globex invoice"}),
+    ("prefix", {"query": "partn"}),
+    ("department + month", {"query": "refund", "department": "Finance",
+                            "since": "2024-01-01", "until": "2024-02-01"}),
+    ("common term", {"query": "please"}),
+    ("common term, page 5", {"query": "please", "offset": 80}),
+]
+
+
+def fill(rows: int, seed: int, batch: int = 5000):
+    rng = random.Random(seed)
+    start = datetime(2023, 6, 1)
+    classifications, reviews = [], []
+
+    def flush():
+        db.save_run_rows(classifications, reviews, [])
+        classifications.clear()
+        reviews.clear()
+
+    for index in range(rows):
+        department = rng.choice(list(DEPARTMENT_TOPICS))
+        topic = rng.choice(DEPARTMENT_TOPICS[department])
+        person = _person(rng)
+        body = _plain_body(rng, topic, max(200, int(rng.lognormvariate(0, 0.6) * 800)), person)
+        if rng.random() < 0.5:
+            body = _html_body(body)
+        row = (f"msg{index:07d}", f"{person['name']} <{person['email']}>",
+               f"{topic.title()} - ref {rng.randint(1000, 99999)}", body)
+        classifications.append(row + (json.dumps([department]), round(rng.uniform(0.5, 1.0), 2),
+                                      "[]", "forwarded", f"thr{index:07d}", "llm"))
+        if rng.random() < 0.1:
+            reviews.append(row + ("Low confidence",))
+        if len(classifications) >= batch:
+            flush()
+    flush()
+
+    # Spread created_at over a year so date filters have something to cut
+    with db.get_db() as conn:
+        conn.execute("UPDATE classifications SET created_at = datetime(?, '+' || (id % 365) || ' days')",
+                     (start.strftime("%Y-%m-%d"),))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="emailia-search-"))
+    started = time.perf_counter()
+    fill(args.rows, args.seed)
+    print(f"Indexed {args.rows} classifications in {time.perf_counter() - started:.1f}s "
+          f"({os.path.getsize(db.DATABASE_FILE) / 2**20:.0f} MB)")
+
+    for label, params in QUERIES:
+        tables = ["classifications"] if params.get("department") else list(db.SEARCH_TABLES)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            found = db.search_emails(tables=tables, **params)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{label:22} {found['total']:>8} hits   median {statistics.median(timings):7.1f} ms   "
+              f"max {max(timings):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,111 @@ class Settings(BaseSettings):
     
     # Gemini API
     GEMINI_API_KEY: str
+    # Classifier tiers tried in order while confidence < CONFIDENCE_THRESHOLD; prepend "local"
+    # (keyword scorer) to opt into settling clear-cut mail without the LLM
+    CLASSIFIER_CASCADE: str = "gemini-2.5-flash-lite,gemini-2.5-flash"
+    GEMINI_CALL_DEADLINE_SECONDS: float = 20.0
+    # Gemini requests in flight at once on the async path; call starts still follow the rate limiter
+    GEMINI_MAX_CONCURRENCY: int = 4
+    
+    # Gemini circuit breaker: open after repeated quota errors / timeouts
+    GEMINI_BREAKER_FAILURES: int = 3
+    GEMINI_BREAKER_RESET_SECONDS: float = 60.0
+    GEMINI_BREAKER_HALF_OPEN_CALLS: int = 1
     
     # Database
     DATABASE_URL: str = "sqlite:///./email_routing.db"
     
     # Classification
     CONFIDENCE_THRESHOLD: float = 0.7
+    # Email text sent to the classifier, after quoted history, signatures and markup are stripped:
+    # at most this many tokens from the start, plus optionally some from the end
+    CLASSIFY_CONTENT_TOKENS: int = 400
+    CLASSIFY_CONTENT_TAIL_TOKENS: int = 0
+    
+    # Thread routing: replies inherit the thread's earlier decision
+    THREAD_ROUTING_ENABLED: bool = True
+    THREAD_REROUTE_GAP_HOURS: float = 72.0
+    THREAD_REROUTE_ON_NEW_PARTICIPANT: bool = True
+    
+    # Sender rules: route repeat senders from learned history without the LLM
+    SENDER_RULES_ENABLED: bool = True
+    SENDER_RULE_MIN_EMAILS: int = 5
+    SENDER_RULE_THRESHOLD: float = 0.9
+    SENDER_RULE_REVIEW_WEIGHT: float = 3.0
+    SENDER_RULE_REFRESH_SECONDS: int = 300
+    
+    # Near-duplicate clustering: one classification per cluster of a fetched batch
+    NEAR_DUPLICATE_CLUSTERING: bool = True
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3
+    # Bodies shorter than this many word shingles ("Please see attached") are never clustered
+    NEAR_DUPLICATE_MIN_SHINGLES: int = 8
+    
+    # Priority scheduling: high-priority mail gets the LLM quota first
+    PRIORITY_SCHEDULING_ENABLED: bool = True
+    PRIORITY_URGENT_KEYWORDS: str = "urgent,asap,escalation,outage,down,critical,legal,immediately,complaint"
+    PRIORITY_AGE_BOOST_HOURS: float = 24.0
+    SCHEDULER_DEEP_QUEUE: int = 20
+    LOW_PRIORITY_OVERFLOW: str = "fallback"  # "fallback" or "defer"
+    
+    # Run budget: each fetch-and-process run is sized to finish within RUN_TIME_BUDGET_SECONDS
+    # (from the remaining LLM quota and observed per-email latency), at most RUN_MAX_EMAILS;
+    # the rest is left for a follow-up run via a continuation token
+    RUN_TIME_BUDGET_SECONDS: float = 120.0
+    RUN_MAX_EMAILS: int = 100
+    RUN_CHUNK_SIZE: int = 20
+    # Runs in progress at once in this process; more are turned away with 429
+    MAX_CONCURRENT_RUNS: int = 2
+    
+    # Inbox paging: a run fetches unread emails INBOX_PAGE_SIZE at a time, at most
+    # INBOX_PREFETCH_PAGES pages ahead of the one being processed
+    INBOX_PAGE_SIZE: int = 25
+    INBOX_PREFETCH_PAGES: int = 2
+    
+    # Email claims: a run only processes emails it has leased, so parallel workers/runs
+    # never handle the same email; a crashed worker's leases expire after this long
+    EMAIL_CLAIM_LEASE_SECONDS: int = 600
+    
+    # Buffered writes: a run's rows are committed together once this many are
+    # buffered or this many seconds after the first one
+    DB_WRITE_BATCH_SIZE: int = 50
+    DB_WRITE_BATCH_SECONDS: float = 2.0
+    
+    # Retention (opt-in): classifications older than this keep metadata only (0 = keep everything);
+    # with archiving, full rows are first copied to monthly archive/YYYY-MM.db files
+    RETENTION_DAYS: int = 0
+    RETENTION_ARCHIVE_ENABLED: bool = False
+    RETENTION_INTERVAL_HOURS: float = 24.0
+    RETENTION_BATCH_SIZE: int = 500
+    
+    # Outbox: auto-replies are committed with the classification and sent by a background
+    # sender, OUTBOX_BATCH_SIZE messages per Gmail batch request and up to
+    # OUTBOX_CONCURRENCY requests at once; failures back off exponentially and are
+    # dead-lettered after OUTBOX_MAX_ATTEMPTS
+    OUTBOX_CONCURRENCY: int = 4
+    OUTBOX_BATCH_SIZE: int = 25
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_RETRY_BASE_SECONDS: float = 30.0
+    OUTBOX_RETRY_MAX_SECONDS: float = 3600.0
+    OUTBOX_POLL_SECONDS: float = 5.0
+    # A message claimed by a sender that died is retried after this long
+    OUTBOX_LEASE_SECONDS: int = 300
+    
+    # Header pre-filter: mailing lists, bulk/auto-submitted mail, bounces, noreply senders and
+    # these Gmail categories skip the LLM and the auto-reply. They are routed by a learned
+    # sender rule when there is one, otherwise marked read (and archived if enabled).
+    PREFILTER_ENABLED: bool = True
+    PREFILTER_CATEGORIES: str = "CATEGORY_PROMOTIONS,CATEGORY_SOCIAL,CATEGORY_FORUMS"
+    PREFILTER_NOREPLY_PATTERNS: str = "noreply,no-reply,donotreply,do-not-reply,mailer-daemon,postmaster,bounce"
+    PREFILTER_ARCHIVE: bool = False
+    
+    # Admin endpoints (/api/admin) require this in the X-Admin-Token header; empty disables them
+    ADMIN_TOKEN: str = ""
+    
+    # Profiling: armed through /api/admin/profiling for the next N processing runs;
+    # a run that isn't profiled only pays for checking whether it should be
+    PROFILING_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILING_KEEP: int = 20
     
     # Team Members (comma-separated: name:email:department)
     TEAM_MEMBERS: str = ""
@@ -1,14 +1,58 @@
+import os
+import re
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
+from utils.email_parser import clean_email_content
+
 DATABASE_FILE = "email_routing.db"
+# Monthly archive databases (archive/YYYY-MM.db) for rows removed from the live database
+ARCHIVE_DIR = "archive"
+
+# Tables with a full-text index ({table}_fts) over subject, sender and cleaned body
+SEARCH_TABLES = ('classifications', 'review_queue')
+# bm25 weights for the indexed columns: subject, sender, body
+SEARCH_RANK = 'bm25(5.0, 3.0, 1.0)'
+
+# Trend granularity -> SQL for the bucket a timestamp falls in, and the bucket length
+ROLLUP_BUCKETS = {
+    'hour': ("strftime('%Y-%m-%d %H:00:00', {ts})", timedelta(hours=1)),
+    'day': ("date({ts})", timedelta(days=1)),
+}
+# Rollup rows for this department hold the totals over all emails
+ROLLUP_ALL = '*'
+
+# Schema setup runs once per process (lifespan hook or first connection)
+_db_initialized = False
+_init_lock = threading.Lock()
 
 def init_db():
-    """Initialize database with required tables"""
+    """Initialize database with required tables (idempotent, runs once per process)"""
+    global _db_initialized
+    if _db_initialized:
+        return
+
+    with _init_lock:
+        if _db_initialized:
+            return
+        _create_schema()
+        _db_initialized = True
+
+def _create_schema():
+    """Create tables if they don't exist"""
     conn = sqlite3.connect(DATABASE_FILE)
+    _register_functions(conn)
     c = conn.cursor()
     
+    # Only takes effect on a new database; existing ones are converted by incremental_vacuum()
+    c.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL lets readers run while the async layer's writer thread commits
+    c.execute('PRAGMA journal_mode=WAL')
+    
     c.execute('''CREATE TABLE IF NOT EXISTS classifications (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         email_id TEXT UNIQUE NOT NULL,
@@ -52,28 +96,199 @@ def init_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )''')
     
+    # Learned sender/domain -> department statistics ('@domain' keys for domains)
+    c.execute('''CREATE TABLE IF NOT EXISTS sender_routes (
+        route_key TEXT NOT NULL,
+        department TEXT NOT NULL,
+        hits REAL NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (route_key, department)
+    )''')
+    
+    # Senders whose mail should be classified first ('@domain' entries match a whole domain)
+    c.execute('''CREATE TABLE IF NOT EXISTS sender_priorities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pattern TEXT UNIQUE NOT NULL,
+        weight INTEGER NOT NULL DEFAULT 3,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    
+    # Leases on emails being processed, so concurrent workers never handle the same email
+    c.execute('''CREATE TABLE IF NOT EXISTS email_claims (
+        email_id TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        claimed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_email_claims_owner ON email_claims (owner)')
+    
+    # Outgoing mail (auto-replies), written with the classification and sent in the background;
+    # one message per email and kind, so reprocessing never sends twice
+    c.execute('''CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        user_email TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        raw TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP,
+        UNIQUE (email_id, kind)
+    )''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)')
+    
+    # Idempotency ledger: which pipeline steps are done for each email
+    ledger_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pipeline_steps'").fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS pipeline_steps (
+        email_id TEXT NOT NULL,
+        step TEXT NOT NULL,
+        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (email_id, step)
+    ) WITHOUT ROWID''')
+    if not ledger_exists:
+        # Emails classified before the ledger existed shouldn't be classified again
+        c.execute("INSERT OR IGNORE INTO pipeline_steps (email_id, step) SELECT email_id, 'classified' FROM classifications")
+    
+    # Columns added after the first release
+    _ensure_column(c, 'classifications', 'thread_id', 'TEXT')
+    _ensure_column(c, 'classifications', 'source', "TEXT DEFAULT 'llm'")
+    c.execute('CREATE INDEX IF NOT EXISTS idx_classifications_thread ON classifications (thread_id, created_at)')
+    
+    for table in SEARCH_TABLES:
+        _ensure_search_index(c, table)
+    
+    _ensure_rollups(c)
+    
     conn.commit()
     conn.close()
 
+# Per table: departments (a JSON array), emails, confidence_sum, fallbacks and reviews one row adds
+_ROLLUP_METRICS = {
+    'classifications': (
+        # Every classification also counts towards ROLLUP_ALL; malformed categories count only there
+        f"""CASE WHEN json_valid({{row}}.categories) AND json_type({{row}}.categories) = 'array'
+             THEN json_insert({{row}}.categories, '$[#]', '{ROLLUP_ALL}') ELSE '["{ROLLUP_ALL}"]' END""",
+        "1", "coalesce({row}.confidence, 0)", "{row}.source = 'fallback'", "0",
+    ),
+    'review_queue': (f"'[\"{ROLLUP_ALL}\"]'", "0", "0", "0", "1"),
+}
+
+def _rollup_statements(table: str, row: str, sign: int = 1, source: str = '') -> List[str]:
+    """Upserts adding (or with sign=-1, removing) `row`'s contribution to every granularity's bucket"""
+    departments, *metrics = (expr.format(row=row) for expr in _ROLLUP_METRICS[table])
+    values = ', '.join(f'{sign} * ({expr})' for expr in metrics)
+    statements = []
+    for granularity, (bucket, _) in ROLLUP_BUCKETS.items():
+        statements.append(f'''INSERT INTO trend_rollups (granularity, bucket, department, emails, confidence_sum, fallbacks, reviews)
+            SELECT '{granularity}', {bucket.format(ts=f'{row}.created_at')}, d.value, {values}
+            FROM {source}json_each({departments}) d WHERE 1
+            ON CONFLICT (granularity, bucket, department) DO UPDATE SET
+                emails = emails + excluded.emails, confidence_sum = confidence_sum + excluded.confidence_sum,
+                fallbacks = fallbacks + excluded.fallbacks, reviews = reviews + excluded.reviews''')
+    return statements
+
+def _ensure_rollups(c):
+    """Create the trend rollups and the triggers that maintain them in the writing transaction"""
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trend_rollups'").fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS trend_rollups (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        department TEXT NOT NULL,
+        emails INTEGER NOT NULL DEFAULT 0,
+        confidence_sum REAL NOT NULL DEFAULT 0,
+        fallbacks INTEGER NOT NULL DEFAULT 0,
+        reviews INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, bucket, department)
+    ) WITHOUT ROWID''')
+    
+    for table in _ROLLUP_METRICS:
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table} BEGIN
+            {'; '.join(_rollup_statements(table, 'new'))};
+        END''')
+    # A replaced classification (reprocessed email) moves its contribution to the new row
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS classifications_rollup_delete AFTER DELETE ON classifications BEGIN
+        {'; '.join(_rollup_statements('classifications', 'old', -1))};
+    END''')
+    # Likewise a replaced review item (an email queued again); purge_reviewed() keeps
+    # purged items' inflow itself. Earlier versions skipped reviewed rows here.
+    c.execute('DROP TRIGGER IF EXISTS review_queue_rollup_delete')
+    c.execute(f'''CREATE TRIGGER review_queue_rollup_delete AFTER DELETE ON review_queue BEGIN
+        {'; '.join(_rollup_statements('review_queue', 'old', -1))};
+    END''')
+    
+    if not exists:
+        for table in _ROLLUP_METRICS:
+            for statement in _rollup_statements(table, 'r', source=f'{table} r, '):
+                c.execute(statement)
+
+def _email_text(content: Optional[str]) -> str:
+    """Searchable text of an email body (tags and signature stripped)"""
+    return clean_email_content(content) if content else ''
+
+def _register_functions(conn: sqlite3.Connection):
+    """SQL functions the search-index triggers call; every writing connection needs them"""
+    conn.create_function('email_text', 1, _email_text, deterministic=True)
+
+def _ensure_search_index(c, table: str):
+    """Create {table}_fts and the triggers that keep it in sync, indexing existing rows once"""
+    fts = f'{table}_fts'
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).fetchone()
+    # The index keeps its own copy of the cleaned text so snippets show readable text
+    c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(subject, sender, body, tokenize='porter unicode61')")
+    
+    row = "(rowid, subject, sender, body) VALUES (new.id, new.subject, new.sender, email_text(new.content))"
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts} {row};
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        DELETE FROM {fts} WHERE rowid = old.id;
+    END''')
+    # Retention compaction nulls the body, so compacted emails stay findable by subject and sender
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF subject, sender, content ON {table} BEGIN
+        DELETE FROM {fts} WHERE rowid = old.id;
+        INSERT INTO {fts} {row};
+    END''')
+    
+    if not exists:
+        c.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', ?)", (SEARCH_RANK,))
+        c.execute(f'''INSERT INTO {fts} (rowid, subject, sender, body)
+                      SELECT id, subject, sender, email_text(content) FROM {table}''')
+
+def _ensure_column(c, table: str, column: str, ddl: str):
+    """Add a column to an existing table if it is missing"""
+    existing = {row[1] for row in c.execute(f'PRAGMA table_info({table})')}
+    if column not in existing:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
 @contextmanager
 def get_db():
     """Context manager for database connections"""
+    init_db()
     conn = sqlite3.connect(DATABASE_FILE)
     conn.row_factory = sqlite3.Row
+    _register_functions(conn)
+    # INSERT OR REPLACE only fires the delete triggers (keeping the search index in sync) with this on
+    conn.execute('PRAGMA recursive_triggers = ON')
     try:
         yield conn
     finally:
         conn.close()
 
 def save_classification(email_id: str, sender: str, subject: str, content: str, 
-                       categories: str, confidence: float, recipients: str, status: str = "forwarded"):
+                       categories: str, confidence: float, recipients: str, status: str = "forwarded",
+                       thread_id: Optional[str] = None, source: str = "llm"):
     """Save email classification to database"""
     with get_db() as conn:
         c = conn.cursor()
         c.execute('''INSERT OR REPLACE INTO classifications 
-                     (email_id, sender, subject, content, categories, confidence, recipients, status)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (email_id, sender, subject, content, categories, confidence, recipients, status))
+                     (email_id, sender, subject, content, categories, confidence, recipients, status, thread_id, source)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  (email_id, sender, subject, content, categories, confidence, recipients, status, thread_id, source))
         conn.commit()
 
 def add_to_review_queue(email_id: str, sender: str, subject: str, content: str, reason: str):
@@ -86,6 +301,26 @@ def add_to_review_queue(email_id: str, sender: str, subject: str, content: str,
                   (email_id, sender, subject, content, reason))
         conn.commit()
 
+def save_run_rows(classifications: List[tuple], reviews: List[tuple], steps: List[tuple],
+                  outbox: List[tuple] = ()):
+    """Write buffered classification, review-queue, ledger and outbox rows in a single transaction.
+    
+    Rows use the column order of save_classification, add_to_review_queue,
+    record_step and (email_id, kind, user_email, recipient, raw) for the outbox.
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        c.executemany('''INSERT OR REPLACE INTO classifications 
+                         (email_id, sender, subject, content, categories, confidence, recipients, status, thread_id, source)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', classifications)
+        c.executemany('''INSERT OR REPLACE INTO review_queue 
+                         (email_id, sender, subject, content, reason)
+                         VALUES (?, ?, ?, ?, ?)''', reviews)
+        c.executemany('INSERT OR IGNORE INTO pipeline_steps (email_id, step) VALUES (?, ?)', steps)
+        c.executemany('''INSERT OR IGNORE INTO outbox (email_id, kind, user_email, recipient, raw)
+                         VALUES (?, ?, ?, ?, ?)''', outbox)
+        conn.commit()
+
 def get_pending_reviews() -> List[Dict[str, Any]]:
     """Get all pending reviews from queue"""
     with get_db() as conn:
@@ -94,6 +329,14 @@ def get_pending_reviews() -> List[Dict[str, Any]]:
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+def get_review(review_id: int) -> Optional[Dict[str, Any]]:
+    """Get a single review queue item"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('SELECT * FROM review_queue WHERE id = ?', (review_id,))
+        row = c.fetchone()
+        return dict(row) if row else None
+
 def mark_review_completed(review_id: int):
     """Mark a review as completed"""
     with get_db() as conn:
@@ -101,6 +344,27 @@ def mark_review_completed(review_id: int):
         c.execute('UPDATE review_queue SET reviewed = 1 WHERE id = ?', (review_id,))
         conn.commit()
 
+def get_reviews(review_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Get review queue items by id (missing ids are left out)"""
+    if not review_ids:
+        return {}
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT * FROM review_queue WHERE id IN ({','.join('?' * len(review_ids))})", review_ids)
+        return {row['id']: dict(row) for row in c.fetchall()}
+
+def complete_reviews(review_ids: List[int], forwarded_email_ids: List[str], sender_routes: List[tuple]):
+    """Apply a bulk review in one transaction: mark items reviewed, record forwards in the ledger
+    and add the team lead's (route_key, department, weight) observations to sender_routes
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        c.executemany('UPDATE review_queue SET reviewed = 1 WHERE id = ?', [(review_id,) for review_id in review_ids])
+        c.executemany("INSERT OR IGNORE INTO pipeline_steps (email_id, step) VALUES (?, 'forwarded')",
+                      [(email_id,) for email_id in forwarded_email_ids])
+        c.executemany(_SENDER_ROUTES_UPSERT, sender_routes)
+        conn.commit()
+
 def get_classification_history(limit: int = 50) -> List[Dict[str, Any]]:
     """Get recent classification history"""
     with get_db() as conn:
@@ -109,6 +373,543 @@ def get_classification_history(limit: int = 50) -> List[Dict[str, Any]]:
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+# ========== SEARCH FUNCTIONS ==========
+
+# "quoted phrases" or single words; everything else (FTS5 operators, punctuation) is dropped
+_SEARCH_TERM_RE = re.compile(r'"([^"]*)"|(\w+)')
+# Columns returned per table besides the shared ones
+_SEARCH_COLUMNS = {
+    'classifications': 't.categories, t.confidence, t.recipients, t.status',
+    'review_queue': 't.reason, t.reviewed',
+}
+_SEARCH_KINDS = {'classifications': 'classification', 'review_queue': 'review'}
+# Beyond this many hits, results are ordered newest first instead of by relevance
+SEARCH_RANK_MAX_HITS = 10000
+
+def _match_expression(query: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query where every term must match; the last word also matches as a prefix"""
+    terms = []
+    for phrase, word in _SEARCH_TERM_RE.findall(query):
+        words = re.findall(r'\w+', phrase) if phrase else [word]
+        if words:
+            terms.append('"' + ' '.join(words) + '"')
+    if not terms:
+        return None
+    if not query.rstrip().endswith('"'):
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def search_emails(query: str, tables: List[str], department: Optional[str] = None,
+                  since: Optional[str] = None, until: Optional[str] = None,
+                  limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Full-text search over classifications and/or the review queue, best matches first.
+    
+    Subject matches outrank sender matches, which outrank body matches. When a
+    query matches more than SEARCH_RANK_MAX_HITS emails, ranking them all would
+    take too long, so results come newest first instead and `total` stops
+    counting there (`total_exact` is false). Each result carries a `snippet`
+    with the matched terms wrapped in **. Review-queue items have no
+    department, so `department` limits the search to classifications;
+    `since`/`until` bound created_at.
+    """
+    match = _match_expression(query)
+    if match is None:
+        return {"total": 0, "total_exact": True, "order": "relevance", "results": []}
+    
+    searches = []
+    for table in tables:
+        if department and table != 'classifications':
+            continue
+        filters, params = '', [match]
+        if department:
+            filters += ' AND t.categories LIKE ?'
+            params.append(f'%"{department}"%')
+        if since:
+            filters += ' AND t.created_at >= ?'
+            params.append(since)
+        if until:
+            filters += ' AND t.created_at < ?'
+            params.append(until)
+        fts = f'{table}_fts'
+        searches.append((table, f'{fts} JOIN {table} t ON t.id = {fts}.rowid WHERE {fts} MATCH ?{filters}', params))
+    
+    with get_db() as conn:
+        c = conn.cursor()
+        total = 0
+        for table, source, params in searches:
+            total += c.execute(f'SELECT count(*) FROM (SELECT 1 FROM {source} LIMIT ?)',
+                               params + [SEARCH_RANK_MAX_HITS + 1]).fetchone()[0]
+        ranked = total <= SEARCH_RANK_MAX_HITS
+        total = min(total, SEARCH_RANK_MAX_HITS)
+        
+        # Pick the page from each table's top offset+limit, then load only those rows
+        candidates = []
+        for table, source, params in searches:
+            fts = f'{table}_fts'
+            rank, order = (f'{fts}.rank', f'{fts}.rank') if ranked else ('NULL', f'{fts}.rowid DESC')
+            c.execute(f'SELECT t.id, {rank} AS rank, t.created_at FROM {source} ORDER BY {order} LIMIT ?',
+                      params + [offset + limit])
+            candidates += [(table, row['id'], row['rank'], row['created_at']) for row in c.fetchall()]
+        if ranked:
+            candidates.sort(key=lambda cand: cand[2])
+        else:
+            candidates.sort(key=lambda cand: cand[3] or '', reverse=True)
+        page = candidates[offset:offset + limit]
+        
+        rows = {}
+        for table, _, _ in searches:
+            ids = [cand[1] for cand in page if cand[0] == table]
+            if not ids:
+                continue
+            fts = f'{table}_fts'
+            c.execute(f'''SELECT t.id, t.email_id, t.sender, t.subject, t.created_at, {_SEARCH_COLUMNS[table]},
+                                 snippet({fts}, -1, '**', '**', '…', 16) AS snippet
+                          FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+                          WHERE {fts} MATCH ? AND {fts}.rowid IN ({','.join('?' * len(ids))})''', [match] + ids)
+            rows.update(((table, row['id']), row) for row in c.fetchall())
+    
+    results = [{"kind": _SEARCH_KINDS[table], **dict(rows[(table, row_id)]), "rank": rank}
+               for table, row_id, rank, _ in page if (table, row_id) in rows]
+    return {"total": total, "total_exact": ranked, "order": "relevance" if ranked else "newest",
+            "results": results}
+
+# ========== TREND FUNCTIONS ==========
+
+def _bucket_start(granularity: str, when: datetime) -> datetime:
+    """Start of the hour or day `when` falls in"""
+    if granularity == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _bucket_key(granularity: str, start: datetime) -> str:
+    return start.strftime('%Y-%m-%d %H:00:00' if granularity == 'hour' else '%Y-%m-%d')
+
+def get_trends(granularity: str, since: datetime, until: datetime,
+               department: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One entry per bucket from `since` up to `until` (UTC), read from the rollups and zero-filled.
+    
+    Each bucket has volume, average confidence, fallback rate and review-queue
+    inflow over all emails, plus volume and average confidence per department
+    (only `department` if given).
+    """
+    step = ROLLUP_BUCKETS[granularity][1]
+    start = _bucket_start(granularity, since)
+    # Exclusive end: the first bucket starting at or after `until`
+    end = _bucket_start(granularity, until)
+    if end < until:
+        end += step
+    with get_db() as conn:
+        c = conn.cursor()
+        query = '''SELECT bucket, department, emails, confidence_sum, fallbacks, reviews FROM trend_rollups
+                   WHERE granularity = ? AND bucket >= ? AND bucket < ?'''
+        params = [granularity, _bucket_key(granularity, start), _bucket_key(granularity, end)]
+        if department:
+            query += ' AND department IN (?, ?)'
+            params += [ROLLUP_ALL, department]
+        c.execute(query, params)
+        rows = c.fetchall()
+    
+    by_bucket: Dict[str, Dict[str, sqlite3.Row]] = {}
+    for row in rows:
+        by_bucket.setdefault(row['bucket'], {})[row['department']] = row
+    
+    def average(row: sqlite3.Row) -> Optional[float]:
+        return round(row['confidence_sum'] / row['emails'], 3) if row['emails'] > 0 else None
+    
+    trends = []
+    current = start
+    while current < end:
+        key = _bucket_key(granularity, current)
+        bucket = by_bucket.get(key, {})
+        totals = bucket.get(ROLLUP_ALL)
+        emails = totals['emails'] if totals else 0
+        trends.append({
+            "bucket": key,
+            "emails": emails,
+            "avg_confidence": average(totals) if totals else None,
+            "fallback_rate": round(totals['fallbacks'] / emails, 3) if emails > 0 else None,
+            "review_inflow": totals['reviews'] if totals else 0,
+            "departments": {
+                name: {"emails": row['emails'], "avg_confidence": average(row)}
+                for name, row in bucket.items() if name != ROLLUP_ALL and row['emails'] > 0
+            },
+        })
+        current += step
+    return trends
+
+def get_department_totals() -> Dict[str, int]:
+    """All-time classified emails per department, summed from the daily rollups (ROLLUP_ALL = every email)"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT department, SUM(emails) AS emails FROM trend_rollups
+                     WHERE granularity = 'day' GROUP BY department''')
+        return {row['department']: row['emails'] for row in c.fetchall() if row['emails'] > 0}
+
+# ========== RETENTION / ARCHIVE FUNCTIONS ==========
+
+# Columns copied into archive databases
+ARCHIVE_TABLES = {
+    'classifications': '''email_id TEXT PRIMARY KEY, sender TEXT, subject TEXT, content TEXT, categories TEXT,
+                          confidence REAL, recipients TEXT, status TEXT, thread_id TEXT, source TEXT,
+                          created_at TIMESTAMP''',
+    'review_queue': '''email_id TEXT PRIMARY KEY, sender TEXT, subject TEXT, content TEXT, reason TEXT,
+                       reviewed INTEGER, created_at TIMESTAMP''',
+}
+
+def _archive_columns(table: str) -> str:
+    return ', '.join(col.split()[0] for col in ARCHIVE_TABLES[table].split(','))
+
+def _archive_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"{month}.db")
+
+def _copy_to_archive(c, table: str, rows: List[sqlite3.Row]):
+    """Copy rows (with `id` and `month` keys) into their months' archive databases"""
+    by_month: Dict[str, List[int]] = {}
+    for row in rows:
+        by_month.setdefault(row['month'], []).append(row['id'])
+    
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    columns = _archive_columns(table)
+    for month, ids in by_month.items():
+        c.execute('ATTACH DATABASE ? AS archive', (_archive_path(month),))
+        try:
+            c.execute(f'CREATE TABLE IF NOT EXISTS archive.{table} ({ARCHIVE_TABLES[table]})')
+            placeholders = ','.join('?' * len(ids))
+            c.execute(f'''INSERT OR REPLACE INTO archive.{table} ({columns})
+                          SELECT {columns} FROM main.{table} WHERE id IN ({placeholders})''', ids)
+            c.connection.commit()
+        finally:
+            c.execute('DETACH DATABASE archive')
+
+def compact_classifications(cutoff: str, limit: int, archive: bool = False) -> int:
+    """Drop the body of up to `limit` classifications created before `cutoff`, keeping metadata.
+    
+    With `archive`, full rows are first copied into monthly archive databases.
+    Returns how many rows were compacted.
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id, strftime('%Y-%m', created_at) AS month FROM classifications
+                     WHERE created_at < ? AND content IS NOT NULL ORDER BY id LIMIT ?''', (cutoff, limit))
+        rows = c.fetchall()
+        if not rows:
+            return 0
+        
+        if archive:
+            # Copy first: if compaction is interrupted the copy is simply redone
+            _copy_to_archive(c, 'classifications', rows)
+        
+        ids = [row['id'] for row in rows]
+        c.execute(f"UPDATE classifications SET content = NULL WHERE id IN ({','.join('?' * len(ids))})", ids)
+        conn.commit()
+        return len(ids)
+
+def purge_reviewed(cutoff: str, limit: int, archive: bool = False) -> int:
+    """Delete up to `limit` reviewed review-queue items created before `cutoff` (archiving them first if asked)"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id, strftime('%Y-%m', created_at) AS month FROM review_queue
+                     WHERE created_at < ? AND reviewed = 1 ORDER BY id LIMIT ?''', (cutoff, limit))
+        rows = c.fetchall()
+        if not rows:
+            return 0
+        
+        if archive:
+            _copy_to_archive(c, 'review_queue', rows)
+        
+        ids = [row['id'] for row in rows]
+        placeholders = ','.join('?' * len(ids))
+        # Their arrival still counts as inflow: add back what the delete trigger takes away
+        for statement in _rollup_statements('review_queue', 'r',
+                                            source=f'(SELECT * FROM review_queue WHERE id IN ({placeholders})) r, '):
+            c.execute(statement, ids)
+        c.execute(f"DELETE FROM review_queue WHERE id IN ({placeholders})", ids)
+        conn.commit()
+        return len(ids)
+
+def incremental_vacuum_enabled() -> bool:
+    with get_db() as conn:
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+def incremental_vacuum() -> int:
+    """Return free pages to the filesystem; returns how many pages were freed.
+    
+    A no-op on a database created before auto_vacuum was enabled, until an
+    admin converts it with convert_to_incremental_vacuum().
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        if c.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            print("⚠️ Database not in incremental auto-vacuum mode; freed pages stay in the file "
+                  "until it is converted (POST /api/admin/vacuum)")
+            return 0
+        free_pages = c.execute('PRAGMA freelist_count').fetchone()[0]
+        # executescript steps the pragma to completion; execute() frees a single page
+        conn.executescript('PRAGMA incremental_vacuum')
+        # Move the shrink from the WAL into the database file
+        c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return free_pages - c.execute('PRAGMA freelist_count').fetchone()[0]
+
+def convert_to_incremental_vacuum() -> bool:
+    """Switch an existing database to incremental auto-vacuum with a full VACUUM.
+    
+    Rewrites the whole file and blocks every other write while it runs, so it
+    is a one-off maintenance step, never part of the scheduled retention job.
+    Returns False if the database was already converted.
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        if c.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        print("🧹 Converting database to incremental auto-vacuum (full VACUUM)...")
+        c.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        c.execute('VACUUM')
+        c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return True
+
+def list_archive_months() -> List[str]:
+    """Months that have an archive database, newest first"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted((name[:-3] for name in os.listdir(ARCHIVE_DIR) if name.endswith('.db')), reverse=True)
+
+def get_archived_history(month: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Get classifications from a month's archive database, attached for this query"""
+    if month not in list_archive_months():
+        return []
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('ATTACH DATABASE ? AS archive', (_archive_path(month),))
+        try:
+            c.execute('''SELECT name FROM archive.sqlite_master WHERE type = 'table' AND name = 'classifications' ''')
+            if c.fetchone() is None:
+                return []
+            c.execute('SELECT * FROM archive.classifications ORDER BY created_at DESC LIMIT ?', (limit,))
+            return [dict(row) for row in c.fetchall()]
+        finally:
+            c.execute('DETACH DATABASE archive')
+
+def get_thread_classifications(thread_id: str, exclude_email_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get earlier classifications in a Gmail thread, newest first"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT email_id, sender, categories, confidence, recipients, source, created_at
+                     FROM classifications
+                     WHERE thread_id = ? AND email_id != ?
+                     ORDER BY created_at DESC, id DESC''',
+                  (thread_id, exclude_email_id or ''))
+        rows = c.fetchall()
+        return [dict(row) for row in rows]
+
+# ========== SENDER ROUTES FUNCTIONS ==========
+
+_SENDER_ROUTES_UPSERT = '''INSERT INTO sender_routes (route_key, department, hits)
+                           VALUES (?, ?, ?)
+                           ON CONFLICT (route_key, department)
+                           DO UPDATE SET hits = hits + excluded.hits, updated_at = CURRENT_TIMESTAMP'''
+
+def get_sender_routes() -> List[Dict[str, Any]]:
+    """Get all learned sender/domain -> department counts"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('SELECT route_key, department, hits FROM sender_routes')
+        rows = c.fetchall()
+        return [dict(row) for row in rows]
+
+def record_sender_routes(route_keys: List[str], department: str, weight: float = 1.0):
+    """Add `weight` observations of `department` for each sender/domain key"""
+    add_sender_routes([(key, department, weight) for key in route_keys])
+
+def add_sender_routes(rows: List[tuple]):
+    """Add many (route_key, department, weight) observations in one transaction"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.executemany(_SENDER_ROUTES_UPSERT, rows)
+        conn.commit()
+
+def get_learnable_classifications(min_confidence: float) -> List[Dict[str, Any]]:
+    """Get confident LLM decisions, used to backfill sender_routes"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT sender, categories FROM classifications
+                     WHERE source = 'llm' AND confidence >= ?''', (min_confidence,))
+        rows = c.fetchall()
+        return [dict(row) for row in rows]
+
+# ========== SENDER PRIORITIES FUNCTIONS ==========
+
+def get_sender_priorities() -> List[Dict[str, Any]]:
+    """Get the sender importance table"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('SELECT id, pattern, weight, created_at FROM sender_priorities ORDER BY weight DESC, pattern')
+        rows = c.fetchall()
+        return [dict(row) for row in rows]
+
+def add_sender_priority(pattern: str, weight: int) -> int:
+    """Add or update an important sender address or '@domain'"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''INSERT INTO sender_priorities (pattern, weight) VALUES (?, ?)
+                     ON CONFLICT (pattern) DO UPDATE SET weight = excluded.weight''',
+                  (pattern.lower(), weight))
+        conn.commit()
+        c.execute('SELECT id FROM sender_priorities WHERE pattern = ?', (pattern.lower(),))
+        return c.fetchone()['id']
+
+def delete_sender_priority(priority_id: int):
+    """Remove a sender from the importance table"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM sender_priorities WHERE id = ?', (priority_id,))
+        conn.commit()
+
+# ========== PIPELINE LEDGER FUNCTIONS ==========
+
+def get_pipeline_progress(email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get finished steps and the saved classification for a batch of emails in one query.
+    
+    Returns {email_id: {'steps': [...], 'categories', 'confidence', 'recipients', 'source'}};
+    emails with no finished step are left out.
+    """
+    if not email_ids:
+        return {}
+    with get_db() as conn:
+        c = conn.cursor()
+        placeholders = ','.join('?' * len(email_ids))
+        c.execute(f'''SELECT p.email_id, group_concat(p.step) AS steps,
+                             c.categories, c.confidence, c.recipients, c.source
+                      FROM pipeline_steps p
+                      LEFT JOIN classifications c ON c.email_id = p.email_id
+                      WHERE p.email_id IN ({placeholders})
+                      GROUP BY p.email_id''', email_ids)
+        progress = {}
+        for row in c.fetchall():
+            progress[row['email_id']] = {**dict(row), 'steps': row['steps'].split(',')}
+        return progress
+
+def record_step(email_id: str, step: str):
+    """Mark one pipeline step as done for an email"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('INSERT OR IGNORE INTO pipeline_steps (email_id, step) VALUES (?, ?)', (email_id, step))
+        conn.commit()
+
+# ========== EMAIL CLAIMS FUNCTIONS ==========
+
+def claim_emails(email_ids: List[str], owner: str, lease_seconds: float) -> List[str]:
+    """Lease unclaimed or expired emails to `owner`; returns the ids `owner` now holds"""
+    if not email_ids:
+        return []
+    now = time.time()
+    with get_db() as conn:
+        c = conn.cursor()
+        # Take the write lock up front so check-and-claim is atomic across processes
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('DELETE FROM email_claims WHERE expires_at < ?', (now,))
+        c.executemany('INSERT OR IGNORE INTO email_claims (email_id, owner, expires_at) VALUES (?, ?, ?)',
+                      [(email_id, owner, now + lease_seconds) for email_id in email_ids])
+        placeholders = ','.join('?' * len(email_ids))
+        c.execute(f'SELECT email_id FROM email_claims WHERE owner = ? AND email_id IN ({placeholders})',
+                  [owner, *email_ids])
+        claimed = [row['email_id'] for row in c.fetchall()]
+        conn.commit()
+        return claimed
+
+def renew_claims(owner: str, lease_seconds: float) -> int:
+    """Extend every lease held by `owner`; returns how many are still held"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE email_claims SET expires_at = ? WHERE owner = ?', (time.time() + lease_seconds, owner))
+        conn.commit()
+        return c.rowcount
+
+def release_claims(owner: str):
+    """Drop every lease held by `owner`"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM email_claims WHERE owner = ?', (owner,))
+        conn.commit()
+
+# ========== OUTBOX FUNCTIONS ==========
+
+def claim_outbox(limit: int, lease_seconds: float, max_attempts: int) -> List[Dict[str, Any]]:
+    """Claim up to `limit` due messages for sending, oldest first.
+    
+    Claimed rows move to 'sending' until `lease_seconds` from now; if the
+    sender dies they become due again after that. Reclaiming an expired
+    lease counts the unfinished send as an attempt, so a message that crashes
+    or hangs the sender every time is dead-lettered after `max_attempts`.
+    """
+    now = time.time()
+    with get_db() as conn:
+        c = conn.cursor()
+        # Take the write lock up front so two senders never claim the same message
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('''SELECT id, email_id, kind, user_email, recipient, raw, attempts, status FROM outbox
+                     WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                     ORDER BY next_attempt_at, id LIMIT ?''', (now, limit))
+        rows = []
+        dead = []
+        for row in map(dict, c.fetchall()):
+            if row.pop('status') == 'sending':
+                row['attempts'] += 1
+                if row['attempts'] >= max_attempts:
+                    dead.append((row['attempts'], row['id']))
+                    continue
+            rows.append(row)
+        c.executemany("UPDATE outbox SET status = 'dead', attempts = ?, last_error = 'Send did not finish before its lease expired' WHERE id = ?",
+                      dead)
+        c.executemany("UPDATE outbox SET status = 'sending', attempts = ?, next_attempt_at = ? WHERE id = ?",
+                      [(row['attempts'], now + lease_seconds, row['id']) for row in rows])
+        conn.commit()
+        return rows
+
+def finish_outbox(sent_ids: List[int], retries: List[tuple], dead: List[tuple]):
+    """Record a send round: sent ids, (id, error, next_attempt_at) retries and (id, error) dead letters"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.executemany("UPDATE outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, attempts = attempts + 1 WHERE id = ?",
+                      [(outbox_id,) for outbox_id in sent_ids])
+        c.executemany('''UPDATE outbox SET status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+                         WHERE id = ?''', [(error, next_attempt_at, outbox_id) for outbox_id, error, next_attempt_at in retries])
+        c.executemany("UPDATE outbox SET status = 'dead', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                      [(error, outbox_id) for outbox_id, error in dead])
+        conn.commit()
+
+def get_outbox_stats() -> Dict[str, Any]:
+    """Message counts per status, the age of the oldest unsent message and the latest dead letters"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('SELECT status, COUNT(*) AS n FROM outbox GROUP BY status')
+        counts = {row['status']: row['n'] for row in c.fetchall()}
+        c.execute('''SELECT (julianday('now') - julianday(MIN(created_at))) * 86400 FROM outbox
+                     WHERE status IN ('pending', 'sending')''')
+        oldest = c.fetchone()[0]
+        c.execute('''SELECT id, email_id, kind, recipient, attempts, last_error, created_at FROM outbox
+                     WHERE status = 'dead' ORDER BY id DESC LIMIT 20''')
+        dead = [dict(row) for row in c.fetchall()]
+        return {"counts": counts, "oldest_unsent_seconds": round(oldest, 1) if oldest is not None else None,
+                "dead_letters": dead}
+
+def retry_dead_outbox() -> int:
+    """Put every dead-lettered message back in the queue with a fresh attempt budget"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0 WHERE status = 'dead'")
+        conn.commit()
+        return c.rowcount
+
+def purge_sent_outbox(cutoff: str, limit: int) -> int:
+    """Delete up to `limit` messages sent before `cutoff`"""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute('''DELETE FROM outbox WHERE id IN (
+                         SELECT id FROM outbox WHERE status = 'sent' AND sent_at < ? ORDER BY id LIMIT ?)''',
+                  (cutoff, limit))
+        conn.commit()
+        return c.rowcount
+
 def save_oauth_token(user_email: str, access_token: str, refresh_token: str, token_expiry: str):
     """Save OAuth tokens for user"""
     with get_db() as conn:
@@ -183,7 +984,4 @@ def get_team_members_by_department() -> Dict[str, List[Dict[str, Any]]]:
         })
     
     print(f"✅ Retrieved {len(members)} team members from {len(by_dept)} departments")
-    return by_dept
-
-# Initialize database on import
-init_db()
\ No newline at end of file
+    return by_dept
\ No newline at end of file
@@ -1,8 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import auth, emails, dashboard
+from routes import auth, emails, dashboard, admin
+from services import retention_service, outbox_service
+from config import get_settings
+import database as db
+import async_database as adb
+import asyncio
 
-app = FastAPI(title="Email Auto-Routing System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run one-time setup before serving the first request"""
+    db.init_db()
+    adb.start()
+    retention = None
+    if get_settings().RETENTION_DAYS > 0:
+        retention = asyncio.create_task(retention_service.run_periodically())
+    outbox = asyncio.create_task(outbox_service.run_periodically())
+    yield
+    outbox.cancel()
+    if retention is not None:
+        retention.cancel()
+    await adb.shutdown()
+
+app = FastAPI(title="Email Auto-Routing System", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +36,7 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(emails.router, prefix="/api/emails", tags=["emails"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 def root():
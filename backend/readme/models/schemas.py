@@ -11,6 +11,8 @@ class EmailClassification(BaseModel):
     confidence: float
     recipients: List[str]
     status: str
+    thread_id: Optional[str] = None
+    source: str = "llm"
 
 class ReviewQueueItem(BaseModel):
     id: int
@@ -23,10 +25,9 @@ class ReviewQueueItem(BaseModel):
     created_at: datetime
 
 class ClassificationResponse(BaseModel):
-    categories: List[str]
+    # Compact department IDs from the prompt; recipients are resolved locally
+    departments: List[str]
     confidence: float
-    recipients: List[str]
-    reasoning: Optional[str] = None
 
 class DashboardStats(BaseModel):
     total_classified: int
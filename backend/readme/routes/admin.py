@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional
+from services import profiling_service
+from config import get_settings
+import async_database as adb
+import secrets
+
+settings = get_settings()
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Only callers presenting ADMIN_TOKEN; every admin endpoint is off while it is unset"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not secrets.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+class ProfilingRequest(BaseModel):
+    # Profile this many upcoming processing runs
+    runs: int = 1
+    # Only runs processing this mailbox
+    user_email: Optional[str] = None
+    interval_ms: Optional[float] = None
+
+# ========== PROFILING API ENDPOINTS ==========
+
+@router.get("/profiling")
+def get_profiling_status():
+    """Whether profiling is armed, and the profiles captured so far"""
+    return profiling_service.status()
+
+@router.post("/profiling")
+def arm_profiling(request: ProfilingRequest):
+    """Capture a sampling profile of the next N processing runs"""
+    if request.runs < 1:
+        raise HTTPException(status_code=400, detail="runs must be at least 1")
+    if request.interval_ms is not None and request.interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    return {"armed": profiling_service.arm(request.runs, request.user_email, request.interval_ms)}
+
+@router.delete("/profiling")
+def disarm_profiling():
+    """Stop profiling runs that haven't started yet"""
+    return {"armed": profiling_service.disarm()}
+
+@router.get("/profiling/{profile_id}")
+def download_profile(profile_id: int):
+    """A captured profile as collapsed stacks, ready for flamegraph.pl or speedscope"""
+    profile = profiling_service.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (only the latest PROFILING_KEEP are kept)")
+    return PlainTextResponse(
+        profiling_service.folded(profile),
+        headers={"Content-Disposition": f'attachment; filename="emailia-profile-{profile_id}.folded"'}
+    )
+
+# ========== MAINTENANCE API ENDPOINTS ==========
+
+@router.post("/vacuum")
+async def convert_to_incremental_vacuum():
+    """One-off: switch a database created before incremental auto-vacuum, so retention can shrink it.
+    
+    Runs a full VACUUM, which rewrites the database and holds up every write
+    (including processing runs) until it finishes; run it in a quiet period.
+    """
+    try:
+        return {"converted": await adb.convert_to_incremental_vacuum()}
+    except Exception as e:
+        print(f"❌ VACUUM failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,5 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import RedirectResponse
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from config import get_settings
 import json
 from pathlib import Path
@@ -18,6 +15,8 @@ SCOPES = [
 
 def get_flow():
     """Create OAuth flow"""
+    from google_auth_oauthlib.flow import Flow
+
     flow = Flow.from_client_config(
         {
             "web": {
@@ -58,6 +57,7 @@ def oauth_callback(code: str, state: str):
         print(f"✅ Token fetched successfully")
         
         # Get user email
+        from googleapiclient.discovery import build
         service = build('gmail', 'v1', credentials=credentials)
         profile = service.users().getProfile(userId='me').execute()
         user_email = profile['emailAddress']
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime, timezone
+from services import scheduler_service, retention_service, outbox_service, prefilter_service, budget_service, classifier_service
 import database as db
-import json
+import async_database as adb
 
 router = APIRouter()
 
@@ -11,15 +13,43 @@ class TeamMember(BaseModel):
     email: str
     department: str
 
+class SenderPriority(BaseModel):
+    pattern: str
+    weight: int = 3
+
 @router.get("/history")
-def get_classification_history(limit: int = 50):
-    """Get recent email classifications with team member names"""
+def get_classification_history(limit: int = 50, month: Optional[str] = None):
+    """Get recent email classifications with team member names (from an archive month if given, e.g. 2025-01)"""
     try:
+        if month:
+            return {"history": db.get_archived_history(month, limit), "month": month}
         history = db.get_classification_history(limit)
         return {"history": history}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# scope -> tables searched
+SEARCH_SCOPES = {
+    "all": list(db.SEARCH_TABLES),
+    "classifications": ["classifications"],
+    "reviews": ["review_queue"],
+}
+
+@router.get("/search")
+async def search_emails(q: str, scope: str = "all", department: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        limit: int = 20, offset: int = 0):
+    """Full-text search over past classifications and the review queue (subject, sender, body), ranked, with snippets"""
+    if scope not in SEARCH_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(SEARCH_SCOPES)}")
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    try:
+        found = await adb.search_emails(q, SEARCH_SCOPES[scope], department, since, until, limit, offset)
+        return {"query": q, "scope": scope, "limit": limit, "offset": offset, **found}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/pending-reviews")
 def get_pending_reviews():
     """Get emails awaiting team lead review"""
@@ -33,22 +63,13 @@ def get_pending_reviews():
 def get_dashboard_stats():
     """Get overall statistics"""
     try:
-        history = db.get_classification_history(limit=1000)
-        total_processed = len(history)
+        # Department counts come from the trend rollups instead of scanning raw rows
+        dept_stats = db.get_department_totals()
+        total_processed = dept_stats.pop(db.ROLLUP_ALL, 0)
         
         reviews = db.get_pending_reviews()
         pending_reviews = len(reviews)
         
-        # Calculate department distribution
-        dept_stats = {}
-        for item in history:
-            try:
-                categories = json.loads(item['categories']) if isinstance(item['categories'], str) else item['categories']
-                for cat in categories:
-                    dept_stats[cat] = dept_stats.get(cat, 0) + 1
-            except:
-                pass
-        
         return {
             "total_processed": total_processed,
             "pending_reviews": pending_reviews,
@@ -58,6 +79,32 @@ def get_dashboard_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# granularity -> default window when `since` is not given
+TREND_WINDOWS = {"hour": 48, "day": 30}
+MAX_TREND_BUCKETS = 2000
+
+@router.get("/trends")
+async def get_trends(granularity: str = "hour", since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, department: Optional[str] = None):
+    """Per-hour or per-day volume by department, average confidence, fallback rate and review inflow (UTC buckets)"""
+    if granularity not in TREND_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(TREND_WINDOWS)}")
+    step = db.ROLLUP_BUCKETS[granularity][1]
+    # Rollup buckets are naive UTC, like sqlite's CURRENT_TIMESTAMP
+    until = until.astimezone(timezone.utc).replace(tzinfo=None) if until and until.tzinfo else until
+    since = since.astimezone(timezone.utc).replace(tzinfo=None) if since and since.tzinfo else since
+    until = until or datetime.utcnow()
+    since = since or until - TREND_WINDOWS[granularity] * step
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if (until - since) / step > MAX_TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TREND_BUCKETS} buckets per request")
+    try:
+        trends = await adb.get_trends(granularity, since, until, department)
+        return {"granularity": granularity, "department": department, "buckets": trends}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/email-details/{email_id}")
 def get_email_details(email_id: str):
     """Get details of a specific email"""
@@ -80,7 +127,7 @@ async def get_team_members():
     """Get all team members from database"""
     try:
         print("📥 GET /team-members - Fetching all team members")
-        members = db.get_all_team_members()
+        members = await adb.get_all_team_members()
         print(f"✅ Retrieved {len(members)} team members")
         return {"members": members}
     except Exception as e:
@@ -93,7 +140,7 @@ async def add_team_member(member: TeamMember):
     try:
         print(f"📝 POST /team-members - Adding: {member.name} ({member.email}) to {member.department}")
         
-        member_id = db.add_team_member(
+        member_id = await adb.add_team_member(
             name=member.name,
             email=member.email,
             department=member.department
@@ -151,11 +198,110 @@ async def delete_team_member(member_id: int):
     try:
         print(f"🗑️ DELETE /team-members/{member_id}")
         
-        db.delete_team_member(member_id)
+        await adb.delete_team_member(member_id)
         
         print(f"✅ Team member {member_id} deleted")
         
         return {"message": "Team member deleted successfully"}
     except Exception as e:
         print(f"❌ Error deleting team member: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ========== SCHEDULER API ENDPOINTS ==========
+
+@router.get("/scheduler")
+def get_scheduler_stats():
+    """Classification queue depth and wait times by priority"""
+    return scheduler_service.stats()
+
+@router.get("/run-budget")
+def get_run_budget():
+    """Processing run limits, the per-email latency and LLM-share estimates, and the last run's budget"""
+    return budget_service.status()
+
+@router.get("/sender-priorities")
+async def get_sender_priorities():
+    """Get the sender importance table used for scheduling"""
+    try:
+        return {"priorities": await adb.get_sender_priorities()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sender-priorities")
+async def add_sender_priority(priority: SenderPriority):
+    """Add or update an important sender (address or '@domain')"""
+    try:
+        print(f"📝 POST /sender-priorities - {priority.pattern} (weight {priority.weight})")
+        priority_id = await adb.add_sender_priority(priority.pattern, priority.weight)
+        return {
+            "message": "Sender priority saved",
+            "priority": {"id": priority_id, "pattern": priority.pattern.lower(), "weight": priority.weight}
+        }
+    except Exception as e:
+        print(f"❌ Error saving sender priority: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/sender-priorities/{priority_id}")
+async def delete_sender_priority(priority_id: int):
+    """Remove a sender from the importance table"""
+    try:
+        await adb.delete_sender_priority(priority_id)
+        return {"message": "Sender priority deleted"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/prefilter")
+def get_prefilter_stats():
+    """Header pre-filter settings and how many emails each rule kept away from the LLM"""
+    return prefilter_service.stats()
+
+@router.get("/llm-usage")
+def get_llm_usage():
+    """Gemini tokens per call, what resolving recipients locally and content preparation save, and how replies parsed"""
+    return {
+        "tokens": classifier_service.token_usage(),
+        "content": classifier_service.content_usage(),
+        "replies": dict(classifier_service.response_stats)
+    }
+
+# ========== OUTBOX API ENDPOINTS ==========
+
+@router.get("/outbox")
+async def get_outbox_status():
+    """Outbox depth, age of the oldest unsent message, dead letters and sender totals"""
+    try:
+        return await outbox_service.status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/outbox/retry-dead")
+async def retry_dead_letters():
+    """Requeue every dead-lettered message (e.g. after reconnecting Gmail)"""
+    try:
+        requeued = await adb.retry_dead_outbox()
+        outbox_service.wake()
+        return {"requeued": requeued}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ========== RETENTION API ENDPOINTS ==========
+
+@router.get("/retention")
+async def get_retention_status():
+    """Retention settings, last run, and the archive months available for /history?month="""
+    return {
+        **retention_service.status(),
+        "incremental_vacuum": await adb.incremental_vacuum_enabled(),
+        "archive_months": await adb.list_archive_months()
+    }
+
+@router.post("/retention/run")
+async def run_retention():
+    """Run a retention pass now instead of waiting for the schedule"""
+    if not retention_service.status()["enabled"]:
+        raise HTTPException(status_code=400, detail="Retention is disabled (RETENTION_DAYS=0)")
+    try:
+        return await retention_service.run_once()
+    except Exception as e:
+        print(f"❌ Retention run failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
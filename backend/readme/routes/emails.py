@@ -1,13 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services import gmail_service, classifier_service
-from google.oauth2.credentials import Credentials
+from typing import List, Optional
+from services import gmail_service, routing_service, sender_rules_service, scheduler_service, lease_service, ledger_service, review_service, outbox_service, prefilter_service, budget_service, profiling_service, inbox_service
+from services.ledger_service import STEP_CLASSIFIED, STEP_REPLIED, STEP_FORWARDED, STEP_MARKED_READ
 from config import get_settings
-import database as db
+import async_database as adb
 import json
-from pathlib import Path
 import asyncio
+import time
 
 router = APIRouter()
 settings = get_settings()
@@ -15,33 +16,90 @@ settings = get_settings()
 class FetchEmailsRequest(BaseModel):
     user_email: str
     max_results: int = 10
+    # Returned by a run that stopped at its budget; takes the place of max_results
+    continuation: Optional[str] = None
 
 class ManualForwardRequest(BaseModel):
     email_id: int
     recipient_email: str
     user_email: str
 
+class ReviewDecision(BaseModel):
+    review_id: int
+    departments: List[str] = []
+    recipients: List[str] = []
+    # Close the item without forwarding it
+    dismiss: bool = False
+
+class BulkReviewRequest(BaseModel):
+    user_email: str
+    decisions: List[ReviewDecision]
+
 def get_token_data(user_email: str) -> dict:
     """Load token data from file and convert to expected format"""
-    token_file = Path(f"tokens/{user_email}_token.json")
+    token_data = gmail_service.load_token_data(user_email)
     
-    if not token_file.exists():
+    if token_data is None:
         raise HTTPException(status_code=401, detail="No authentication found. Please connect your Gmail account.")
     
-    with open(token_file, 'r') as f:
-        token_data = json.load(f)
-    
-    return {
-        'access_token': token_data['token'],
-        'refresh_token': token_data['refresh_token'],
-        'token_uri': token_data['token_uri'],
-        'client_id': token_data['client_id'],
-        'client_secret': token_data['client_secret'],
-        'scopes': token_data.get('scopes', [])
-    }
+    return token_data
+
+def requested_emails(user_email: str, max_results: int, continuation: Optional[str]) -> int:
+    """Emails a run is asked for: max_results, or what an earlier run's continuation token left over"""
+    if continuation:
+        try:
+            return budget_service.decode_continuation(continuation, user_email)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if max_results < 1:
+        raise HTTPException(status_code=400, detail="max_results must be at least 1")
+    return max_results
+
+def busy_message() -> str:
+    return (f"{settings.MAX_CONCURRENT_RUNS} processing runs are already in progress, "
+            f"try again in {budget_service.retry_after()}s")
 
-async def process_emails_stream(user_email: str, max_results: int):
+def mark_read_when_durable(writer: adb.BufferedWriter, token_data: dict, email_data: dict, archive: bool = False):
+    """Mark an email read (and optionally archive it) only after its buffered rows are committed"""
+    async def mark_read():
+        # Blocking Gmail round trip; in a worker thread so other requests and streams keep going
+        modify = gmail_service.archive if archive else gmail_service.mark_as_read
+        await asyncio.to_thread(modify, token_data, email_data['id'])
+        await ledger_service.record(email_data, STEP_MARKED_READ, writer)
+    return writer.when_durable(mark_read)
+
+async def finish_run(run: budget_service.Run, owner: str, writer: adb.BufferedWriter,
+                     inbox: Optional[inbox_service.InboxStream], emails: List[dict],
+                     profile: Optional[profiling_service.Sampler]):
+    """Close a processing run; the leases, scheduler queue and run slot are given back even if the last flush fails"""
+    try:
+        # Commit what is buffered (and mark those emails read) before giving up the leases
+        try:
+            if inbox is not None:
+                await inbox.close()
+        finally:
+            await writer.close()
+    finally:
+        try:
+            scheduler_service.release(emails)
+            await lease_service.release(owner)
+        finally:
+            budget_service.finish(run)
+            profiling_service.stop(profile, run.summary())
+
+async def process_emails_stream(user_email: str, requested: int):
     """Stream processing events to frontend"""
+    run = budget_service.start(user_email, requested)
+    if run is None:
+        # Nothing was claimed yet, so there is nothing to clean up
+        yield f"data: {json.dumps({'type': 'error', 'message': busy_message(), 'retry_after': budget_service.retry_after()})}\n\n"
+        return
+    
+    emails = []
+    inbox = None
+    owner = lease_service.new_owner()
+    writer = adb.BufferedWriter(settings.DB_WRITE_BATCH_SIZE, settings.DB_WRITE_BATCH_SECONDS)
+    profile = profiling_service.start(user_email)
     try:
         # Send initial status
         yield f"data: {json.dumps({'type': 'status', 'message': 'Initializing...', 'step': 1, 'total': 5})}\n\n"
@@ -53,113 +111,144 @@ async def process_emails_stream(user_email: str, max_results: int):
         await asyncio.sleep(0.1)
         
         # Fetch emails
-        yield f"data: {json.dumps({'type': 'status', 'message': f'Fetching {max_results} unread emails...', 'step': 3, 'total': 5})}\n\n"
+        yield f"data: {json.dumps({'type': 'status', 'message': f'Fetching {run.planned} unread emails...', 'step': 3, 'total': 5})}\n\n"
         await asyncio.sleep(0.1)
         
-        emails = gmail_service.fetch_unread_emails(token_data, max_results=max_results)
+        # Later pages are fetched while the first ones are processed
+        inbox = inbox_service.InboxStream(token_data, run.planned, skip_body=prefilter_service.match)
+        estimate = await inbox.open()
+        # Each chunk takes the highest-priority emails of everything prefetched so far
+        rank = await scheduler_service.ranker()
         
-        yield f"data: {json.dumps({'type': 'fetched', 'count': len(emails), 'message': f'Found {len(emails)} unread emails'})}\n\n"
+        yield f"data: {json.dumps({'type': 'fetched', 'count': estimate, 'requested': run.requested, 'limited_by': run.limited_by, 'message': f'Found {estimate} unread emails'})}\n\n"
         await asyncio.sleep(0.1)
         
-        if len(emails) == 0:
+        if estimate == 0:
             yield f"data: {json.dumps({'type': 'complete', 'message': 'No unread emails found', 'processed': 0})}\n\n"
             return
         
         # Process each email
         processed_count = 0
-        for idx, email_data in enumerate(emails, 1):
-            # Send email processing start
-            yield f"data: {json.dumps({'type': 'processing', 'current': idx, 'total': len(emails), 'subject': email_data['subject'], 'sender': email_data['sender']})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            # Classify
-            yield f"data: {json.dumps({'type': 'classifying', 'subject': email_data['subject']})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            # ✅ Rate limiting is handled inside classifier_service.classify_email()
-            # The decorator will automatically wait 6 seconds between API calls
-            classification = classifier_service.classify_email(
-                subject=email_data['subject'],
-                content=email_data['body']
-            )
+        deferred_count = 0
+        claimed_elsewhere = 0
+        batch_decisions = {}
+        idx = 0
+        # Chunks are sized to what is left of the run's time budget; the run stops between chunks
+        while (size := run.next_chunk()):
+            # Only time spent waiting for the prefetched pages counts as fetching
+            started = time.monotonic()
+            fetched = await inbox.take(size, rank)
+            run.timed("fetch", time.monotonic() - started)
+            run.attempted += len(fetched)
+            run.exhausted = len(fetched) < size
+            # Gmail's estimate can be low; never report more emails than the total
+            total = max(estimate, run.attempted)
             
-            department = classification['categories'][0] if classification['categories'] else 'Unknown'
-            recipients = classification.get('recipients', [])
+            started = time.monotonic()
+            # Another worker or tab may be processing some of the same unread emails
+            emails = await lease_service.claim(fetched, owner)
+            claimed_elsewhere += len(fetched) - len(emails)
+            # Redelivered mail (e.g. marked unread again) resumes from the ledger instead of starting over
+            emails = await ledger_service.resume(emails)
+            emails = await scheduler_service.schedule(emails, backlog=max(0, estimate - run.attempted))
+            routing_service.cluster_batch(emails)
             
-            yield f"data: {json.dumps({'type': 'classified', 'department': department, 'confidence': classification['confidence'], 'recipients': recipients})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            # Save to database
-            db.save_classification(
-                email_id=email_data['id'],
-                sender=email_data['sender'],
-                subject=email_data['subject'],
-                content=email_data['body'],
-                categories=json.dumps(classification['categories']),
-                confidence=classification['confidence'],
-                recipients=json.dumps(recipients)
-            )
-            
-            # Send auto-reply
-            yield f"data: {json.dumps({'type': 'replying', 'sender': email_data['sender']})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            sender_email = email_data['sender'].split('<')[-1].strip('>')
-            auto_reply_body = f"""Hello,
-
-Thank you for contacting us. Your email has been received and automatically routed to our {department} department.
-
-Our team will review your message and respond as soon as possible.
-
-Best regards,
-Emailia Auto-Routing System
-"""
-            
-            try:
-                gmail_service.send_email(
-                    token_data=token_data,
-                    to=sender_email,
-                    subject=f"Re: {email_data['subject']}",
-                    body=auto_reply_body
-                )
-                yield f"data: {json.dumps({'type': 'replied', 'to': sender_email})}\n\n"
-            except Exception as e:
-                yield f"data: {json.dumps({'type': 'reply_failed', 'error': str(e)})}\n\n"
-            
-            await asyncio.sleep(0.1)
-            
-            # Add to review queue if low confidence
-            if classification['confidence'] < 0.7:
-                db.add_to_review_queue(
-                    email_id=email_data['id'],
-                    sender=email_data['sender'],
-                    subject=email_data['subject'],
-                    content=email_data['body'],
-                    reason=f"Low confidence: {classification['confidence']}"
-                )
-                yield f"data: {json.dumps({'type': 'review_queued', 'reason': 'Low confidence'})}\n\n"
+            # Thread replies, near-duplicates and known senders reuse earlier decisions; everything
+            # else goes to the classifier, with up to GEMINI_MAX_CONCURRENCY emails classified ahead
+            # of the one being reported. Events still come out in batch order.
+            async for email_data, classification in routing_service.route_batch(emails, batch_decisions):
+                idx += 1
+                # Send email processing start
+                yield f"data: {json.dumps({'type': 'processing', 'current': idx, 'total': total, 'subject': email_data['subject'], 'sender': email_data['sender']})}\n\n"
                 await asyncio.sleep(0.1)
+                
+                # Classify
+                yield f"data: {json.dumps({'type': 'classifying', 'subject': email_data['subject']})}\n\n"
+                await asyncio.sleep(0.1)
+                
+                if classification is None:
+                    deferred_count += 1
+                    yield f"data: {json.dumps({'type': 'deferred', 'current': idx, 'total': total, 'priority': email_data.get('priority')})}\n\n"
+                    await asyncio.sleep(0.1)
+                    continue
+                
+                department = classification['categories'][0] if classification['categories'] else 'Unknown'
+                recipients = classification.get('recipients', [])
+                
+                yield f"data: {json.dumps({'type': 'classified', 'department': department, 'confidence': classification['confidence'], 'recipients': recipients, 'source': classification.get('source', 'llm')})}\n\n"
+                await asyncio.sleep(0.1)
+                
+                if ledger_service.needs(email_data, STEP_CLASSIFIED):
+                    # Save to database
+                    await writer.save_classification(
+                        email_id=email_data['id'],
+                        sender=email_data['sender'],
+                        subject=email_data['subject'],
+                        content=email_data['body'],
+                        categories=json.dumps(classification['categories']),
+                        confidence=classification['confidence'],
+                        recipients=json.dumps(recipients),
+                        thread_id=email_data.get('thread_id'),
+                        source=classification.get('source', 'llm')
+                    )
+                
+                    # Add to review queue if low confidence
+                    if classification['confidence'] < settings.CONFIDENCE_THRESHOLD:
+                        await writer.add_to_review_queue(
+                            email_id=email_data['id'],
+                            sender=email_data['sender'],
+                            subject=email_data['subject'],
+                            content=email_data['body'],
+                            reason=f"Low confidence: {classification['confidence']}"
+                        )
+                        yield f"data: {json.dumps({'type': 'review_queued', 'reason': 'Low confidence'})}\n\n"
+                        await asyncio.sleep(0.1)
+                
+                    await ledger_service.record(email_data, STEP_CLASSIFIED, writer)
+                
+                if ledger_service.needs(email_data, STEP_REPLIED):
+                    # Automated mail never gets a reply (no auto-reply loops); the step is still done
+                    if classification.get('source') != prefilter_service.SOURCE:
+                        # Committed with the classification; the outbox sender delivers it in the background
+                        sender_email = await outbox_service.enqueue_reply(writer, user_email, email_data, department)
+                        yield f"data: {json.dumps({'type': 'reply_queued', 'to': sender_email})}\n\n"
+                        await asyncio.sleep(0.1)
+                    await ledger_service.record(email_data, STEP_REPLIED, writer)
+                
+                # Mark as read, once the email's rows are committed
+                if ledger_service.needs(email_data, STEP_MARKED_READ):
+                    await mark_read_when_durable(writer, token_data, email_data,
+                                                 archive=prefilter_service.should_archive(classification))
+                
+                processed_count += 1
+                run.record(classification)
+                yield f"data: {json.dumps({'type': 'email_complete', 'current': idx, 'total': total})}\n\n"
+                await asyncio.sleep(0.1)
+                await lease_service.keep_alive(owner)
+                
+                # ✅ No additional sleep needed here - rate limiting is handled inside classifier_service
             
-            # Mark as read
-            gmail_service.mark_as_read(token_data, email_data['id'])
-            
-            processed_count += 1
-            yield f"data: {json.dumps({'type': 'email_complete', 'current': idx, 'total': len(emails)})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            # ✅ No additional sleep needed here - rate limiting is handled by the decorator in classifier_service
+            scheduler_service.release(emails)
+            run.timed("process", time.monotonic() - started)
         
-        # Send completion
-        yield f"data: {json.dumps({'type': 'complete', 'message': f'Successfully processed {processed_count} emails', 'processed': processed_count})}\n\n"
+        # Send completion; a run stopped by its budget hands back a token for the rest
+        continuation = run.continuation()
+        message = f'Successfully processed {processed_count} emails'
+        if continuation:
+            message += f' ({run.requested - run.attempted} left for the next run)'
+        yield f"data: {json.dumps({'type': 'complete', 'message': message, 'processed': processed_count, 'deferred': deferred_count, 'claimed_elsewhere': claimed_elsewhere, 'stopped': run.stopped, 'continuation': continuation})}\n\n"
         
     except Exception as e:
         yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    finally:
+        await finish_run(run, owner, writer, inbox, emails, profile)
 
 @router.get("/fetch-and-process-stream")
-async def fetch_and_process_stream(user_email: str, max_results: int = 10):
+async def fetch_and_process_stream(user_email: str, max_results: int = 10, continuation: Optional[str] = None):
     """Stream email processing events via SSE"""
+    requested = requested_emails(user_email, max_results, continuation)
     return StreamingResponse(
-        process_emails_stream(user_email, max_results),
+        process_emails_stream(user_email, requested),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -171,81 +260,117 @@ async def fetch_and_process_stream(user_email: str, max_results: int = 10):
 @router.post("/fetch-and-process")
 async def fetch_and_process_emails(request: FetchEmailsRequest):
     """Fetch emails from Gmail and process them (non-streaming)"""
+    requested = requested_emails(request.user_email, request.max_results, request.continuation)
+    run = budget_service.start(request.user_email, requested)
+    if run is None:
+        raise HTTPException(status_code=429, detail=busy_message(),
+                            headers={"Retry-After": str(budget_service.retry_after())})
+    
+    emails = []
+    inbox = None
+    owner = lease_service.new_owner()
+    writer = adb.BufferedWriter(settings.DB_WRITE_BATCH_SIZE, settings.DB_WRITE_BATCH_SECONDS)
+    profile = profiling_service.start(request.user_email)
     try:
         print(f"🔄 Fetching emails for {request.user_email}")
         
         token_data = get_token_data(request.user_email)
         print(f"🔑 Token loaded - client_id: {token_data['client_id'][:20]}...")
         
-        print(f"📧 Fetching {request.max_results} unread emails...")
-        emails = gmail_service.fetch_unread_emails(token_data, max_results=request.max_results)
-        print(f"✅ Fetched {len(emails)} emails")
+        print(f"📧 Fetching {run.planned} unread emails...")
+        # Later pages are fetched while the first ones are processed
+        inbox = inbox_service.InboxStream(token_data, run.planned, skip_body=prefilter_service.match)
+        estimate = await inbox.open()
+        # Each chunk takes the highest-priority emails of everything prefetched so far
+        rank = await scheduler_service.ranker()
+        print(f"✅ Found about {estimate} unread emails")
         
         processed_count = 0
-        for email_data in emails:
-            print(f"📨 Processing: {email_data['subject']}")
-            
-            # ✅ Rate limiting is handled inside classifier_service.classify_email()
-            classification = classifier_service.classify_email(
-                subject=email_data['subject'],
-                content=email_data['body']
-            )
-            
-            department = classification['categories'][0] if classification['categories'] else 'Unknown'
-            recipients = classification.get('recipients', [])
-            
-            print(f"🎯 Classified as: {department} ({classification['confidence']})")
-            
-            db.save_classification(
-                email_id=email_data['id'],
-                sender=email_data['sender'],
-                subject=email_data['subject'],
-                content=email_data['body'],
-                categories=json.dumps(classification['categories']),
-                confidence=classification['confidence'],
-                recipients=json.dumps(recipients)
-            )
-            
-            sender_email = email_data['sender'].split('<')[-1].strip('>')
-            auto_reply_body = f"""Hello,
-
-Thank you for contacting us. Your email has been received and automatically routed to our {department} department.
-
-Our team will review your message and respond as soon as possible.
-
-Best regards,
-Emailia Auto-Routing System
-"""
+        deferred_count = 0
+        batch_decisions = {}
+        # Chunks are sized to what is left of the run's time budget; the run stops between chunks
+        while (size := run.next_chunk()):
+            # Only time spent waiting for the prefetched pages counts as fetching
+            started = time.monotonic()
+            emails = await inbox.take(size, rank)
+            run.timed("fetch", time.monotonic() - started)
+            run.attempted += len(emails)
+            run.exhausted = len(emails) < size
             
-            try:
-                gmail_service.send_email(
-                    token_data=token_data,
-                    to=sender_email,
-                    subject=f"Re: {email_data['subject']}",
-                    body=auto_reply_body
-                )
-                print(f"✅ Auto-reply sent to {sender_email}")
-            except Exception as reply_error:
-                print(f"⚠️ Failed to send auto-reply: {reply_error}")
+            started = time.monotonic()
+            emails = await lease_service.claim(emails, owner)
+            emails = await ledger_service.resume(emails)
+            emails = await scheduler_service.schedule(emails, backlog=max(0, estimate - run.attempted))
+            routing_service.cluster_batch(emails)
             
-            if classification['confidence'] < 0.7:
-                db.add_to_review_queue(
-                    email_id=email_data['id'],
-                    sender=email_data['sender'],
-                    subject=email_data['subject'],
-                    content=email_data['body'],
-                    reason=f"Low confidence: {classification['confidence']}"
-                )
-                print(f"⚠️ Added to review queue (low confidence)")
+            # ✅ Thread replies, near-duplicates and known senders skip the LLM; rate limiting is handled by the classifier
+            async for email_data, classification in routing_service.route_batch(emails, batch_decisions):
+                print(f"📨 Processing ({email_data.get('priority', 'normal')}): {email_data['subject']}")
+                
+                if classification is None:
+                    deferred_count += 1
+                    continue
+                
+                department = classification['categories'][0] if classification['categories'] else 'Unknown'
+                recipients = classification.get('recipients', [])
+                
+                print(f"🎯 Classified as: {department} ({classification['confidence']}, {classification.get('source', 'llm')})")
+                
+                if ledger_service.needs(email_data, STEP_CLASSIFIED):
+                    await writer.save_classification(
+                        email_id=email_data['id'],
+                        sender=email_data['sender'],
+                        subject=email_data['subject'],
+                        content=email_data['body'],
+                        categories=json.dumps(classification['categories']),
+                        confidence=classification['confidence'],
+                        recipients=json.dumps(recipients),
+                        thread_id=email_data.get('thread_id'),
+                        source=classification.get('source', 'llm')
+                    )
+                    
+                    if classification['confidence'] < settings.CONFIDENCE_THRESHOLD:
+                        await writer.add_to_review_queue(
+                            email_id=email_data['id'],
+                            sender=email_data['sender'],
+                            subject=email_data['subject'],
+                            content=email_data['body'],
+                            reason=f"Low confidence: {classification['confidence']}"
+                        )
+                        print(f"⚠️ Added to review queue (low confidence)")
+                    
+                    await ledger_service.record(email_data, STEP_CLASSIFIED, writer)
+                
+                if ledger_service.needs(email_data, STEP_REPLIED):
+                    # Automated mail never gets a reply (no auto-reply loops); the step is still done
+                    if classification.get('source') != prefilter_service.SOURCE:
+                        # Committed with the classification; the outbox sender delivers it in the background
+                        sender_email = await outbox_service.enqueue_reply(writer, request.user_email, email_data, department)
+                        print(f"📮 Auto-reply to {sender_email} queued")
+                    await ledger_service.record(email_data, STEP_REPLIED, writer)
+                
+                if ledger_service.needs(email_data, STEP_MARKED_READ):
+                    await mark_read_when_durable(writer, token_data, email_data,
+                                                 archive=prefilter_service.should_archive(classification))
+                processed_count += 1
+                run.record(classification)
+                await lease_service.keep_alive(owner)
             
-            gmail_service.mark_as_read(token_data, email_data['id'])
-            processed_count += 1
+            scheduler_service.release(emails)
+            run.timed("process", time.monotonic() - started)
         
-        print(f"✅ Successfully processed {processed_count} emails")
+        print(f"✅ Successfully processed {processed_count} emails ({deferred_count} deferred)")
         
+        # A run stopped by its budget hands back a token for the rest
         return {
             "message": f"Processed {processed_count} emails",
-            "processed_count": processed_count
+            "processed_count": processed_count,
+            "deferred_count": deferred_count,
+            "requested": run.requested,
+            "planned": run.planned,
+            "limited_by": run.limited_by,
+            "stopped": run.stopped,
+            "continuation": run.continuation()
         }
         
     except HTTPException:
@@ -255,6 +380,8 @@ Emailia Auto-Routing System
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing emails: {str(e)}")
+    finally:
+        await finish_run(run, owner, writer, inbox, emails, profile)
 
 @router.post("/manual-forward")
 async def manual_forward(request: ManualForwardRequest):
@@ -264,7 +391,9 @@ async def manual_forward(request: ManualForwardRequest):
         
         token_data = get_token_data(request.user_email)
         
-        gmail_service.forward_email_via_api(
+        # Sent inline, not through the outbox: the result is reported to the team lead
+        await asyncio.to_thread(
+            gmail_service.forward_email_via_api,
             token_data=token_data,
             email_id=str(request.email_id),
             to=request.recipient_email
@@ -272,6 +401,12 @@ async def manual_forward(request: ManualForwardRequest):
         
         print(f"✅ Email forwarded to {request.recipient_email}")
         
+        # The team lead's choice feeds the sender routing table
+        review = await adb.get_review(request.email_id)
+        if review:
+            await adb.record_step(review['email_id'], STEP_FORWARDED)
+            await sender_rules_service.learn_from_forward(review['sender'], request.recipient_email)
+        
         return {"message": "Email forwarded successfully"}
         
     except HTTPException:
@@ -282,6 +417,26 @@ async def manual_forward(request: ManualForwardRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk-review")
+async def bulk_review(request: BulkReviewRequest):
+    """Forward or dismiss many review-queue items in one request, with a result per item"""
+    if len(request.decisions) > review_service.MAX_BULK_DECISIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {review_service.MAX_BULK_DECISIONS} decisions per request")
+    try:
+        print(f"🔄 Bulk review of {len(request.decisions)} items")
+        token_data = get_token_data(request.user_email)
+        results = await review_service.apply_decisions(token_data, [d.model_dump() for d in request.decisions])
+        return {"results": results}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error in bulk_review: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/test-connection")
 async def test_gmail_connection(email: str):
     """Test Gmail API connection"""
@@ -289,7 +444,7 @@ async def test_gmail_connection(email: str):
         print(f"🔄 Testing connection for {email}")
         
         token_data = get_token_data(email)
-        profile = gmail_service.get_profile(token_data)
+        profile = await asyncio.to_thread(gmail_service.get_profile, token_data)
         
         print(f"✅ Connection successful: {profile['emailAddress']}")
         
@@ -0,0 +1,170 @@
+from services import classifier_service
+from config import get_settings
+import base64
+import binascii
+import json
+import time
+from typing import Dict, List, Optional
+
+settings = get_settings()
+
+# Weight of the latest run in the moving averages below
+EWMA_ALPHA = 0.3
+# Until a run has been observed, plan as if every email needs the LLM
+DEFAULT_LLM_SHARE = 1.0
+# Even a run of sender-rule hits occasionally needs the LLM
+MIN_LLM_SHARE = 0.05
+
+# Moving averages over finished runs: seconds per email by stage, and the share of emails the LLM classified
+_seconds_per_email: Dict[str, float] = {}
+_llm_share: Optional[float] = None
+_running: List["Run"] = []
+_last_run: Optional[dict] = None
+
+def _ewma(old: Optional[float], new: float) -> float:
+    return new if old is None else old + EWMA_ALPHA * (new - old)
+
+def encode_continuation(user_email: str, remaining: int) -> str:
+    """Token a client sends back to process the emails a run left for later"""
+    return base64.urlsafe_b64encode(json.dumps({"user": user_email, "remaining": remaining}).encode()).decode()
+
+def decode_continuation(token: str, user_email: str) -> int:
+    """How many emails a continuation token asks for; ValueError if it isn't one of ours for this user"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        remaining = int(payload['remaining'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise ValueError("Invalid continuation token")
+    if payload.get('user') != user_email or remaining < 1:
+        raise ValueError("Continuation token does not belong to this user")
+    return remaining
+
+def _plan(requested: int) -> tuple:
+    """Emails to take on within the time budget, and what limited the number (None if nothing did)"""
+    budget = settings.RUN_TIME_BUDGET_SECONDS
+    size, limited_by = requested, None
+    if size > settings.RUN_MAX_EMAILS:
+        size, limited_by = settings.RUN_MAX_EMAILS, "max emails per run"
+
+    if _seconds_per_email:
+        by_time = int(budget / sum(_seconds_per_email.values()))
+        if by_time < size:
+            size, limited_by = by_time, "time budget"
+
+    # Runs in progress share the Gemini rate limit
+    share = max(MIN_LLM_SHARE, DEFAULT_LLM_SHARE if _llm_share is None else _llm_share)
+    by_quota = int(classifier_service.calls_available(budget) / max(1, len(_running)) / share)
+    if by_quota < size:
+        size, limited_by = by_quota, "llm quota"
+
+    # Always make some progress; the LLM overflow handling covers an exhausted quota
+    return max(1, size), limited_by
+
+class Run:
+    """Budget of one fetch-and-process run: how many emails it takes on and until when"""
+
+    def __init__(self, user_email: str, requested: int):
+        self.user_email = user_email
+        self.requested = requested
+        self.started = time.monotonic()
+        self.deadline = self.started + settings.RUN_TIME_BUDGET_SECONDS
+        self.planned: int = requested
+        self.limited_by: Optional[str] = None
+        # Set once the inbox had no more unread emails to give
+        self.exhausted = False
+        self.attempted = 0
+        self.processed = 0
+        self.llm_classified = 0
+        self.stage_seconds = {"fetch": 0.0, "process": 0.0}
+        self.stopped: Optional[str] = None
+
+    def _seconds_per_email(self) -> Optional[float]:
+        """This run's own rate once it has one, else the average of earlier runs"""
+        if self.attempted:
+            return sum(self.stage_seconds.values()) / self.attempted
+        return sum(_seconds_per_email.values()) if _seconds_per_email else None
+
+    def next_chunk(self) -> int:
+        """How many emails to take next; 0 once the plan is done, the inbox is empty or the time budget is used up"""
+        left = self.planned - self.attempted
+        if left <= 0 or self.exhausted:
+            return 0
+        remaining = self.deadline - time.monotonic()
+        per_email = self._seconds_per_email()
+        fits = int(remaining / per_email) if per_email else left
+        if remaining <= 0 or fits < 1:
+            self.stopped = "time budget"
+            print(f"⏳ Run stopped at its {settings.RUN_TIME_BUDGET_SECONDS:.0f}s budget, "
+                  f"{self.requested - self.attempted} emails left for a follow-up run")
+            return 0
+        return min(settings.RUN_CHUNK_SIZE, left, fits)
+
+    def timed(self, stage: str, seconds: float):
+        self.stage_seconds[stage] += seconds
+
+    def record(self, classification: dict):
+        """An email was handled; LLM-classified ones count towards the quota estimate"""
+        self.processed += 1
+        if classification.get('source', 'llm') == 'llm':
+            self.llm_classified += 1
+
+    def continuation(self) -> Optional[str]:
+        """Token for the emails this run didn't get to, or None if there are none"""
+        remaining = self.requested - self.attempted
+        if remaining <= 0 or self.exhausted:
+            return None
+        return encode_continuation(self.user_email, remaining)
+
+    def summary(self) -> dict:
+        return {
+            "requested": self.requested,
+            "planned": self.planned,
+            "limited_by": self.limited_by,
+            "processed": self.processed,
+            "stopped": self.stopped,
+            "elapsed_seconds": round(time.monotonic() - self.started, 2),
+            "stage_seconds": {stage: round(s, 2) for stage, s in self.stage_seconds.items()},
+        }
+
+def start(user_email: str, requested: int) -> Optional[Run]:
+    """Admit and size a run, or None when MAX_CONCURRENT_RUNS are already in progress"""
+    if len(_running) >= settings.MAX_CONCURRENT_RUNS:
+        return None
+    run = Run(user_email, requested)
+    _running.append(run)
+    # Planned with this run counted, so it takes only its share of the quota
+    run.planned, run.limited_by = _plan(requested)
+    if run.limited_by:
+        print(f"⏳ Run sized to {run.planned} of {requested} requested emails ({run.limited_by})")
+    return run
+
+def finish(run: Run):
+    """Release the run's slot and fold what it observed into the estimates for the next ones"""
+    global _llm_share, _last_run
+    if run in _running:
+        _running.remove(run)
+    if run.attempted:
+        for stage, seconds in run.stage_seconds.items():
+            _seconds_per_email[stage] = _ewma(_seconds_per_email.get(stage), seconds / run.attempted)
+    if run.processed:
+        _llm_share = _ewma(_llm_share, run.llm_classified / run.processed)
+    _last_run = run.summary()
+
+def retry_after() -> int:
+    """Seconds until a run slot should free up"""
+    now = time.monotonic()
+    return max(1, int(min((run.deadline - now for run in _running), default=0)) + 1)
+
+def status() -> dict:
+    """Run limits, current estimates and the last run's budget"""
+    return {
+        "time_budget_seconds": settings.RUN_TIME_BUDGET_SECONDS,
+        "max_emails": settings.RUN_MAX_EMAILS,
+        "chunk_size": settings.RUN_CHUNK_SIZE,
+        "max_concurrent_runs": settings.MAX_CONCURRENT_RUNS,
+        "running": len(_running),
+        "seconds_per_email": {stage: round(s, 3) for stage, s in _seconds_per_email.items()},
+        "llm_share": None if _llm_share is None else round(_llm_share, 3),
+        "llm_calls_available": classifier_service.calls_available(settings.RUN_TIME_BUDGET_SECONDS),
+        "last_run": _last_run,
+    }
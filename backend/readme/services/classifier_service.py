@@ -1,56 +1,66 @@
-import google.generativeai as genai
 from config import get_settings
+from utils.circuit_breaker import CircuitBreaker
+from utils.json_repair import extract_json_object
+from utils.email_parser import CHARS_PER_TOKEN, estimate_tokens, fit_token_budget, strip_email_text
+from models.schemas import ClassificationResponse
+from pydantic import ValidationError
 import database as db
+import async_database as adb
+import asyncio
+import dataclasses
 import json
 import time
-from functools import wraps
-from datetime import datetime
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as DeadlineExceeded
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 
 settings = get_settings()
-genai.configure(api_key=settings.GEMINI_API_KEY)
+
+# google.generativeai takes ~0.5s to import, so it is loaded on first classification
+genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """Import and configure the Gemini SDK once, on first use"""
+    global genai
+    if genai is None:
+        with _genai_lock:
+            if genai is None:
+                import google.generativeai as sdk
+                sdk.configure(api_key=settings.GEMINI_API_KEY)
+                genai = sdk
+    return genai
+
+# The SDK call runs here so the caller can stop waiting at the deadline
+_gemini_pool = ThreadPoolExecutor(max_workers=max(1, settings.GEMINI_MAX_CONCURRENCY), thread_name_prefix="gemini")
+
+QUOTA_ERROR_KEYWORDS = ['429', 'quota', 'resource_exhausted', 'resource has been exhausted', 'rate limit']
+TIMEOUT_ERROR_KEYWORDS = ['504', 'deadline', 'timed out', 'timeout']
+
+# How Gemini replies parsed: strict JSON, JSON recovered by repair, or unusable
+response_stats = {"parsed": 0, "repaired": 0, "invalid": 0}
+
+# Email text before and after prepare_content(), in estimated tokens
+content_stats = {"emails": 0, "raw_tokens": 0, "prepared_tokens": 0, "truncated": 0}
+
+# Gemini token use, and what the compact department contract saves against
+# sending the member roster and having the model echo recipients back
+token_stats = {"calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "reply_tokens": 0,
+               "saved_prompt_tokens": 0, "saved_reply_tokens": 0}
 
 # Rate limiting globals
 last_api_call_time = 0
 MIN_CALL_INTERVAL = 6
+MAX_CALLS_PER_MINUTE = 9
 api_call_count = 0
 api_call_window_start = datetime.now()
 
-def rate_limit_decorator(func):
-    """Decorator to enforce rate limiting"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        global last_api_call_time, api_call_count, api_call_window_start
-        
-        now = datetime.now()
-        if (now - api_call_window_start).total_seconds() >= 60:
-            api_call_count = 0
-            api_call_window_start = now
-            print(f"🔄 Rate limit window reset")
-        
-        if api_call_count >= 9:
-            wait_time = 60 - (now - api_call_window_start).total_seconds()
-            if wait_time > 0:
-                print(f"⏱️ Approaching rate limit, waiting {wait_time:.1f}s...")
-                time.sleep(wait_time)
-                api_call_count = 0
-                api_call_window_start = datetime.now()
-        
-        elapsed = time.time() - last_api_call_time
-        if elapsed < MIN_CALL_INTERVAL:
-            wait_time = MIN_CALL_INTERVAL - elapsed
-            print(f"⏱️ Rate limiting: waiting {wait_time:.1f}s before next API call...")
-            time.sleep(wait_time)
-        
-        result = func(*args, **kwargs)
-        
-        last_api_call_time = time.time()
-        api_call_count += 1
-        
-        return result
-    return wrapper
-
-def build_classification_prompt(subject: str, content: str) -> str:
-    """Build system prompt for classification"""
+def get_roster() -> dict:
+    """Team members by department from the database, or from .env if it is empty"""
     # ✅ FIX: Get team members from DATABASE
     team_members_by_dept = db.get_team_members_by_department()
     
@@ -66,17 +76,59 @@ def build_classification_prompt(subject: str, content: str) -> str:
     else:
         print("✅ Using team members from DATABASE")
     
-    # Build department list
-    dept_lines = []
-    for dept, members in team_members_by_dept.items():
-        member_list = ', '.join([f"{m['name']} ({m['email']})" for m in members])
-        dept_lines.append(f"- {dept}: {member_list}")
+    return team_members_by_dept
+
+class DepartmentIndex:
+    """A roster precomputed for classification.
+    
+    The prompt names departments by compact IDs (d1, d2, ...) instead of
+    listing every member, and the model answers with those IDs only;
+    recipients are looked up here, so they are always on the roster.
+    """
+    
+    def __init__(self, team_members_by_dept: dict):
+        self.ids = {f"d{n}": dept for n, dept in enumerate(team_members_by_dept, 1)}
+        self.members = {dept: [m['email'] for m in members] for dept, members in team_members_by_dept.items()}
+        # IDs, and department names in case a reply uses those instead
+        self._lookup = {**{dept.lower(): dept for dept in self.members}, **self.ids}
+        self.prompt_lines = "\n".join(f"- {ref}: {dept}" for ref, dept in self.ids.items())
+        # What the prompt used to carry instead: every member's name and email
+        roster_lines = "\n".join(
+            f"- {dept}: " + ', '.join(f"{m['name']} ({m['email']})" for m in members)
+            for dept, members in team_members_by_dept.items())
+        self.saved_prompt_tokens = max(0, estimate_tokens(roster_lines) - estimate_tokens(self.prompt_lines))
+    
+    def resolve(self, ref: str) -> Optional[str]:
+        """Department for an ID (or name) from a reply; None if it isn't on the roster"""
+        return self._lookup.get(ref.strip().lower())
+    
+    def recipients(self, departments: List[str]) -> List[str]:
+        recipients = []
+        for dept in departments:
+            recipients.extend(email for email in self.members.get(dept, []) if email not in recipients)
+        return recipients
+
+_index: Optional[Tuple[tuple, DepartmentIndex]] = None
+
+def department_index(team_members_by_dept: dict) -> DepartmentIndex:
+    """The index for this roster, rebuilt only when the roster changes"""
+    global _index
+    key = tuple((dept, tuple((m['name'], m['email']) for m in members))
+                for dept, members in team_members_by_dept.items())
+    if _index is None or _index[0] != key:
+        _index = (key, DepartmentIndex(team_members_by_dept))
+    return _index[1]
+
+def build_classification_prompt(subject: str, content: str, team_members_by_dept: Optional[dict] = None) -> str:
+    """Build system prompt for classification"""
+    if team_members_by_dept is None:
+        team_members_by_dept = get_roster()
     
-    departments = "\n".join(dept_lines)
+    departments = department_index(team_members_by_dept).prompt_lines
     
     prompt = f"""You are an intelligent email routing assistant for a company. Your task is to analyze incoming emails and route them to the most appropriate department(s) based on the email's content, context, and intent.
 
-**Available Departments and Team Members:**
+**Available Departments (ID: name):**
 {departments}
 
 **Email to Classify:**
@@ -107,20 +159,14 @@ Content: {content}
 
 **Response Format:**
 Respond ONLY with valid JSON (no markdown, no explanation outside JSON):
-{{
-    "categories": ["Department1", "Department2"],
-    "confidence": 0.85,
-    "recipients": ["email1@company.com", "email2@company.com"],
-    "reasoning": "Brief explanation of why this department was chosen"
-}}
+{{"departments": ["d1"], "confidence": 0.85}}
 
 **Important Rules:**
-- Department names in "categories" MUST match EXACTLY as shown in the available departments list (case-sensitive)
+- "departments" holds department IDs exactly as shown in the available departments list (e.g. "d1"), not names
 - Include 1-3 most relevant departments only
-- List recipients' emails from all selected departments
 - Set confidence based on your analysis, not arbitrary thresholds
 - If email is ambiguous or doesn't fit any department well, choose the closest match and set confidence accordingly
-- Your reasoning should briefly explain the key factors in your decision
+- Return only these two fields
 
 Analyze the email now and provide your classification:"""
     
@@ -185,70 +231,532 @@ def fallback_classify_email(subject: str, content: str) -> dict:
         "categories": matches,
         "confidence": 0.6,
         "recipients": recipients,
-        "reasoning": "Classified using fallback keyword matching"
+        "reasoning": "Classified using fallback keyword matching",
+        "source": "fallback"
     }
 
-@rate_limit_decorator
+# Keywords for common department names, mirroring the prompt's classification guidelines
+DEPARTMENT_KEYWORDS = {
+    'ai': ['software', 'machine learning', 'model', 'api', 'integration', 'programming', 'server', 'deployment'],
+    'technology': ['software', 'api', 'integration', 'server', 'system', 'technical', 'bug', 'outage'],
+    'business': ['partnership', 'proposal', 'pricing', 'contract', 'quote', 'enterprise', 'deal'],
+    'sales': ['pricing', 'quote', 'demo', 'purchase', 'enterprise', 'discount'],
+    'marketing': ['campaign', 'brand', 'advertising', 'social media', 'press release', 'newsletter', 'sponsorship'],
+    'finance': ['invoice', 'payment', 'billing', 'refund', 'receipt', 'accounting', 'purchase order', 'tax'],
+    'hr': ['job application', 'resume', 'interview', 'onboarding', 'payroll', 'leave request', 'hiring', 'candidate'],
+    'operations': ['policy', 'office', 'facilities', 'vendor', 'logistics'],
+    'support': ['help', 'not working', 'error message', 'cannot log in', 'complaint', 'bug', 'issue', 'problem'],
+    'customer': ['help', 'not working', 'complaint', 'account', 'order', 'issue'],
+}
+
+def keyword_classify_email(subject: str, content: str) -> dict:
+    """Score departments by keyword hits; confidence grows with evidence and how one-sided it is"""
+    team_members_by_dept = db.get_team_members_by_department() or parse_team_members_from_env()
+    subject_text = subject.lower()
+    body_text = content.lower()
+    
+    scores = {}
+    for dept in team_members_by_dept:
+        dept_tokens = [t for t in dept.lower().replace('/', ' ').replace('&', ' ').split() if t]
+        keywords = {dept.lower()}
+        for token in dept_tokens:
+            keywords.update(DEPARTMENT_KEYWORDS.get(token, []))
+        # A hit in the subject counts double
+        scores[dept] = sum(2 * subject_text.count(k) + body_text.count(k) for k in keywords)
+    
+    if not scores or max(scores.values()) == 0:
+        fallback = fallback_classify_email(subject, content)
+        fallback['confidence'] = 0.3
+        fallback['source'] = 'local'
+        return fallback
+    
+    best = max(scores, key=scores.get)
+    top = scores[best]
+    share = top / sum(scores.values())
+    confidence = round(min(0.9, 0.35 + 0.1 * top) * share, 2)
+    
+    return {
+        "categories": [best],
+        "confidence": confidence,
+        "recipients": [m['email'] for m in team_members_by_dept[best]],
+        "reasoning": f"Local keyword match ({top} hits, {share:.0%} of all keyword hits)",
+        "source": "local"
+    }
+
+# ========== STRUCTURED OUTPUT ==========
+
+_GEMINI_TYPES = {'string': 'STRING', 'number': 'NUMBER', 'integer': 'INTEGER',
+                 'boolean': 'BOOLEAN', 'array': 'ARRAY', 'object': 'OBJECT'}
+
+def _gemini_schema(prop: dict) -> dict:
+    """Translate one pydantic JSON-schema property to Gemini's OpenAPI subset"""
+    if 'anyOf' in prop:
+        # Optional[X] is anyOf [X, null]
+        option = next(p for p in prop['anyOf'] if p.get('type') != 'null')
+        return {**_gemini_schema(option), 'nullable': True}
+    schema = {'type': _GEMINI_TYPES[prop['type']]}
+    if 'items' in prop:
+        schema['items'] = _gemini_schema(prop['items'])
+    return schema
+
+def classification_response_schema(department_ids: List[str]) -> dict:
+    """Gemini response schema mirroring ClassificationResponse, with departments limited to the roster's IDs"""
+    json_schema = ClassificationResponse.model_json_schema()
+    properties = {name: _gemini_schema(prop) for name, prop in json_schema['properties'].items()}
+    if department_ids:
+        properties['departments']['items'].update({'format': 'enum', 'enum': list(department_ids)})
+    return {'type': 'OBJECT', 'properties': properties, 'required': json_schema.get('required', [])}
+
+def generation_config(department_ids: List[str]) -> Optional[dict]:
+    """Ask for JSON matching the response schema, as far as the installed SDK supports it"""
+    config_type = getattr(getattr(get_genai(), 'types', None), 'GenerationConfig', None)
+    if config_type is None or not dataclasses.is_dataclass(config_type):
+        return None
+    fields = {f.name for f in dataclasses.fields(config_type)}
+    
+    config = {}
+    if 'response_mime_type' in fields:
+        config['response_mime_type'] = 'application/json'
+    if 'response_schema' in fields:
+        config['response_schema'] = classification_response_schema(department_ids)
+    return config or None
+
+def parse_classification(text: str, index: DepartmentIndex) -> Optional[dict]:
+    """Parse and validate a Gemini reply; None if it holds no usable classification.
+    
+    Department IDs are resolved through the index and unknown ones dropped;
+    recipients are every member of the chosen departments.
+    """
+    outcome = 'parsed'
+    try:
+        raw = json.loads(text)
+    except json.JSONDecodeError:
+        raw = extract_json_object(text)
+        if raw is None:
+            response_stats['invalid'] += 1
+            print(f"⚠️ No JSON object in reply: {text[:200]}...")
+            return None
+        outcome = 'repaired'
+        print(f"🩹 Repaired malformed JSON reply")
+    
+    if not isinstance(raw, dict):
+        response_stats['invalid'] += 1
+        return None
+    try:
+        response = ClassificationResponse.model_validate(raw)
+    except ValidationError as e:
+        response_stats['invalid'] += 1
+        print(f"⚠️ Reply does not match the classification schema: {e.errors()[0]['msg']}")
+        return None
+    
+    categories = []
+    for ref in response.departments:
+        dept = index.resolve(ref)
+        if dept is None:
+            print(f"⚠️ Dropping unknown department from reply: {ref}")
+        elif dept not in categories:
+            categories.append(dept)
+    if not categories:
+        response_stats['invalid'] += 1
+        return None
+    
+    response_stats[outcome] += 1
+    return {
+        "categories": categories,
+        "confidence": min(1.0, max(0.0, response.confidence)),
+        "recipients": index.recipients(categories),
+        "reasoning": f"LLM routed to {', '.join(categories)}",
+        "source": "llm"
+    }
+
+def record_tokens(response, prompt: str, index: DepartmentIndex, classification: dict):
+    """Count a call's tokens (from the API's usage metadata, else estimated) and the estimated savings"""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    reply_tokens = getattr(usage, 'candidates_token_count', None)
+    if prompt_tokens is None or reply_tokens is None:
+        prompt_tokens, reply_tokens = estimate_tokens(prompt), estimate_tokens(response.text)
+        token_stats['estimated_calls'] += 1
+    
+    # The reply the model used to write: department names and every recipient's address
+    legacy_reply = json.dumps({"categories": classification['categories'],
+                               "recipients": classification['recipients']})
+    ids = [ref for ref, dept in index.ids.items() if dept in classification['categories']]
+    token_stats['calls'] += 1
+    token_stats['prompt_tokens'] += prompt_tokens
+    token_stats['reply_tokens'] += reply_tokens
+    token_stats['saved_prompt_tokens'] += index.saved_prompt_tokens
+    token_stats['saved_reply_tokens'] += max(0, estimate_tokens(legacy_reply)
+                                             - estimate_tokens(json.dumps({"departments": ids})))
+
+def token_usage() -> dict:
+    """Gemini token totals and per-call averages, including what recipients resolved locally save"""
+    calls = token_stats['calls']
+    per_call = {key: round(value / calls, 1) for key, value in token_stats.items()
+                if key.endswith('_tokens')} if calls else {}
+    return {**token_stats, "per_call": per_call}
+
+def generate_with_deadline(model, prompt: str, config: Optional[dict] = None):
+    """Call Gemini, raising DeadlineExceeded after GEMINI_CALL_DEADLINE_SECONDS"""
+    future = _gemini_pool.submit(model.generate_content, prompt, generation_config=config)
+    try:
+        return future.result(timeout=settings.GEMINI_CALL_DEADLINE_SECONDS)
+    except DeadlineExceeded:
+        # A call still queued behind hung ones must not spend quota after the caller gave up
+        future.cancel()
+        raise
+
+# ========== CLASSIFIER BACKENDS ==========
+
+class ClassifierBackend(ABC):
+    """One tier of the classification cascade"""
+    name = "backend"
+    
+    @abstractmethod
+    def classify(self, subject: str, content: str) -> Optional[dict]:
+        """Return {categories, confidence, recipients, reasoning, source}, or None if unavailable"""
+    
+    async def classify_async(self, subject: str, content: str) -> Optional[dict]:
+        """Async classify(); runs the blocking version in a worker thread unless overridden"""
+        return await asyncio.to_thread(self.classify, subject, content)
+
+class KeywordBackend(ClassifierBackend):
+    """Local keyword scorer: free and instant, confident only on clear-cut mail"""
+    name = "local"
+    
+    def classify(self, subject: str, content: str) -> Optional[dict]:
+        return keyword_classify_email(subject, content)
+
+class GeminiBackend(ClassifierBackend):
+    """A Gemini model behind its own circuit breaker; the model client is created once.
+    
+    `model` may be any object with `generate_content(prompt)` (and, for the
+    async path, `generate_content_async(prompt)`) returning a response with
+    `.text`, so local fakes can stand in for the SDK.
+    """
+    
+    def __init__(self, model_name: str, model=None):
+        self.name = model_name
+        self._model = model
+        self._model_lock = threading.Lock()
+        # Opens on repeated quota errors / timeouts so an outage costs nothing per email
+        self.breaker = CircuitBreaker(
+            f"Gemini {model_name}",
+            failure_threshold=settings.GEMINI_BREAKER_FAILURES,
+            reset_timeout=settings.GEMINI_BREAKER_RESET_SECONDS,
+            half_open_max_calls=settings.GEMINI_BREAKER_HALF_OPEN_CALLS
+        )
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = get_genai().GenerativeModel(self.name)
+        return self._model
+    
+    def classify(self, subject: str, content: str) -> Optional[dict]:
+        if not self.breaker.allow_request():
+            print(f"⚡ {self.breaker.name} circuit open, skipping tier")
+            return None
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        result = None
+        try:
+            result = _classify_with_gemini(self, subject, content)
+            return result
+        finally:
+            self._settle_probe(probe, result)
+    
+    async def classify_async(self, subject: str, content: str) -> Optional[dict]:
+        if not self.breaker.allow_request():
+            print(f"⚡ {self.breaker.name} circuit open, skipping tier")
+            return None
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        result = None
+        try:
+            result = await _classify_with_gemini_async(self, subject, content)
+            return result
+        finally:
+            self._settle_probe(probe, result)
+    
+    def _settle_probe(self, probe: bool, result: Optional[dict]):
+        """Count a half-open probe that ended without a recorded outcome as failed"""
+        # A 500, any other error or a cancellation records nothing; without this
+        # the probe's slot is never given back and the circuit stays half-open
+        if probe and result is None and self.breaker.state == CircuitBreaker.HALF_OPEN:
+            self.breaker.record_failure()
+
+_cascade: Optional[List[ClassifierBackend]] = None
+_cascade_lock = threading.Lock()
+
+def build_cascade(spec: str) -> List[ClassifierBackend]:
+    """Build backends from a comma-separated spec, e.g. "local,gemini-2.5-flash-lite,gemini-2.5-flash" """
+    backends = []
+    for name in (part.strip() for part in spec.split(',')):
+        if not name:
+            continue
+        backends.append(KeywordBackend() if name == KeywordBackend.name else GeminiBackend(name))
+    return backends
+
+def get_cascade() -> List[ClassifierBackend]:
+    """The configured cascade, built once from CLASSIFIER_CASCADE"""
+    global _cascade
+    if _cascade is None:
+        with _cascade_lock:
+            if _cascade is None:
+                _cascade = build_cascade(settings.CLASSIFIER_CASCADE)
+                print(f"🪜 Classifier cascade: {' → '.join(b.name for b in _cascade)}")
+    return _cascade
+
+def set_cascade(backends: List[ClassifierBackend]):
+    """Replace the cascade (e.g. with fake backends in benchmarks)"""
+    global _cascade
+    with _cascade_lock:
+        _cascade = list(backends)
+
+def circuit_status() -> List[dict]:
+    """Circuit breaker state of every Gemini tier"""
+    return [b.breaker.snapshot() for b in get_cascade() if isinstance(b, GeminiBackend)]
+
+def _accept(backend: ClassifierBackend, attempt: Optional[dict], result: Optional[dict]) -> Tuple[Optional[dict], bool]:
+    """Fold one tier's answer into the cascade result: (result so far, stop escalating)"""
+    if attempt is None:
+        return result, False
+    attempt['model'] = backend.name
+    if attempt['confidence'] >= settings.CONFIDENCE_THRESHOLD:
+        return attempt, True
+    print(f"↗️ {backend.name} confidence {attempt['confidence']} below {settings.CONFIDENCE_THRESHOLD}, escalating")
+    return attempt, False
+
+def prepare_content(content: str) -> str:
+    """Email text worth classifying: no quoted history, signature or markup, within CLASSIFY_CONTENT_TOKENS"""
+    # Without a tail, nothing past the head budget is needed
+    budget, tail = settings.CLASSIFY_CONTENT_TOKENS, settings.CLASSIFY_CONTENT_TAIL_TOKENS
+    max_chars = budget * CHARS_PER_TOKEN if budget > 0 and not tail else None
+    text = strip_email_text(content or '', max_chars)
+    prepared = fit_token_budget(text, budget, tail)
+    content_stats['emails'] += 1
+    content_stats['raw_tokens'] += estimate_tokens(content or '')
+    content_stats['prepared_tokens'] += estimate_tokens(prepared)
+    content_stats['truncated'] += prepared is not text
+    return prepared
+
+def content_usage() -> dict:
+    """Content preparation totals and the average share of each body kept"""
+    raw = content_stats['raw_tokens']
+    return {**content_stats, "kept_share": round(content_stats['prepared_tokens'] / raw, 3) if raw else None}
+
 def classify_email(subject: str, content: str) -> dict:
-    """Classify email using Gemini API with fallback and retry logic"""
+    """Classify email through the cascade, escalating only while confidence is below the threshold"""
+    content = prepare_content(content)
+    result = None
+    
+    for backend in get_cascade():
+        result, done = _accept(backend, backend.classify(subject, content), result)
+        if done:
+            break
+    
+    if result is None:
+        print(f"⚠️ No classifier tier available, using fallback")
+        return fallback_classify_email(subject, content)
+    return result
+
+async def classify_email_async(subject: str, content: str) -> dict:
+    """classify_email() without blocking the event loop; Gemini calls share GEMINI_MAX_CONCURRENCY slots"""
+    content = prepare_content(content)
+    result = None
+    
+    for backend in get_cascade():
+        result, done = _accept(backend, await backend.classify_async(subject, content), result)
+        if done:
+            break
+    
+    if result is None:
+        print(f"⚠️ No classifier tier available, using fallback")
+        return await asyncio.to_thread(fallback_classify_email, subject, content)
+    return result
+
+# ========== GEMINI CALLS ==========
+
+_rate_lock = threading.Lock()
+# Per event loop (asyncio primitives are bound to the loop that first uses them)
+_loop_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, asyncio.Lock]]" = \
+    weakref.WeakKeyDictionary()
+
+def _reserve_call_slot() -> float:
+    """Book the next call start allowed by the rate limiter and return how long to wait for it"""
+    global last_api_call_time, api_call_count, api_call_window_start
+    
+    with _rate_lock:
+        now = datetime.now()
+        if (now - api_call_window_start).total_seconds() >= 60:
+            api_call_count = 0
+            api_call_window_start = now
+        
+        wait_time = 0.0
+        if api_call_count >= MAX_CALLS_PER_MINUTE:
+            wait_time = max(0.0, 60 - (now - api_call_window_start).total_seconds())
+            api_call_count = 0
+            api_call_window_start = now + timedelta(seconds=wait_time)
+        
+        start = max(time.time() + wait_time, last_api_call_time + MIN_CALL_INTERVAL)
+        # Calls are spaced by when they start, so several can be in flight at once
+        last_api_call_time = start
+        api_call_count += 1
+        return max(0.0, start - time.time())
+
+def calls_available(seconds: float) -> int:
+    """How many Gemini calls the rate limiter could start within the next `seconds`"""
+    with _rate_lock:
+        now = time.time()
+        first = max(now, last_api_call_time + MIN_CALL_INTERVAL)
+        if first > now + seconds:
+            return 0
+        by_interval = int((now + seconds - first) // MIN_CALL_INTERVAL) + 1 if MIN_CALL_INTERVAL > 0 else 10**9
+        
+        window_open = (datetime.now() - api_call_window_start).total_seconds() < 60
+        left_in_window = MAX_CALLS_PER_MINUTE - api_call_count if window_open else MAX_CALLS_PER_MINUTE
+        by_window = max(0, left_in_window) + int(MAX_CALLS_PER_MINUTE * seconds / 60)
+        return min(by_interval, by_window)
+
+def _wait_for_call_slot():
+    """Blocking path: book the next call start, then sleep until it"""
+    wait_time = _reserve_call_slot()
+    if wait_time > 0:
+        print(f"⏱️ Rate limiting: waiting {wait_time:.1f}s before next API call...")
+        time.sleep(wait_time)
+
+@asynccontextmanager
+async def _gemini_slot():
+    """Hold one of GEMINI_MAX_CONCURRENCY in-flight slots, started no sooner than the rate limit allows"""
+    loop = asyncio.get_running_loop()
+    if loop not in _loop_slots:
+        _loop_slots[loop] = (asyncio.Semaphore(max(1, settings.GEMINI_MAX_CONCURRENCY)), asyncio.Lock())
+    semaphore, booking_lock = _loop_slots[loop]
+    
+    async with semaphore:
+        # Slots are booked one at a time so callers start in arrival order
+        async with booking_lock:
+            wait_time = _reserve_call_slot()
+            if wait_time > 0:
+                print(f"⏱️ Rate limiting: waiting {wait_time:.1f}s before next API call...")
+                await asyncio.sleep(wait_time)
+        yield
+
+async def _get_roster_async() -> dict:
+    team_members_by_dept = await adb.get_team_members_by_department()
+    return team_members_by_dept or parse_team_members_from_env()
+
+def _log_classification(classification: dict):
+    print(f"✅ AI Classification successful:")
+    print(f"   Categories: {classification['categories']}")
+    print(f"   Confidence: {classification['confidence']}")
+    print(f"   Recipients: {classification['recipients']}")
+
+def _retry_delay(backend: GeminiBackend, error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+    """Record a failed Gemini call; seconds to wait before retrying, or None to give up on this tier"""
+    if isinstance(error, (DeadlineExceeded, asyncio.TimeoutError)):
+        print(f"⏱️ {backend.name} call exceeded {settings.GEMINI_CALL_DEADLINE_SECONDS}s deadline")
+        backend.breaker.record_failure()
+        return None
+    
+    error_msg = str(error).lower()
+    
+    if any(keyword in error_msg for keyword in TIMEOUT_ERROR_KEYWORDS):
+        print(f"⏱️ {backend.name} timed out ({error})")
+        backend.breaker.record_failure()
+        return None
+    
+    if any(keyword in error_msg for keyword in QUOTA_ERROR_KEYWORDS):
+        backend.breaker.record_failure()
+        if backend.breaker.state != CircuitBreaker.CLOSED:
+            print(f"⚠️ Rate limit detected and {backend.breaker.name} circuit is open")
+            return None
+        if attempt < max_retries - 1:
+            wait_time = 10
+            print(f"⚠️ Rate limit detected, waiting {wait_time}s... (attempt {attempt + 1}/{max_retries})")
+            return wait_time
+        print(f"⚠️ Rate limit persists on {backend.name}")
+        return None
+    
+    print(f"❌ Classification error ({backend.name}): {error}")
+    return None
+
+def _classify_with_gemini(backend: GeminiBackend, subject: str, content: str) -> Optional[dict]:
+    """Classify email with one Gemini model, with retry logic; None on failure"""
     max_retries = 2
+    team_members_by_dept = get_roster()
+    index = department_index(team_members_by_dept)
+    if not index.ids:
+        print(f"⚠️ No departments to classify into, skipping {backend.name}")
+        return None
+    prompt = build_classification_prompt(subject, content, team_members_by_dept)
+    config = generation_config(list(index.ids))
     
     for attempt in range(max_retries):
         try:
-            model = genai.GenerativeModel('gemini-2.5-flash-lite')
-            
-            prompt = build_classification_prompt(subject, content)
+            # Booked through the same reservation as the async path, so both keep one spacing
+            _wait_for_call_slot()
+            print(f"🤖 AI Classification ({backend.name}) attempt {attempt + 1}/{max_retries}...")
             
-            print(f"🤖 AI Classification attempt {attempt + 1}/{max_retries}...")
+            response = generate_with_deadline(backend.model, prompt, config)
+            backend.breaker.record_success()
             
-            response = model.generate_content(prompt)
-            result_text = response.text.strip()
+            # A reply that can't be repaired escalates to the next tier rather
+            # than spending another call on the same model
+            classification = parse_classification(response.text, index)
+            if classification is None:
+                print(f"⚠️ Unusable reply from {backend.name}")
+                return None
             
-            # Remove markdown code blocks if present
-            if result_text.startswith('```json'):
-                result_text = result_text.replace('```json', '').replace('```', '').strip()
-            elif result_text.startswith('```'):
-                result_text = result_text.replace('```', '').strip()
-            
-            classification = json.loads(result_text)
-            
-            # Validate required fields
-            if not all(k in classification for k in ['categories', 'confidence', 'recipients']):
-                raise ValueError("Missing required fields in classification")
+            record_tokens(response, prompt, index, classification)
+            _log_classification(classification)
+            return classification
+        
+        except Exception as e:
+            wait_time = _retry_delay(backend, e, attempt, max_retries)
+            if wait_time is None:
+                return None
+            time.sleep(wait_time)
+    
+    print(f"⚠️ All retries exhausted on {backend.name}")
+    return None
+
+async def _classify_with_gemini_async(backend: GeminiBackend, subject: str, content: str) -> Optional[dict]:
+    """_classify_with_gemini() on the SDK's async client, inside a rate-limited concurrency slot"""
+    max_retries = 2
+    team_members_by_dept = await _get_roster_async()
+    index = department_index(team_members_by_dept)
+    if not index.ids:
+        print(f"⚠️ No departments to classify into, skipping {backend.name}")
+        return None
+    prompt = build_classification_prompt(subject, content, team_members_by_dept)
+    config = generation_config(list(index.ids))
+    
+    for attempt in range(max_retries):
+        try:
+            async with _gemini_slot():
+                print(f"🤖 AI Classification ({backend.name}, async) attempt {attempt + 1}/{max_retries}...")
+                response = await asyncio.wait_for(
+                    backend.model.generate_content_async(prompt, generation_config=config),
+                    timeout=settings.GEMINI_CALL_DEADLINE_SECONDS
+                )
+            backend.breaker.record_success()
             
-            print(f"✅ AI Classification successful:")
-            print(f"   Categories: {classification['categories']}")
-            print(f"   Confidence: {classification['confidence']}")
-            print(f"   Recipients: {classification['recipients']}")
+            classification = parse_classification(response.text, index)
+            if classification is None:
+                print(f"⚠️ Unusable reply from {backend.name}")
+                return None
             
+            record_tokens(response, prompt, index, classification)
+            _log_classification(classification)
             return classification
         
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON parsing error: {e}")
-            print(f"Raw response: {result_text[:200]}...")
-            if attempt < max_retries - 1:
-                print(f"Retrying...")
-                time.sleep(3)
-                continue
-            else:
-                print(f"⚠️ Using fallback after JSON errors")
-                return fallback_classify_email(subject, content)
-        
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            if any(keyword in error_msg for keyword in ['429', 'quota', 'resource_exhausted', 'rate limit']):
-                if attempt < max_retries - 1:
-                    wait_time = 10
-                    print(f"⚠️ Rate limit detected, waiting {wait_time}s... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"⚠️ Rate limit persists, using fallback classification")
-                    return fallback_classify_email(subject, content)
-            else:
-                print(f"❌ Classification error: {e}")
-                return fallback_classify_email(subject, content)
-    
-    print(f"⚠️ All retries exhausted, using fallback")
-    return fallback_classify_email(subject, content)
\ No newline at end of file
+            wait_time = _retry_delay(backend, e, attempt, max_retries)
+            if wait_time is None:
+                return None
+            await asyncio.sleep(wait_time)
+    
+    print(f"⚠️ All retries exhausted on {backend.name}")
+    return None
\ No newline at end of file
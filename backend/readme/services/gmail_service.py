@@ -1,12 +1,45 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import base64
-from typing import List, Dict
+import json
+from pathlib import Path
+from typing import Callable, List, Dict, Optional, Tuple
+
+# Gmail accepts up to 100 calls per batch request but recommends at most 50
+BATCH_SIZE = 50
+
+# Largest page messages.list returns
+LIST_PAGE_MAX = 500
+
+# Headers fetched before deciding whether an email's body is needed (see prefilter_service)
+METADATA_HEADERS = ['From', 'Subject', 'List-Unsubscribe', 'List-Id', 'Precedence',
+                    'Auto-Submitted', 'Return-Path', 'X-Autoreply', 'X-Autorespond']
+
+def load_token_data(user_email: str) -> Optional[dict]:
+    """Load a user's saved OAuth token in the shape get_service expects (None if not connected)"""
+    token_file = Path(f"tokens/{user_email}_token.json")
+    
+    if not token_file.exists():
+        return None
+    
+    with open(token_file, 'r') as f:
+        token_data = json.load(f)
+    
+    return {
+        'access_token': token_data['token'],
+        'refresh_token': token_data['refresh_token'],
+        'token_uri': token_data['token_uri'],
+        'client_id': token_data['client_id'],
+        'client_secret': token_data['client_secret'],
+        'scopes': token_data.get('scopes', [])
+    }
 
 def get_service(token_data: dict):
     """Create Gmail API service from token data"""
+    # Imported here so routes that never touch Gmail don't pay for the client libraries
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
     # Use from_authorized_user_info - Google's recommended method
     credentials = Credentials.from_authorized_user_info(
         {
@@ -25,55 +58,97 @@ def get_profile(token_data: dict) -> dict:
     service = get_service(token_data)
     return service.users().getProfile(userId='me').execute()
 
-def fetch_unread_emails(token_data: dict, max_results: int = 10) -> List[Dict]:
-    """Fetch unread emails from inbox"""
+def _batch_get(service, ids: List[str], **params) -> Dict[str, dict]:
+    """messages.get for many ids in batch requests; ids that fail are left out and logged"""
+    found: Dict[str, dict] = {}
+    
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            print(f"⚠️ Could not fetch email {request_id}: {exception}")
+        else:
+            found[request_id] = response
+    
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for email_id in ids[start:start + BATCH_SIZE]:
+            batch.add(service.users().messages().get(userId='me', id=email_id, **params), request_id=email_id)
+        batch.execute()
+    return found
+
+def list_unread_page(token_data: dict, max_results: int = 10,
+                     page_token: Optional[str] = None) -> Tuple[List[str], Optional[str], int]:
+    """One page of unread email ids, newest first: (ids, next page token or None, Gmail's estimate of the total)"""
     service = get_service(token_data)
     
     results = service.users().messages().list(
         userId='me',
         q='is:unread',
-        maxResults=max_results
+        maxResults=min(max_results, LIST_PAGE_MAX),
+        pageToken=page_token
     ).execute()
     
-    messages = results.get('messages', [])
+    ids = [msg['id'] for msg in results.get('messages', [])]
+    return ids, results.get('nextPageToken'), results.get('resultSizeEstimate', len(ids))
+
+def fetch_emails(token_data: dict, ids: List[str],
+                 skip_body: Optional[Callable[[dict], bool]] = None) -> List[Dict]:
+    """Fetch emails by id.
+    
+    Headers and labels come from a metadata-only fetch first; `skip_body` sees
+    that email (with a lower-cased `headers` dict) and can return True to keep
+    its body from being downloaded at all. Such emails get an empty body.
+    """
+    service = get_service(token_data)
+    
+    metadata = _batch_get(service, ids, format='metadata', metadataHeaders=METADATA_HEADERS)
     
     emails = []
-    for msg in messages:
-        email_data = service.users().messages().get(
-            userId='me',
-            id=msg['id'],
-            format='full'
-        ).execute()
-        
-        headers = email_data['payload']['headers']
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-        
-        body = get_email_body(email_data['payload'])
+    for email_id in ids:
+        if email_id not in metadata:
+            continue
+        message = metadata[email_id]
+        headers = {}
+        for h in message['payload'].get('headers', []):
+            headers.setdefault(h['name'].lower(), h['value'])
         
         emails.append({
-            'id': msg['id'],
-            'subject': subject,
-            'sender': sender,
-            'body': body
+            'id': email_id,
+            'thread_id': message.get('threadId'),
+            'labels': message.get('labelIds', []),
+            'received_at': int(message.get('internalDate', 0)) / 1000,
+            'subject': headers.get('subject', 'No Subject'),
+            'sender': headers.get('from', 'Unknown'),
+            'headers': headers,
+            'body': ''
         })
     
-    return emails
+    skipped = {e['id'] for e in emails if skip_body is not None and skip_body(e)}
+    full = _batch_get(service, [e['id'] for e in emails if e['id'] not in skipped], format='full')
+    for email_data in emails:
+        if email_data['id'] in full:
+            email_data['body'] = get_email_body(full[email_data['id']]['payload'])
+    
+    # An email whose body could not be fetched is left unread for the next run
+    return [e for e in emails if e['id'] in skipped or e['id'] in full]
+
+def _find_part(payload: dict, mime_type: str) -> Optional[dict]:
+    """First inline part of `mime_type` with data, searching nested multiparts depth first"""
+    if payload.get('mimeType') == mime_type and payload.get('body', {}).get('data') and not payload.get('filename'):
+        return payload
+    for part in payload.get('parts', []):
+        found = _find_part(part, mime_type)
+        if found is not None:
+            return found
+    return None
 
 def get_email_body(payload: dict) -> str:
-    """Extract email body from payload"""
-    if 'parts' in payload:
-        for part in payload['parts']:
-            if part['mimeType'] == 'text/plain':
-                data = part['body'].get('data', '')
-                if data:
-                    return base64.urlsafe_b64decode(data).decode('utf-8')
-    
-    if 'body' in payload and 'data' in payload['body']:
-        data = payload['body']['data']
-        return base64.urlsafe_b64decode(data).decode('utf-8')
-    
-    return ""
+    """Extract email body from payload: the text/plain part, or the text/html one for HTML-only mail"""
+    part = _find_part(payload, 'text/plain') or _find_part(payload, 'text/html')
+    if part is None and 'data' in payload.get('body', {}):
+        part = payload
+    if part is None:
+        return ""
+    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
 
 def mark_as_read(token_data: dict, email_id: str):
     """Mark email as read"""
@@ -84,19 +159,29 @@ def mark_as_read(token_data: dict, email_id: str):
         body={'removeLabelIds': ['UNREAD']}
     ).execute()
 
-def send_email(token_data: dict, to: str, subject: str, body: str):
-    """Send email via Gmail API"""
+def archive(token_data: dict, email_id: str):
+    """Mark email as read and take it out of the inbox"""
     service = get_service(token_data)
-    
+    service.users().messages().modify(
+        userId='me',
+        id=email_id,
+        body={'removeLabelIds': ['UNREAD', 'INBOX']}
+    ).execute()
+
+def build_message(to: str, subject: str, body: str) -> dict:
+    """Plain-text message body for messages.send"""
     message = MIMEText(body)
     message['to'] = to
     message['subject'] = subject
-    
-    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+def send_email(token_data: dict, to: str, subject: str, body: str):
+    """Send email via Gmail API"""
+    service = get_service(token_data)
     
     service.users().messages().send(
         userId='me',
-        body={'raw': raw}
+        body=build_message(to, subject, body)
     ).execute()
 
 def forward_email_via_api(token_data: dict, email_id: str, to: str):
@@ -118,4 +203,37 @@ def forward_email_via_api(token_data: dict, email_id: str, to: str):
     service.users().messages().send(
         userId='me',
         body={'raw': raw}
-    ).execute()
\ No newline at end of file
+    ).execute()
+
+def build_forward(to: str, sender: str, subject: str, content: str) -> dict:
+    """Forward message body for messages.send, built from a stored email instead of re-fetching it"""
+    message = MIMEText(
+        "---------- Forwarded message ---------\n"
+        f"From: {sender}\n"
+        f"Subject: {subject}\n\n"
+        f"{content}"
+    )
+    message['to'] = to
+    message['subject'] = f"Fwd: {subject or 'Forwarded Email'}"
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+def send_batch(token_data: dict, messages: List[dict]) -> List[Optional[str]]:
+    """Send messages through one service in batch requests; returns None or an error per message"""
+    service = get_service(token_data)
+    errors: List[Optional[str]] = [None] * len(messages)
+    
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            errors[int(request_id)] = str(exception)
+    
+    for start in range(0, len(messages), BATCH_SIZE):
+        chunk = range(start, min(start + BATCH_SIZE, len(messages)))
+        batch = service.new_batch_http_request(callback=on_response)
+        for index in chunk:
+            batch.add(service.users().messages().send(userId='me', body=messages[index]), request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as e:
+            for index in chunk:
+                errors[index] = errors[index] or str(e)
+    return errors
\ No newline at end of file
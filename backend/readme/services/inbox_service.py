@@ -0,0 +1,116 @@
+from services import gmail_service
+from config import get_settings
+import asyncio
+import heapq
+from collections import deque
+from typing import Callable, List, Optional
+
+settings = get_settings()
+
+class InboxStream:
+    """Unread emails, up to `limit`, fetched page by page ahead of the consumer.
+
+    A background task follows messages.list page tokens and fetches emails in
+    pages of INBOX_PAGE_SIZE on worker threads, keeping at most
+    INBOX_PREFETCH_PAGES pages waiting. Memory stays bounded by that window
+    however deep the backlog is, and the first page can be processed while
+    later ones are still being fetched. With a `rank`, take() chooses from
+    everything already fetched, not just the next emails in Gmail's order.
+    """
+
+    def __init__(self, token_data: dict, limit: int, skip_body: Optional[Callable[[dict], bool]] = None):
+        self.token_data = token_data
+        self.limit = limit
+        self.skip_body = skip_body
+        # Gmail's estimate of how many emails the stream will yield, known after the first list call
+        self.estimate: Optional[int] = None
+        self.exhausted = False
+        self._pages: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.INBOX_PREFETCH_PAGES))
+        self._buffer: deque = deque()
+        self._listed = asyncio.Event()
+        self._error: Optional[Exception] = None
+        # A failed page already taken off the queue, raised once the emails before it are used up
+        self._failure: Optional[Exception] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _produce(self):
+        try:
+            seen = set()
+            page_token = None
+            while len(seen) < self.limit:
+                ids, page_token, estimate = await asyncio.to_thread(
+                    gmail_service.list_unread_page, self.token_data, self.limit - len(seen), page_token)
+                if self.estimate is None:
+                    self.estimate = min(self.limit, estimate)
+                    self._listed.set()
+                # Mail changing state between list calls can repeat an id across pages
+                ids = [i for i in ids if i not in seen]
+                seen.update(ids)
+                for start in range(0, len(ids), settings.INBOX_PAGE_SIZE):
+                    page = await asyncio.to_thread(gmail_service.fetch_emails, self.token_data,
+                                                   ids[start:start + settings.INBOX_PAGE_SIZE], self.skip_body)
+                    await self._pages.put(page)
+                if not page_token:
+                    break
+            await self._pages.put(None)
+        except Exception as e:
+            # Handed to the consumer, so it fails the run instead of waiting forever
+            self._error = e
+            await self._pages.put(e)
+        finally:
+            self._listed.set()
+
+    async def open(self) -> int:
+        """Start fetching; returns the estimated number of emails once the first page is listed.
+        
+        Raises whatever made the first list call fail (an expired token, a
+        Gmail error), so that isn't reported as an empty inbox.
+        """
+        self._task = asyncio.create_task(self._produce())
+        await self._listed.wait()
+        if self.estimate is None and self._error is not None:
+            raise self._error
+        return self.estimate or 0
+
+    def _add(self, page):
+        if isinstance(page, Exception):
+            self._failure = page
+        elif page is None:
+            self.exhausted = True
+        else:
+            self._buffer.extend(page)
+
+    async def take(self, count: int, rank: Optional[Callable[[dict], float]] = None) -> List[dict]:
+        """Up to `count` more emails; fewer only once the inbox (or the limit) is exhausted.
+
+        With `rank`, pages that are already fetched are read too (up to the
+        prefetch window) and the `count` highest-ranked emails are taken, so an
+        urgent email on a later page isn't left for a later chunk. Ties keep
+        Gmail's order.
+        """
+        while len(self._buffer) < count and not self.exhausted:
+            if self._failure is not None:
+                self.exhausted = True
+                raise self._failure
+            self._add(await self._pages.get())
+        if rank is None:
+            return [self._buffer.popleft() for _ in range(min(count, len(self._buffer)))]
+
+        window = count + self._pages.maxsize * settings.INBOX_PAGE_SIZE
+        while (len(self._buffer) < window and not self.exhausted and self._failure is None
+               and not self._pages.empty()):
+            self._add(self._pages.get_nowait())
+        chosen = {id(e) for e in heapq.nlargest(count, self._buffer, key=rank)}
+        taken = [e for e in self._buffer if id(e) in chosen]
+        self._buffer = deque(e for e in self._buffer if id(e) not in chosen)
+        return taken
+
+    async def close(self):
+        """Stop prefetching; emails fetched but not taken stay unread for the next run"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._buffer.clear()
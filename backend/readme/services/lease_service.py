@@ -0,0 +1,47 @@
+from config import get_settings
+import async_database as adb
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List
+
+settings = get_settings()
+
+# Identifies this process in email_claims; each processing run adds its own suffix
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# owner -> when its leases were last extended
+_renewed_at: Dict[str, float] = {}
+
+def new_owner() -> str:
+    """Lease owner id for one processing run"""
+    return f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+
+async def claim(emails: List[dict], owner: str) -> List[dict]:
+    """Keep only the emails this run managed to lease; the rest belong to another worker"""
+    if not emails:
+        return emails
+
+    claimed = set(await adb.claim_emails([e['id'] for e in emails], owner, settings.EMAIL_CLAIM_LEASE_SECONDS))
+    _renewed_at[owner] = time.monotonic()
+
+    skipped = len(emails) - len(claimed)
+    if skipped:
+        print(f"🔒 {skipped} of {len(emails)} emails are being processed by another worker, skipping them")
+    return [e for e in emails if e['id'] in claimed]
+
+async def keep_alive(owner: str):
+    """Extend this run's leases once a third of the lease time has passed"""
+    renewed_at = _renewed_at.get(owner)
+    if renewed_at is None or time.monotonic() - renewed_at < settings.EMAIL_CLAIM_LEASE_SECONDS / 3:
+        return
+    _renewed_at[owner] = time.monotonic()
+    held = await adb.renew_claims(owner, settings.EMAIL_CLAIM_LEASE_SECONDS)
+    print(f"🔒 Renewed {held} email leases for {owner}")
+
+async def release(owner: str):
+    """Give up this run's leases; unprocessed (e.g. deferred) emails go to the next run"""
+    if _renewed_at.pop(owner, None) is None:
+        return
+    await adb.release_claims(owner)
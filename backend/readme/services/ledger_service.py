@@ -0,0 +1,60 @@
+import async_database as adb
+import json
+from typing import List, Optional
+
+STEP_CLASSIFIED = "classified"
+STEP_REPLIED = "replied"
+STEP_FORWARDED = "forwarded"
+STEP_MARKED_READ = "marked_read"
+
+# Steps every processed email goes through; forwarding is a manual action on top
+PIPELINE_STEPS = [STEP_CLASSIFIED, STEP_REPLIED, STEP_MARKED_READ]
+
+async def resume(emails: List[dict]) -> List[dict]:
+    """Check a fetched batch against the ledger and drop emails that are already fully processed.
+
+    Emails that got part of the way in an earlier run keep `done_steps` and
+    their saved decision in `prior_classification`, so only the missing steps run.
+    """
+    if not emails:
+        return emails
+
+    progress = await adb.get_pipeline_progress([e['id'] for e in emails])
+    remaining = []
+    for email_data in emails:
+        entry = progress.get(email_data['id'])
+        if entry is None:
+            remaining.append(email_data)
+            continue
+
+        done = set(entry['steps'])
+        if all(step in done for step in PIPELINE_STEPS):
+            continue
+        if STEP_CLASSIFIED in done and entry['categories'] is None:
+            # The saved decision is gone, so classify again
+            done.discard(STEP_CLASSIFIED)
+        email_data['done_steps'] = done
+        if STEP_CLASSIFIED in done:
+            email_data['prior_classification'] = {
+                "categories": json.loads(entry['categories'] or '[]'),
+                "confidence": entry['confidence'],
+                "recipients": json.loads(entry['recipients'] or '[]'),
+                "reasoning": "Classified in an earlier run",
+                "source": entry['source'] or 'llm'
+            }
+        remaining.append(email_data)
+
+    skipped = len(emails) - len(remaining)
+    resumed = sum(1 for e in remaining if e.get('done_steps'))
+    if skipped or resumed:
+        print(f"📒 Ledger: {skipped} emails already processed, {resumed} resumed part-way")
+    return remaining
+
+def needs(email_data: dict, step: str) -> bool:
+    """Whether a step still has to run for this email"""
+    return step not in email_data.get('done_steps', ())
+
+async def record(email_data: dict, step: str, writer: Optional[adb.BufferedWriter] = None):
+    """Mark a step as done for this email, through the run's buffered writer if given"""
+    email_data.setdefault('done_steps', set()).add(step)
+    await (writer or adb).record_step(email_data['id'], step)
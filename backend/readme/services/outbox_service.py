@@ -0,0 +1,139 @@
+from services import gmail_service
+from config import get_settings
+import async_database as adb
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+settings = get_settings()
+
+KIND_REPLY = "reply"
+# Only auto-replies are queued. Forwards (manual and bulk review) are sent inline:
+# the team lead waits for a per-item result, and the review is closed, the
+# sender rule learned and the ledger step recorded only once Gmail accepts them.
+
+AUTO_REPLY_BODY = """Hello,
+
+Thank you for contacting us. Your email has been received and automatically routed to our {department} department.
+
+Our team will review your message and respond as soon as possible.
+
+Best regards,
+Emailia Auto-Routing System
+"""
+
+# Set when a run commits new messages, so the sender doesn't wait for its next poll
+_wakeup: Optional[asyncio.Event] = None
+_totals = {"sent": 0, "retried": 0, "dead": 0}
+_last_round: Optional[dict] = None
+
+def wake():
+    """Tell the background sender there is new mail to send"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def _wake_after_commit():
+    wake()
+
+async def enqueue_reply(writer: adb.BufferedWriter, user_email: str, email_data: dict, department: str) -> str:
+    """Buffer an email's auto-reply in the run's writer, so it commits with the classification; returns the recipient"""
+    sender_email = email_data['sender'].split('<')[-1].strip('>')
+    message = gmail_service.build_message(sender_email, f"Re: {email_data['subject']}",
+                                          AUTO_REPLY_BODY.format(department=department))
+    await writer.enqueue_message(email_data['id'], KIND_REPLY, user_email, sender_email, message['raw'])
+    await writer.when_durable(_wake_after_commit)
+    return sender_email
+
+def _backoff(attempts: int) -> float:
+    """Exponential delay before the next attempt, with jitter so failed batches don't retry in lockstep"""
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+async def _send_chunk(chunk: List[dict], semaphore: asyncio.Semaphore) -> List[Optional[str]]:
+    """Send one user's messages as a Gmail batch request; returns None or an error per message"""
+    # Reads the token file; off the event loop like the Gmail calls
+    token_data = await asyncio.to_thread(gmail_service.load_token_data, chunk[0]['user_email'])
+    if token_data is None:
+        return ["Gmail account is no longer connected"] * len(chunk)
+    async with semaphore:
+        try:
+            return await asyncio.to_thread(gmail_service.send_batch, token_data, [{'raw': row['raw']} for row in chunk])
+        except Exception as e:
+            return [str(e)] * len(chunk)
+
+async def send_round() -> int:
+    """Claim due messages, send them and record the outcome; returns how many were attempted"""
+    global _last_round
+    rows = await adb.claim_outbox(settings.OUTBOX_BATCH_SIZE * settings.OUTBOX_CONCURRENCY,
+                                  settings.OUTBOX_LEASE_SECONDS, settings.OUTBOX_MAX_ATTEMPTS)
+    if not rows:
+        return 0
+
+    started = time.monotonic()
+    by_user: Dict[str, List[dict]] = {}
+    for row in rows:
+        by_user.setdefault(row['user_email'], []).append(row)
+    size = settings.OUTBOX_BATCH_SIZE
+    chunks = [user_rows[i:i + size] for user_rows in by_user.values() for i in range(0, len(user_rows), size)]
+    semaphore = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+    results = await asyncio.gather(*(_send_chunk(chunk, semaphore) for chunk in chunks))
+
+    sent, retries, dead = [], [], []
+    now = time.time()
+    for chunk, errors in zip(chunks, results):
+        for row, error in zip(chunk, errors):
+            attempts = row['attempts'] + 1
+            if error is None:
+                sent.append(row['id'])
+            elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                dead.append((row['id'], error))
+            else:
+                retries.append((row['id'], error, now + _backoff(attempts)))
+    await adb.finish_outbox(sent, retries, dead)
+
+    _totals["sent"] += len(sent)
+    _totals["retried"] += len(retries)
+    _totals["dead"] += len(dead)
+    _last_round = {"sent": len(sent), "retried": len(retries), "dead": len(dead),
+                   "duration_seconds": round(time.monotonic() - started, 2)}
+    if retries or dead:
+        print(f"📮 Outbox: sent {len(sent)}, {len(retries)} will be retried, {len(dead)} dead-lettered")
+    for outbox_id, error in dead:
+        print(f"❌ Outbox message {outbox_id} dead-lettered: {error}")
+    return len(rows)
+
+async def drain():
+    """Send until nothing is due (messages waiting on a retry delay stay queued)"""
+    while await send_round():
+        pass
+
+async def run_periodically():
+    """Background sender started by the app lifespan"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    try:
+        while True:
+            # Cleared before sending, so a wake-up during the round triggers another one
+            _wakeup.clear()
+            try:
+                await drain()
+            except Exception as e:
+                print(f"❌ Outbox sender failed: {e}")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _wakeup = None
+
+async def status() -> dict:
+    """Outbox depth and age, recent dead letters and sender totals since startup"""
+    stats = await adb.get_outbox_stats()
+    return {
+        "depth": stats["counts"].get("pending", 0) + stats["counts"].get("sending", 0),
+        **stats,
+        "sender_running": _wakeup is not None,
+        "totals": dict(_totals),
+        "last_round": _last_round,
+    }
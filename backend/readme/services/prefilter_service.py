@@ -0,0 +1,103 @@
+from utils.email_parser import extract_email_address
+from config import get_settings
+from typing import Dict, Optional
+
+settings = get_settings()
+
+# Decision source of pre-filtered mail; such mail never gets an auto-reply
+SOURCE = "prefilter"
+
+CATEGORIES = {c.strip() for c in settings.PREFILTER_CATEGORIES.split(',') if c.strip()}
+NOREPLY_PATTERNS = [p.strip().lower() for p in settings.PREFILTER_NOREPLY_PATTERNS.split(',') if p.strip()]
+
+# Precedence values that mark mail as not written by a person
+BULK_PRECEDENCE = {"bulk", "list", "junk", "auto_reply"}
+
+_counts: Dict[str, int] = {}
+
+def _auto_submitted(email_data: dict, headers: Dict[str, str]) -> bool:
+    # RFC 3834: anything but "no" (auto-generated, auto-replied, ...)
+    value = headers.get('auto-submitted', '').strip().lower()
+    return bool(value) and value != 'no'
+
+def _autoreply_header(email_data: dict, headers: Dict[str, str]) -> bool:
+    # Vacation responders that don't set Auto-Submitted
+    return 'x-autoreply' in headers or 'x-autorespond' in headers
+
+def _bounce(email_data: dict, headers: Dict[str, str]) -> bool:
+    # Delivery status notifications have an empty envelope sender
+    return headers.get('return-path', '').strip() == '<>'
+
+def _bulk_precedence(email_data: dict, headers: Dict[str, str]) -> bool:
+    return headers.get('precedence', '').strip().lower() in BULK_PRECEDENCE
+
+def _mailing_list(email_data: dict, headers: Dict[str, str]) -> bool:
+    return 'list-unsubscribe' in headers or 'list-id' in headers
+
+def _noreply_sender(email_data: dict, headers: Dict[str, str]) -> bool:
+    local_part = extract_email_address(email_data.get('sender') or '').lower().split('@')[0]
+    return any(pattern in local_part for pattern in NOREPLY_PATTERNS)
+
+def _gmail_category(email_data: dict, headers: Dict[str, str]) -> bool:
+    return bool(CATEGORIES.intersection(email_data.get('labels') or ()))
+
+# Checked in order; the first match names the rule an email is counted under
+RULES = [
+    ("auto-submitted", _auto_submitted),
+    ("autoreply-header", _autoreply_header),
+    ("bounce", _bounce),
+    ("bulk-precedence", _bulk_precedence),
+    ("mailing-list", _mailing_list),
+    ("noreply-sender", _noreply_sender),
+    ("gmail-category", _gmail_category),
+]
+
+def match(email_data: dict) -> bool:
+    """Check an email's headers and labels against the rules.
+
+    Works on a metadata-only fetch, so gmail_service can skip downloading the
+    body of matching mail. Tags the email with the matching rule in `prefilter`.
+    """
+    if not settings.PREFILTER_ENABLED:
+        return False
+
+    headers = email_data.get('headers') or {}
+    for name, rule in RULES:
+        if rule(email_data, headers):
+            email_data['prefilter'] = name
+            return True
+    return False
+
+def decision(email_data: dict, routed: Optional[dict]) -> dict:
+    """Decision for pre-filtered mail: the sender rule's routing if there is one, otherwise none"""
+    rule = email_data['prefilter']
+    _counts[rule] = _counts.get(rule, 0) + 1
+    if routed is not None:
+        return {
+            **routed,
+            "reasoning": f"Automated mail ({rule}); {routed.get('reasoning') or ''}".strip(),
+            "source": SOURCE
+        }
+    return {
+        "categories": [],
+        "confidence": 1.0,
+        "recipients": [],
+        "reasoning": f"Automated mail ({rule}), not routed",
+        "source": SOURCE
+    }
+
+def should_archive(classification: dict) -> bool:
+    """Whether to take an email out of the inbox instead of only marking it read"""
+    return (settings.PREFILTER_ARCHIVE and classification.get('source') == SOURCE
+            and not classification.get('recipients'))
+
+def stats() -> dict:
+    """Rule settings and how many emails each rule handled since startup"""
+    return {
+        "enabled": settings.PREFILTER_ENABLED,
+        "archive": settings.PREFILTER_ARCHIVE,
+        "categories": sorted(CATEGORIES),
+        "noreply_patterns": NOREPLY_PATTERNS,
+        "decisions": {name: _counts.get(name, 0) for name, _ in RULES},
+        "total": sum(_counts.values()),
+    }
@@ -0,0 +1,134 @@
+from config import get_settings
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+settings = get_settings()
+
+# Armed by an admin: how many upcoming runs to profile, optionally only one mailbox's
+_armed = {"runs": 0, "user_email": None, "interval_ms": settings.PROFILING_SAMPLE_INTERVAL_MS}
+_profiles: deque = deque(maxlen=max(1, settings.PROFILING_KEEP))
+_ids = itertools.count(1)
+
+def arm(runs: int, user_email: Optional[str] = None, interval_ms: Optional[float] = None) -> dict:
+    """Profile the next `runs` processing runs (of `user_email` only, if given)"""
+    _armed.update(runs=runs, user_email=user_email,
+                  interval_ms=interval_ms or settings.PROFILING_SAMPLE_INTERVAL_MS)
+    print(f"🔬 Profiling armed for the next {runs} runs" + (f" of {user_email}" if user_email else ""))
+    return dict(_armed)
+
+def disarm() -> dict:
+    _armed["runs"] = 0
+    return dict(_armed)
+
+def _frame_label(code) -> str:
+    """function (dir/file.py:line), short enough to read in a flamegraph"""
+    path = code.co_filename.replace(os.sep, '/').split('/')
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+def _idle(frame) -> bool:
+    """A pool or writer thread blocked on its empty work queue; such samples are left out"""
+    code = frame.f_code
+    if code.co_name == '_worker' and code.co_filename.endswith('thread.py'):
+        return True
+    caller = frame.f_back
+    return (code.co_name == 'wait' and caller is not None
+            and caller.f_code.co_name == 'get' and caller.f_code.co_filename.endswith('queue.py'))
+
+def _thread_role(name: str) -> str:
+    # Pool threads are numbered; group them so their stacks merge
+    return name.rstrip('0123456789').rstrip('_-') or name
+
+class Sampler(threading.Thread):
+    """Statistical profiler: snapshots every thread's stack at a fixed interval.
+
+    Samples of all threads, not just the run's coroutine, so time spent waiting
+    (the event loop in select, threads blocked on sqlite or HTTP) shows up too;
+    only threads idling on an empty work queue are skipped. Each stack starts
+    with the thread's role (MainThread, gemini, asyncio, ...).
+    """
+
+    def __init__(self, user_email: str, interval_ms: float):
+        super().__init__(name="profiler", daemon=True)
+        self.user_email = user_email
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = datetime.utcnow()
+        self._monotonic_start = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        labels: Dict[object, str] = {}
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident or _idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(_thread_role(names.get(thread_id, 'thread')))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def finish(self, detail: dict) -> dict:
+        self._stop_event.set()
+        self.join()
+        profile = {
+            "id": next(_ids),
+            "user_email": self.user_email,
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(time.monotonic() - self._monotonic_start, 2),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "detail": detail,
+            "stacks": self.stacks,
+        }
+        _profiles.append(profile)
+        print(f"🔬 Profile {profile['id']} captured: {self.samples} samples over {profile['duration_seconds']}s")
+        return profile
+
+def start(user_email: str) -> Optional[Sampler]:
+    """Start sampling a processing run if profiling is armed for it, else None"""
+    if _armed["runs"] <= 0:
+        return None
+    if _armed["user_email"] and _armed["user_email"] != user_email:
+        return None
+    _armed["runs"] -= 1
+    sampler = Sampler(user_email, _armed["interval_ms"])
+    sampler.start()
+    return sampler
+
+def stop(sampler: Optional[Sampler], detail: Optional[dict] = None):
+    """Finish a run's profile (no-op for runs that weren't profiled)"""
+    if sampler is not None:
+        sampler.finish(detail or {})
+
+def folded(profile: dict) -> str:
+    """Collapsed stacks ("frame;frame;frame count" per line) for flamegraph.pl, inferno or speedscope"""
+    return ''.join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+def get_profile(profile_id: int) -> Optional[dict]:
+    return next((p for p in _profiles if p["id"] == profile_id), None)
+
+def list_profiles() -> List[dict]:
+    """The kept profiles, oldest first, stacks included"""
+    return list(_profiles)
+
+def status() -> dict:
+    """Armed state and the kept profiles (without their stacks)"""
+    return {
+        "armed": dict(_armed),
+        "profiles": [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(_profiles)],
+    }
@@ -0,0 +1,82 @@
+from config import get_settings
+import async_database as adb
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+settings = get_settings()
+
+# Give startup some room before the first pass
+FIRST_RUN_DELAY_SECONDS = 60
+
+_last_run: Optional[dict] = None
+
+def _cutoff() -> str:
+    """RETENTION_DAYS ago, in the UTC format sqlite's CURRENT_TIMESTAMP uses"""
+    return (datetime.utcnow() - timedelta(days=settings.RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+
+async def run_once() -> dict:
+    """Compact old classifications, purge old reviewed items and vacuum freed pages"""
+    global _last_run
+    started = time.monotonic()
+    cutoff = _cutoff()
+    archive = settings.RETENTION_ARCHIVE_ENABLED
+
+    # Small batches, so the writer thread keeps serving processing runs in between
+    compacted = 0
+    while True:
+        count = await adb.compact_classifications(cutoff, settings.RETENTION_BATCH_SIZE, archive)
+        compacted += count
+        if count < settings.RETENTION_BATCH_SIZE:
+            break
+
+    purged = 0
+    while True:
+        count = await adb.purge_reviewed(cutoff, settings.RETENTION_BATCH_SIZE, archive)
+        purged += count
+        if count < settings.RETENTION_BATCH_SIZE:
+            break
+
+    sent_purged = 0
+    while True:
+        count = await adb.purge_sent_outbox(cutoff, settings.RETENTION_BATCH_SIZE)
+        sent_purged += count
+        if count < settings.RETENTION_BATCH_SIZE:
+            break
+
+    freed_pages = await adb.incremental_vacuum()
+
+    _last_run = {
+        "finished_at": datetime.utcnow().isoformat(),
+        "cutoff": cutoff,
+        "archived": archive,
+        "compacted_classifications": compacted,
+        "purged_reviews": purged,
+        "purged_outbox": sent_purged,
+        "freed_pages": freed_pages,
+        "duration_seconds": round(time.monotonic() - started, 2),
+    }
+    print(f"🧹 Retention: compacted {compacted} classifications, purged {purged} reviews and {sent_purged} sent messages, "
+          f"freed {freed_pages} pages (older than {cutoff})")
+    return _last_run
+
+async def run_periodically():
+    """Background job started by the app lifespan"""
+    await asyncio.sleep(FIRST_RUN_DELAY_SECONDS)
+    while True:
+        try:
+            await run_once()
+        except Exception as e:
+            print(f"❌ Retention job failed: {e}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL_HOURS * 3600)
+
+def status() -> dict:
+    """Retention settings and the last run's result"""
+    return {
+        "enabled": settings.RETENTION_DAYS > 0,
+        "retention_days": settings.RETENTION_DAYS,
+        "archive_enabled": settings.RETENTION_ARCHIVE_ENABLED,
+        "interval_hours": settings.RETENTION_INTERVAL_HOURS,
+        "last_run": _last_run,
+    }
@@ -0,0 +1,100 @@
+from services import gmail_service, sender_rules_service
+from utils.email_parser import extract_email_address, readable_text
+import async_database as adb
+import asyncio
+from typing import Dict, List
+
+# Largest number of decisions accepted in one bulk review
+MAX_BULK_DECISIONS = 500
+
+def _resolve_recipients(decision: dict, members_by_dept: Dict[str, List[dict]]) -> List[str]:
+    """Explicit recipients plus every member of the chosen departments, without duplicates"""
+    recipients = list(decision.get('recipients') or [])
+    for department in decision.get('departments') or []:
+        if department not in members_by_dept:
+            raise ValueError(f"Unknown department: {department}")
+        recipients += [member['email'] for member in members_by_dept[department]]
+    return list(dict.fromkeys(recipients))
+
+def _departments_of(decision: dict, recipients: List[str], department_of: Dict[str, str]) -> List[str]:
+    """Departments a decision routes to, including those of explicitly chosen recipients"""
+    departments = list(decision.get('departments') or [])
+    departments += [department_of[address] for address in
+                    (extract_email_address(r).lower() for r in recipients) if address in department_of]
+    return list(dict.fromkeys(departments))
+
+async def apply_decisions(token_data: dict, decisions: List[dict]) -> List[dict]:
+    """Forward and close many review-queue items at once.
+
+    Each decision is {review_id, departments, recipients, dismiss}. Forwards go
+    out through one Gmail service in batch requests, built from the stored
+    email instead of re-fetching it; all database updates for the items that
+    succeeded are then written in one transaction. Returns one result per decision.
+    """
+    reviews = await adb.get_reviews([d['review_id'] for d in decisions])
+    members_by_dept = await adb.get_team_members_by_department()
+    department_of = {member['email'].lower(): dept
+                     for dept, members in members_by_dept.items() for member in members}
+
+    results = []
+    outgoing = []  # (result, review, decision, recipients)
+    seen = set()
+    for decision in decisions:
+        review_id = decision['review_id']
+        result = {"review_id": review_id}
+        results.append(result)
+        review = reviews.get(review_id)
+
+        if review_id in seen:
+            result.update(status="error", error="Duplicate decision for this review")
+            continue
+        seen.add(review_id)
+        if review is None:
+            result.update(status="error", error="Review not found")
+            continue
+        if review['reviewed']:
+            # Already handled (e.g. a retried request); never forward twice
+            result.update(status="skipped", error="Already reviewed")
+            continue
+        if decision.get('dismiss'):
+            result.update(status="dismissed", email_id=review['email_id'])
+            continue
+
+        try:
+            recipients = _resolve_recipients(decision, members_by_dept)
+        except ValueError as e:
+            result.update(status="error", error=str(e))
+            continue
+        if not recipients:
+            result.update(status="error", error="No recipients or departments given")
+            continue
+        outgoing.append((result, review, decision, recipients))
+
+    if outgoing:
+        messages = [gmail_service.build_forward(', '.join(recipients), review['sender'],
+                                                review['subject'] or '', readable_text(review['content'] or ''))
+                    for _, review, _, recipients in outgoing]
+        errors = await asyncio.to_thread(gmail_service.send_batch, token_data, messages)
+        for (result, review, _, recipients), error in zip(outgoing, errors):
+            if error:
+                result.update(status="error", error=error)
+            else:
+                result.update(status="forwarded", email_id=review['email_id'], recipients=recipients)
+
+    completed = [r for r in results if r['status'] in ("forwarded", "dismissed")]
+    forwarded = [entry for entry in outgoing if entry[0]['status'] == "forwarded"]
+    # The team lead's choices feed the sender routing table, in the same transaction
+    routes = sender_rules_service.review_routes([
+        (review['sender'], department)
+        for _, review, decision, recipients in forwarded
+        for department in _departments_of(decision, recipients, department_of)
+    ])
+    await adb.complete_reviews([r['review_id'] for r in completed],
+                               [review['email_id'] for _, review, _, _ in forwarded], routes)
+    # Only after the commit, so a failed one leaves the cache matching the database
+    sender_rules_service.remember_routes(routes)
+
+    print(f"📬 Bulk review: {len(forwarded)} forwarded, "
+          f"{sum(1 for r in results if r['status'] == 'dismissed')} dismissed, "
+          f"{sum(1 for r in results if r['status'] == 'error')} failed")
+    return results
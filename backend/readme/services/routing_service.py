@@ -0,0 +1,247 @@
+from services import classifier_service, sender_rules_service, scheduler_service, prefilter_service
+from utils.email_parser import extract_email_address
+from utils.near_duplicates import simhash, cluster_by_simhash
+from config import get_settings
+import async_database as adb
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+settings = get_settings()
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse sqlite CURRENT_TIMESTAMP (UTC) values"""
+    return datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+
+def _in_run_thread_history(email_data: dict, batch_decisions: Dict[str, dict]) -> List[dict]:
+    """Decisions for earlier messages of the thread routed in this run, newest first, shaped like saved rows.
+
+    The run's writer saves rows in batches, so these may not be in the database yet.
+    """
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    history = []
+    for earlier in email_data.get('thread_of', []):
+        decision = batch_decisions.get(earlier['email_id'])
+        if decision is None:
+            continue
+        history.append({
+            "email_id": earlier['email_id'],
+            "sender": earlier['sender'],
+            "categories": json.dumps(decision.get('categories', [])),
+            "confidence": decision.get('confidence'),
+            "recipients": json.dumps(decision.get('recipients', [])),
+            "source": decision.get('source'),
+            "created_at": now
+        })
+    return history
+
+async def thread_decision(email_data: dict, batch_decisions: Optional[Dict[str, dict]] = None) -> Optional[dict]:
+    """Reuse the routing decision of an already-routed thread, or None to classify"""
+    thread_id = email_data.get('thread_id')
+    if not settings.THREAD_ROUTING_ENABLED or not thread_id:
+        return None
+
+    history = _in_run_thread_history(email_data, batch_decisions or {})
+    in_run = {row['email_id'] for row in history}
+    saved = await adb.get_thread_classifications(thread_id, exclude_email_id=email_data['id'])
+    history += [row for row in saved if row['email_id'] not in in_run]
+    # Automated messages in the thread say nothing about where a person's reply belongs
+    history = [row for row in history if row['source'] != prefilter_service.SOURCE]
+    if not history:
+        return None
+
+    latest = history[0]
+    if latest['confidence'] is None or latest['confidence'] < settings.CONFIDENCE_THRESHOLD:
+        print(f"🧵 Thread {thread_id}: earlier decision was low confidence, re-classifying")
+        return None
+
+    gap_hours = (datetime.utcnow() - _parse_timestamp(latest['created_at'])).total_seconds() / 3600
+    if gap_hours > settings.THREAD_REROUTE_GAP_HOURS:
+        print(f"🧵 Thread {thread_id}: quiet for {gap_hours:.0f}h, re-classifying")
+        return None
+
+    if settings.THREAD_REROUTE_ON_NEW_PARTICIPANT:
+        sender = extract_email_address(email_data['sender']).lower()
+        participants = {extract_email_address(row['sender']).lower() for row in history}
+        team = {m['email'].lower() for m in await adb.get_team_members()}
+        if sender not in participants and sender not in team:
+            print(f"🧵 Thread {thread_id}: new participant {sender}, re-classifying")
+            return None
+
+    print(f"🧵 Thread {thread_id}: inheriting decision from {latest['email_id']}")
+    return {
+        "categories": json.loads(latest['categories'] or '[]'),
+        "confidence": latest['confidence'],
+        "recipients": json.loads(latest['recipients'] or '[]'),
+        "reasoning": f"Inherited from earlier message {latest['email_id']} in the same thread",
+        "source": "thread"
+    }
+
+async def sender_decision(email_data: dict) -> Optional[dict]:
+    """Route a repeat sender from the learned sender/domain table, or None to classify"""
+    rule = await sender_rules_service.lookup(email_data['sender'])
+    if rule is None:
+        return None
+
+    roster = await adb.get_team_members_by_department()
+    members = roster.get(rule['department'])
+    if not members:
+        return None
+
+    print(f"📇 Sender rule {rule['key']} → {rule['department']} ({rule['share']:.0%} of {rule['hits']:.0f})")
+    return {
+        "categories": [rule['department']],
+        "confidence": round(rule['share'], 2),
+        "recipients": [m['email'] for m in members],
+        "reasoning": f"{rule['share']:.0%} of {rule['hits']:.0f} earlier emails from {rule['key']} went to {rule['department']}",
+        "source": "sender-rule"
+    }
+
+def cluster_batch(emails: List[dict]) -> int:
+    """Tag near-duplicate emails in a fetched batch with their cluster representative.
+
+    Sets `cluster_of` on every member after the first of its cluster and
+    returns how many emails can reuse a representative's decision.
+    """
+    if not settings.NEAR_DUPLICATE_CLUSTERING or len(emails) < 2:
+        return 0
+
+    # Pre-filtered mail was fetched without a body and is routed by its headers
+    fingerprints = {e['id']: simhash(e['body'], settings.NEAR_DUPLICATE_MIN_SHINGLES)
+                    for e in emails if not e.get('prefilter')}
+    representative_of = cluster_by_simhash(fingerprints, settings.NEAR_DUPLICATE_MAX_DISTANCE)
+    for email_data in emails:
+        if email_data['id'] in representative_of:
+            email_data['cluster_of'] = representative_of[email_data['id']]
+
+    if representative_of:
+        print(f"🧩 {len(representative_of)} of {len(emails)} emails are near-duplicates in "
+              f"{len(set(representative_of.values()))} clusters")
+    return len(representative_of)
+
+def cluster_decision(email_data: dict, batch_decisions: Dict[str, dict]) -> Optional[dict]:
+    """Apply the cluster representative's decision to a near-duplicate"""
+    representative = email_data.get('cluster_of')
+    decision = batch_decisions.get(representative) if representative else None
+    if decision is None:
+        return None
+
+    return {
+        **decision,
+        "reasoning": f"Near-duplicate of {representative}: {decision.get('reasoning') or ''}".strip(),
+        "source": "cluster"
+    }
+
+async def route_email(email_data: dict, batch_decisions: Optional[Dict[str, dict]] = None) -> Optional[dict]:
+    """Route an email, trying cheap decision sources before the LLM classifier.
+
+    `batch_decisions` collects decisions made during one processing run so
+    near-duplicates tagged by cluster_batch() reuse their representative's.
+    Returns None when the scheduler deferred the email to a later run.
+    """
+    if batch_decisions is None:
+        batch_decisions = {}
+
+    scheduler_service.record_started(email_data)
+    decision = await _decide(email_data, batch_decisions)
+    if decision is not None:
+        batch_decisions[email_data['id']] = decision
+    return decision
+
+def _batch_dependencies(emails: List[dict]) -> Dict[str, str]:
+    """Map each email to the earlier batch email whose decision it may reuse (cluster representative or thread predecessor).
+
+    Also sets `thread_of` on later messages of a thread: the earlier batch
+    messages of that thread, newest first, for thread_decision() to read.
+    """
+    depends_on = {}
+    earlier_in_thread: Dict[str, List[dict]] = {}
+    for email_data in emails:
+        thread_id = email_data.get('thread_id')
+        earlier = earlier_in_thread.get(thread_id, []) if thread_id else []
+        if earlier:
+            email_data['thread_of'] = list(earlier)
+        predecessor = email_data.get('cluster_of') or (earlier[0]['email_id'] if earlier else None)
+        if predecessor:
+            depends_on[email_data['id']] = predecessor
+        if thread_id:
+            earlier.insert(0, {"email_id": email_data['id'], "sender": email_data['sender']})
+            earlier_in_thread[thread_id] = earlier
+    return depends_on
+
+async def route_batch(emails: List[dict], batch_decisions: Optional[Dict[str, dict]] = None,
+                      concurrency: Optional[int] = None) -> AsyncIterator[Tuple[dict, Optional[dict]]]:
+    """Route a batch with up to `concurrency` emails in flight, yielding (email, decision) in batch order.
+    
+    An email that can reuse an earlier batch email's decision (a near-duplicate
+    or a later message in the same thread) is started only after the caller
+    has handled that email. The decision is read back from `batch_decisions`,
+    since the caller's writer may not have saved it yet.
+    """
+    if batch_decisions is None:
+        batch_decisions = {}
+    concurrency = max(1, concurrency or settings.GEMINI_MAX_CONCURRENCY)
+    depends_on = _batch_dependencies(emails)
+    handled = set()
+    in_flight = deque()
+    next_index = 0
+    
+    try:
+        while next_index < len(emails) or in_flight:
+            while next_index < len(emails) and len(in_flight) < concurrency:
+                email_data = emails[next_index]
+                dependency = depends_on.get(email_data['id'])
+                if dependency and dependency not in handled:
+                    break
+                in_flight.append((email_data, asyncio.create_task(route_email(email_data, batch_decisions))))
+                next_index += 1
+            
+            email_data, task = in_flight.popleft()
+            yield email_data, await task
+            handled.add(email_data['id'])
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+
+async def _decide(email_data: dict, batch_decisions: Dict[str, dict]) -> Optional[dict]:
+    # Decided in an earlier run that stopped part-way (see ledger_service.resume)
+    decision = email_data.get('prior_classification')
+    if decision is not None:
+        return decision
+    
+    # Bulk and automated mail: sender rule or nothing, never the LLM
+    if email_data.get('prefilter'):
+        return prefilter_service.decision(email_data, await sender_decision(email_data))
+    
+    decision = await thread_decision(email_data, batch_decisions)
+    if decision is not None:
+        return decision
+
+    decision = cluster_decision(email_data, batch_decisions)
+    if decision is not None:
+        return decision
+
+    decision = await sender_decision(email_data)
+    if decision is not None:
+        return decision
+
+    # Low-priority mail in a deep queue doesn't get LLM quota
+    overflow = email_data.get('overflow')
+    if overflow in ('defer', 'fallback'):
+        scheduler_service.record_overflow(overflow)
+    if overflow == 'defer':
+        print(f"⏭️ Deferring low-priority email: {email_data['subject']}")
+        return None
+    if overflow == 'fallback':
+        return await asyncio.to_thread(classifier_service.fallback_classify_email,
+                                       email_data['subject'], email_data['body'])
+
+    # ✅ Rate limiting and the in-flight limit are handled inside classifier_service
+    classification = await classifier_service.classify_email_async(
+        subject=email_data['subject'],
+        content=email_data['body']
+    )
+    await sender_rules_service.learn_from_classification(email_data['sender'], classification)
+    return classification
@@ -0,0 +1,153 @@
+from utils.email_parser import extract_email_address
+from config import get_settings
+import async_database as adb
+import re
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Pattern
+
+settings = get_settings()
+
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+PRIORITIES = [PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW]
+
+HIGH_SCORE = 3
+LOW_SCORE = -1
+
+# Gmail's own bulk-mail tabs
+LOW_PRIORITY_LABELS = {"CATEGORY_PROMOTIONS", "CATEGORY_SOCIAL", "CATEGORY_FORUMS", "CATEGORY_UPDATES"}
+
+def urgent_pattern(keywords: str) -> Optional[Pattern]:
+    """Whole-word match of any comma-separated keyword; None when there are none (an empty
+    alternation would match every subject)"""
+    words = [re.escape(k.strip()) for k in keywords.split(',') if k.strip()]
+    return re.compile(r'\b(' + '|'.join(words) + r')\b', re.IGNORECASE) if words else None
+
+_URGENT_RE = urgent_pattern(settings.PRIORITY_URGENT_KEYWORDS)
+
+# Queue depth and recent wait times per priority, for /api/dashboard/scheduler
+_queued: Dict[str, int] = {p: 0 for p in PRIORITIES}
+_waits: Dict[str, deque] = {p: deque(maxlen=500) for p in PRIORITIES}
+_overflowed: Dict[str, int] = {"fallback": 0, "defer": 0}
+
+def _importance(sender: str, table: Dict[str, int]) -> int:
+    address = extract_email_address(sender).lower()
+    if address in table:
+        return table[address]
+    domain = address.rsplit('@', 1)[-1]
+    return table.get(f"@{domain}", 0)
+
+def score_email(email_data: dict, importance: Dict[str, int], now: float) -> int:
+    """Cheap priority score from sender importance, Gmail labels, subject keywords and age"""
+    score = _importance(email_data['sender'], importance)
+
+    labels = set(email_data.get('labels') or [])
+    if 'IMPORTANT' in labels:
+        score += 2
+    if labels & LOW_PRIORITY_LABELS:
+        score -= 2
+
+    if _URGENT_RE is not None and _URGENT_RE.search(email_data.get('subject') or ''):
+        score += 2
+
+    # Mail that has waited long gets a boost so low priority never starves
+    received_at = email_data.get('received_at') or 0
+    if received_at and settings.PRIORITY_AGE_BOOST_HOURS > 0:
+        age_hours = max(0.0, (now - received_at) / 3600)
+        score += min(2, int(age_hours // settings.PRIORITY_AGE_BOOST_HOURS))
+
+    return score
+
+def priority_for(score: int) -> str:
+    if score >= HIGH_SCORE:
+        return PRIORITY_HIGH
+    if score <= LOW_SCORE:
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+async def ranker() -> Optional[Callable[[dict], int]]:
+    """score_email() with the importance table loaded once, for InboxStream.take() to choose each
+    chunk from everything prefetched; None when priority scheduling is off"""
+    if not settings.PRIORITY_SCHEDULING_ENABLED:
+        return None
+    importance = {row['pattern']: row['weight'] for row in await adb.get_sender_priorities()}
+    now = time.time()
+    return lambda email_data: score_email(email_data, importance, now)
+
+async def schedule(emails: List[dict], backlog: int = 0) -> List[dict]:
+    """Order a fetched batch so high-priority mail is classified first.
+    
+    Only orders within the batch; which emails make up each batch is chosen
+    across the prefetch window with ranker(). An urgent email further back in
+    the inbox than that window still waits for its page.
+
+    Tags each email with `priority`, `priority_score` and `enqueued_at`. When
+    the batch plus `backlog` (emails of the same run still to be fetched) is
+    deeper than SCHEDULER_DEEP_QUEUE, low-priority emails are also tagged with
+    `overflow` (LOW_PRIORITY_OVERFLOW) so they skip the LLM.
+    """
+    if not emails:
+        return emails
+
+    now = time.time()
+    importance = {row['pattern']: row['weight'] for row in await adb.get_sender_priorities()}
+    deep = len(emails) + backlog > settings.SCHEDULER_DEEP_QUEUE
+
+    for email_data in emails:
+        score = score_email(email_data, importance, now)
+        email_data['priority_score'] = score
+        email_data['priority'] = priority_for(score) if settings.PRIORITY_SCHEDULING_ENABLED else PRIORITY_NORMAL
+        email_data['enqueued_at'] = time.monotonic()
+        if deep and email_data['priority'] == PRIORITY_LOW:
+            email_data['overflow'] = settings.LOW_PRIORITY_OVERFLOW
+        _queued[email_data['priority']] += 1
+
+    if not settings.PRIORITY_SCHEDULING_ENABLED:
+        return emails
+
+    # sorted() is stable, so equal scores keep Gmail's order
+    ordered = sorted(emails, key=lambda e: -e['priority_score'])
+    counts = {p: sum(1 for e in ordered if e['priority'] == p) for p in PRIORITIES}
+    print(f"📋 Scheduled {len(ordered)} emails: {counts['high']} high, {counts['normal']} normal, {counts['low']} low"
+          + (f" (queue deep, low priority → {settings.LOW_PRIORITY_OVERFLOW})" if deep and counts['low'] else ""))
+    return ordered
+
+def record_started(email_data: dict):
+    """An email left the queue: record how long it waited"""
+    priority = email_data.get('priority')
+    if priority not in _queued or email_data.get('started'):
+        return
+    email_data['started'] = True
+    _queued[priority] = max(0, _queued[priority] - 1)
+    _waits[priority].append(time.monotonic() - email_data.get('enqueued_at', time.monotonic()))
+
+def record_overflow(action: str):
+    """A low-priority email was sent to the fallback or deferred instead of the LLM"""
+    _overflowed[action] = _overflowed.get(action, 0) + 1
+
+def release(emails: List[dict]):
+    """Drop emails that were never started (run ended early) from the queue depth"""
+    for email_data in emails:
+        priority = email_data.get('priority')
+        if priority in _queued and not email_data.get('started'):
+            email_data['started'] = True
+            _queued[priority] = max(0, _queued[priority] - 1)
+
+def stats() -> dict:
+    """Queue depth and wait times by priority"""
+    by_priority = {}
+    for priority in PRIORITIES:
+        waits = sorted(_waits[priority])
+        by_priority[priority] = {
+            "queue_depth": _queued[priority],
+            "processed": len(waits),
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+        }
+    return {
+        "queue_depth": sum(_queued.values()),
+        "by_priority": by_priority,
+        "overflowed": dict(_overflowed),
+    }
@@ -0,0 +1,129 @@
+from utils.email_parser import extract_email_address
+from config import get_settings
+import async_database as adb
+import json
+import time
+import asyncio
+from typing import Dict, List, Optional
+
+settings = get_settings()
+
+# Shared mailbox providers say nothing about the sender's department
+FREEMAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com",
+    "live.com", "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com",
+}
+
+# route_key -> {department: hits}; refreshed from sender_routes periodically so
+# decisions made by other workers are picked up
+_routes: Dict[str, Dict[str, float]] = {}
+_loaded_at = 0.0
+_load_lock = asyncio.Lock()
+
+def route_keys(sender: str) -> List[str]:
+    """Lookup keys for a sender: the address, then '@domain' unless it is a freemail domain"""
+    address = extract_email_address(sender).lower()
+    keys = [address]
+    if '@' in address:
+        domain = address.rsplit('@', 1)[1]
+        if domain not in FREEMAIL_DOMAINS:
+            keys.append(f"@{domain}")
+    return keys
+
+async def _ensure_loaded():
+    global _routes, _loaded_at
+    if _loaded_at and time.monotonic() - _loaded_at < settings.SENDER_RULE_REFRESH_SECONDS:
+        return
+
+    async with _load_lock:
+        if _loaded_at and time.monotonic() - _loaded_at < settings.SENDER_RULE_REFRESH_SECONDS:
+            return
+
+        rows = await adb.get_sender_routes()
+        if not rows:
+            rows = await _backfill()
+
+        routes: Dict[str, Dict[str, float]] = {}
+        for row in rows:
+            routes.setdefault(row['route_key'], {})[row['department']] = row['hits']
+        _routes = routes
+        _loaded_at = time.monotonic()
+        print(f"📇 Loaded sender rules for {len(_routes)} senders/domains")
+
+async def _backfill() -> List[dict]:
+    """Build sender_routes from existing confident classifications"""
+    history = await adb.get_learnable_classifications(settings.CONFIDENCE_THRESHOLD)
+    hits: Dict[tuple, float] = {}
+    for row in history:
+        categories = json.loads(row['categories'] or '[]')
+        if categories:
+            for key in route_keys(row['sender']):
+                hits[(key, categories[0])] = hits.get((key, categories[0]), 0) + 1
+    if not hits:
+        return []
+    # One transaction for the whole history instead of a commit per row
+    await adb.add_sender_routes([(key, department, n) for (key, department), n in hits.items()])
+    return await adb.get_sender_routes()
+
+def _remember(keys: List[str], department: str, weight: float):
+    for key in keys:
+        counts = _routes.setdefault(key, {})
+        counts[department] = counts.get(department, 0) + weight
+
+async def lookup(sender: str) -> Optional[dict]:
+    """Return {'department', 'share', 'hits', 'key'} when a sender's history is consistent enough"""
+    if not settings.SENDER_RULES_ENABLED:
+        return None
+    await _ensure_loaded()
+
+    for key in route_keys(sender):
+        counts = _routes.get(key)
+        if not counts:
+            continue
+        total = sum(counts.values())
+        department, hits = max(counts.items(), key=lambda item: item[1])
+        share = hits / total
+        if total >= settings.SENDER_RULE_MIN_EMAILS and share >= settings.SENDER_RULE_THRESHOLD:
+            return {"department": department, "share": share, "hits": total, "key": key}
+        # A known but inconsistent address shouldn't fall through to its domain
+        if total >= settings.SENDER_RULE_MIN_EMAILS:
+            return None
+    return None
+
+async def learn(sender: str, department: str, weight: float = 1.0):
+    """Record one routing observation for a sender"""
+    keys = route_keys(sender)
+    await adb.record_sender_routes(keys, department, weight)
+    _remember(keys, department, weight)
+
+async def learn_from_classification(sender: str, classification: dict):
+    """Learn from confident LLM decisions only, so rules never reinforce themselves"""
+    if classification.get('source') != 'llm' or not classification.get('categories'):
+        return
+    if classification['confidence'] < settings.CONFIDENCE_THRESHOLD:
+        return
+    await learn(sender, classification['categories'][0])
+
+async def learn_from_review(sender: str, department: str):
+    """A team lead's routing decision outweighs a model's"""
+    await learn(sender, department, settings.SENDER_RULE_REVIEW_WEIGHT)
+
+def review_routes(decisions: List[tuple]) -> List[tuple]:
+    """The sender_routes rows for team lead (sender, department) decisions, so a bulk review can
+    store them in its own transaction; pass them to remember_routes() once that commits
+    """
+    return [(key, department, settings.SENDER_RULE_REVIEW_WEIGHT)
+            for sender, department in decisions for key in route_keys(sender)]
+
+def remember_routes(rows: List[tuple]):
+    """Add committed (route_key, department, weight) rows to the in-memory table"""
+    for key, department, weight in rows:
+        _remember([key], department, weight)
+
+async def learn_from_forward(sender: str, recipient_email: str):
+    """Learn from a manual forward to a team member, via the member's department"""
+    recipient = extract_email_address(recipient_email).lower()
+    for member in await adb.get_team_members():
+        if member['email'].lower() == recipient:
+            await learn_from_review(sender, member['department'])
+            return
@@ -0,0 +1,34 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Settings are required at import time; tests never reach Google or Gemini
+for key, value in {
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test-secret",
+    "GEMINI_API_KEY": "test-key",
+    "TEAM_LEAD_EMAIL": "lead@company.com",
+}.items():
+    os.environ.setdefault(key, value)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def scratch_database(tmp_path, monkeypatch):
+    """Point every test at a database (and archive directory) under tmp_path, never the checked-in one"""
+    import database as db
+
+    monkeypatch.setattr(db, "DATABASE_FILE", str(tmp_path / "email_routing.db"))
+    monkeypatch.setattr(db, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(db, "_db_initialized", False)
+    return db
+
+
+@pytest.fixture
+def database(scratch_database):
+    """A fresh, initialized routing database"""
+    scratch_database.init_db()
+    return scratch_database
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import async_database as adb
+
+
+def test_failed_flush_keeps_rows_and_callbacks(monkeypatch):
+    commits = []
+    outcomes = [RuntimeError("database is locked"), None]
+
+    async def write(fn, *rows):
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+        commits.append(rows)
+
+    monkeypatch.setattr(adb, "_write", write)
+    marked = []
+
+    async def run():
+        writer = adb.BufferedWriter(max_rows=10, max_delay=60)
+        await writer.save_classification("m1", "bob@example.com", "Invoice", "Please pay", '["Finance"]', 0.9, "[]")
+        await writer.record_step("m1", "classified")
+
+        async def mark_read():
+            marked.append("m1")
+
+        await writer.when_durable(mark_read)
+        with pytest.raises(RuntimeError):
+            await writer.flush()
+        assert marked == []
+        await writer.record_step("m1", "forwarded")
+        await writer.close()
+
+    asyncio.run(run())
+    classifications, reviews, steps, outbox = commits[0]
+    assert [row[0] for row in classifications] == ["m1"]
+    assert steps == [("m1", "classified"), ("m1", "forwarded")]
+    assert marked == ["m1"]
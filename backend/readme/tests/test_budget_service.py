@@ -0,0 +1,75 @@
+import pytest
+
+from services import budget_service, classifier_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_estimates(monkeypatch):
+    """No earlier runs, and plenty of LLM quota unless a test says otherwise"""
+    monkeypatch.setattr(budget_service, "_seconds_per_email", {})
+    monkeypatch.setattr(budget_service, "_llm_share", None)
+    monkeypatch.setattr(budget_service, "_running", [])
+    monkeypatch.setattr(budget_service, "_last_run", None)
+    monkeypatch.setattr(classifier_service, "calls_available", lambda seconds: 1000)
+
+
+def test_runs_beyond_the_concurrency_limit_are_refused():
+    runs = [budget_service.start("lead@example.com", 10) for _ in range(budget_service.settings.MAX_CONCURRENT_RUNS)]
+    assert all(runs)
+    assert budget_service.start("lead@example.com", 10) is None
+
+    budget_service.finish(runs[0])
+    assert budget_service.start("lead@example.com", 10) is not None
+
+
+def test_run_is_sized_to_its_share_of_the_llm_quota(monkeypatch):
+    monkeypatch.setattr(classifier_service, "calls_available", lambda seconds: 30)
+    budget_service.start("other@example.com", 10)
+    run = budget_service.start("lead@example.com", 50)
+    assert (run.planned, run.limited_by) == (15, "llm quota")
+
+    # Mostly sender-rule hits last time, so the same quota covers more emails
+    monkeypatch.setattr(budget_service, "_llm_share", 0.5)
+    monkeypatch.setattr(budget_service, "_running", [])
+    run = budget_service.start("lead@example.com", 50)
+    assert (run.planned, run.limited_by) == (50, None)
+
+
+def test_observed_latency_limits_the_next_run():
+    run = budget_service.start("lead@example.com", 10)
+    run.attempted = 10
+    run.timed("process", 60.0)
+    for _ in range(10):
+        run.record({"source": "llm"})
+    budget_service.finish(run)
+
+    budget = budget_service.settings.RUN_TIME_BUDGET_SECONDS
+    run = budget_service.start("lead@example.com", 1000)
+    assert (run.planned, run.limited_by) == (int(budget / 6.0), "time budget")
+
+
+def test_chunks_stop_at_the_plan_and_leave_a_continuation():
+    run = budget_service.start("lead@example.com", 30)
+    run.planned = 25
+    chunks = []
+    while (size := run.next_chunk()):
+        chunks.append(size)
+        run.attempted += size
+    assert chunks == [budget_service.settings.RUN_CHUNK_SIZE, 5]
+
+    token = run.continuation()
+    assert budget_service.decode_continuation(token, "lead@example.com") == 5
+    with pytest.raises(ValueError):
+        budget_service.decode_continuation(token, "someone@example.com")
+    with pytest.raises(ValueError):
+        budget_service.decode_continuation("not-a-token", "lead@example.com")
+
+    run.exhausted = True
+    assert run.continuation() is None
+
+
+def test_run_past_its_deadline_stops():
+    run = budget_service.start("lead@example.com", 30)
+    run.deadline = run.started
+    assert run.next_chunk() == 0
+    assert run.stopped == "time budget"
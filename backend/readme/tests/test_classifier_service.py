@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from config import Settings
+from services import classifier_service
+from utils.circuit_breaker import CircuitBreaker
+
+
+def test_backend_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        classifier_service.ClassifierBackend()
+
+
+def test_default_cascade_is_llm_only():
+    spec = Settings.model_fields["CLASSIFIER_CASCADE"].default
+    backends = classifier_service.build_cascade(spec)
+    assert backends and all(isinstance(b, classifier_service.GeminiBackend) for b in backends)
+
+
+def test_local_tier_is_opt_in():
+    backends = classifier_service.build_cascade("local,gemini-2.5-flash-lite")
+    assert isinstance(backends[0], classifier_service.KeywordBackend)
+
+
+def test_sync_and_async_calls_share_one_spacing(monkeypatch):
+    monkeypatch.setattr(classifier_service, "MIN_CALL_INTERVAL", 0.05)
+    monkeypatch.setattr(classifier_service, "last_api_call_time", 0)
+    booked = []
+
+    def book():
+        classifier_service._wait_for_call_slot()
+        booked.append(classifier_service.last_api_call_time)
+
+    async def book_async():
+        async with classifier_service._gemini_slot():
+            booked.append(classifier_service.last_api_call_time)
+
+    book()
+    asyncio.run(book_async())
+    book()
+    gaps = [b - a for a, b in zip(booked, booked[1:])]
+    assert all(gap >= 0.05 - 1e-6 for gap in gaps)
+
+
+def test_slot_primitives_are_per_event_loop(monkeypatch):
+    monkeypatch.setattr(classifier_service, "MIN_CALL_INTERVAL", 0)
+
+    async def slot_primitives():
+        async with classifier_service._gemini_slot():
+            return classifier_service._loop_slots[asyncio.get_running_loop()]
+
+    first = asyncio.run(slot_primitives())
+    second = asyncio.run(slot_primitives())
+    assert first[0] is not second[0] and first[1] is not second[1]
+
+
+ROSTER = {
+    "Finance": [{"name": "Fay", "email": "fay@example.com"}],
+    "Support": [{"name": "Sam", "email": "sam@example.com"}, {"name": "Sid", "email": "sid@example.com"}],
+}
+
+
+def test_parse_classification_resolves_ids_and_names():
+    index = classifier_service.department_index(ROSTER)
+    result = classifier_service.parse_classification(
+        '```json\n{"departments": ["d2", "finance", "d9"], "confidence": 1.4}\n```', index)
+    assert result["categories"] == ["Support", "Finance"]
+    assert result["recipients"] == ["sam@example.com", "sid@example.com", "fay@example.com"]
+    assert result["confidence"] == 1.0
+
+
+def test_parse_classification_rejects_unusable_replies():
+    index = classifier_service.department_index(ROSTER)
+    assert classifier_service.parse_classification("no idea", index) is None
+    assert classifier_service.parse_classification('{"departments": ["d9"], "confidence": 0.8}', index) is None
+    assert classifier_service.parse_classification('{"confidence": "high"}', index) is None
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        raise RuntimeError("500 An internal error has occurred")
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        raise RuntimeError("500 An internal error has occurred")
+
+
+def half_open_backend(monkeypatch):
+    monkeypatch.setattr(classifier_service, "get_roster", lambda: ROSTER)
+    monkeypatch.setattr(classifier_service, "MIN_CALL_INTERVAL", 0)
+    backend = classifier_service.GeminiBackend("gemini-test", model=FailingModel())
+    backend.breaker = CircuitBreaker("Gemini test", failure_threshold=1, reset_timeout=0, half_open_max_calls=1)
+    backend.breaker.record_failure()
+    return backend
+
+
+def test_failed_probe_reopens_the_circuit(monkeypatch):
+    backend = half_open_backend(monkeypatch)
+    assert backend.classify("Invoice", "Please pay") is None
+    assert backend.classify("Invoice", "Please pay") is None
+    # Each probe got through: the first one's 500 was recorded, so the circuit could half-open again
+    assert backend.model.calls == 2
+
+
+def test_failed_async_probe_reopens_the_circuit(monkeypatch):
+    backend = half_open_backend(monkeypatch)
+
+    async def classify_twice():
+        async def roster():
+            return ROSTER
+        monkeypatch.setattr(classifier_service, "_get_roster_async", roster)
+        await backend.classify_async("Invoice", "Please pay")
+        await backend.classify_async("Invoice", "Please pay")
+
+    asyncio.run(classify_twice())
+    assert backend.model.calls == 2
@@ -0,0 +1,43 @@
+from utils.email_parser import CHARS_PER_TOKEN, GAP, fit_token_budget, readable_text, strip_email_text
+
+
+def test_readable_text_keeps_line_breaks():
+    body = "Hi team,\n\nThe invoice is attached.\nPlease pay by Friday.\n\n-- \nBob"
+    assert readable_text(body) == body
+
+
+def test_readable_text_converts_html_and_keeps_quotes():
+    html = ('<html><head><style>p {}</style></head><body><p>Payment failed.<br>Order 55</p>'
+            '<div class="gmail_quote">On Mon, Alice wrote:<blockquote>Earlier &amp; older</blockquote></div>'
+            '</body></html>')
+    assert readable_text(html) == "Payment failed.\nOrder 55\nOn Mon, Alice wrote:\nEarlier & older"
+
+
+def test_strip_email_text_drops_history_and_signature():
+    body = ("Hi,\n\nThe   invoice\tis attached: https://billing.example.com/inv/4411?x=1\n"
+            "> old quoted line\n\nThanks,\nBob\n\nOn Mon, 3 Mar 2025, Alice <a@example.com> wrote:\n> Earlier")
+    assert strip_email_text(body) == "Hi,\n\nThe invoice is attached: https://billing.example.com/..."
+
+
+def test_strip_email_text_skips_forward_headers():
+    body = ("FYI\n---------- Forwarded message ---------\nFrom: Carol <c@example.com>\n"
+            "Subject: Outage\n\nThe site is down.")
+    assert strip_email_text(body) == "FYI\nThe site is down."
+
+
+def test_fit_token_budget_keeps_short_text():
+    assert fit_token_budget("short text", 10) == "short text"
+    assert fit_token_budget("x" * 100, 0) == "x" * 100
+
+
+def test_fit_token_budget_cuts_at_words():
+    text = " ".join(f"word{n}" for n in range(200))
+    head = fit_token_budget(text, 20)
+    assert len(head) <= 20 * CHARS_PER_TOKEN
+    assert head.startswith("word0 word1") and head.endswith("[...]")
+    assert head[:-len(GAP.rstrip())].rstrip().split()[-1].startswith("word")
+
+    both = fit_token_budget(text, 40, tail_tokens=10)
+    assert len(both) <= 40 * CHARS_PER_TOKEN
+    assert GAP in both and both.endswith("word199")
+    assert both.split(GAP)[1].split()[0] in text.split()
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+import async_database as adb
+from routes import emails as email_routes
+from services import budget_service, lease_service
+
+
+def test_run_slot_and_leases_are_released_when_the_last_flush_fails(monkeypatch):
+    async def write(fn, *rows):
+        raise RuntimeError("disk I/O error")
+
+    released = []
+
+    async def release(owner):
+        released.append(owner)
+
+    monkeypatch.setattr(adb, "_write", write)
+    monkeypatch.setattr(lease_service, "release", release)
+    run = budget_service.start("lead@example.com", 10)
+
+    async def finish():
+        writer = adb.BufferedWriter(max_rows=10, max_delay=60)
+        await writer.record_step("m1", "classified")
+        await email_routes.finish_run(run, "owner-1", writer, None, [], None)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(finish())
+    assert released == ["owner-1"]
+    assert run not in budget_service._running
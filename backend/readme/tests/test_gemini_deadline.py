@@ -0,0 +1,35 @@
+import threading
+from concurrent.futures import TimeoutError as DeadlineExceeded
+
+import pytest
+
+from services import classifier_service
+
+
+class HangingModel:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.started += 1
+        self.release.wait()
+
+
+def test_queued_call_is_cancelled_at_deadline(monkeypatch):
+    monkeypatch.setattr(classifier_service.settings, "GEMINI_CALL_DEADLINE_SECONDS", 0.05)
+    model = HangingModel()
+    workers = classifier_service._gemini_pool._max_workers
+    try:
+        # Hung calls occupy every worker; one more waits in the queue and times out there
+        for _ in range(workers + 1):
+            with pytest.raises(DeadlineExceeded):
+                classifier_service.generate_with_deadline(model, "prompt")
+    finally:
+        model.release.set()
+    classifier_service._gemini_pool.submit(lambda: None).result(timeout=5)
+    assert model.started == workers
+
+
+def test_pool_is_sized_from_settings():
+    assert classifier_service._gemini_pool._max_workers == max(1, classifier_service.settings.GEMINI_MAX_CONCURRENCY)
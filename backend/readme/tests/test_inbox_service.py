@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from services import gmail_service, inbox_service
+
+
+def test_open_raises_when_first_list_call_fails(monkeypatch):
+    def expired(token_data, max_results, page_token):
+        raise RuntimeError("invalid_grant: Token has been expired or revoked")
+
+    monkeypatch.setattr(gmail_service, "list_unread_page", expired)
+
+    async def open_stream():
+        stream = inbox_service.InboxStream({}, 10)
+        try:
+            await stream.open()
+        finally:
+            await stream.close()
+
+    with pytest.raises(RuntimeError, match="invalid_grant"):
+        asyncio.run(open_stream())
+
+
+def test_empty_inbox_opens_with_zero_estimate(monkeypatch):
+    monkeypatch.setattr(gmail_service, "list_unread_page", lambda token_data, max_results, page_token: ([], None, 0))
+
+    async def open_stream():
+        stream = inbox_service.InboxStream({}, 10)
+        try:
+            return await stream.open(), await stream.take(5)
+        finally:
+            await stream.close()
+
+    assert asyncio.run(open_stream()) == (0, [])
+
+
+def test_ranked_take_chooses_from_every_prefetched_page(monkeypatch):
+    monkeypatch.setattr(inbox_service.settings, "INBOX_PAGE_SIZE", 2)
+    monkeypatch.setattr(inbox_service.settings, "INBOX_PREFETCH_PAGES", 2)
+    ids = ["m1", "m2", "m3", "m4", "m5"]
+    monkeypatch.setattr(gmail_service, "list_unread_page", lambda token_data, max_results, page_token: (ids, None, 5))
+    monkeypatch.setattr(gmail_service, "fetch_emails", lambda token_data, page, skip_body=None: [
+        {"id": i, "subject": "Site down" if i == "m4" else "Newsletter"} for i in page])
+
+    async def take_chunks():
+        stream = inbox_service.InboxStream({}, 5)
+        try:
+            await stream.open()
+            # Let the prefetch window fill
+            while not stream._pages.full():
+                await asyncio.sleep(0.01)
+            rank = lambda e: 5 if "down" in e["subject"] else 0
+            return [[e["id"] for e in await stream.take(2, rank)] for _ in range(3)]
+        finally:
+            await stream.close()
+
+    # m4 is on the second page but goes out with the first chunk; ties keep Gmail's order
+    assert asyncio.run(take_chunks()) == [["m1", "m4"], ["m2", "m3"], ["m5"]]
@@ -0,0 +1,28 @@
+from utils.json_repair import extract_json_object
+
+
+def test_fenced_reply_with_prose():
+    text = 'Here you go:\n```json\n{"departments": ["d1"], "confidence": 0.8}\n```\nHope that helps.'
+    assert extract_json_object(text) == {"departments": ["d1"], "confidence": 0.8}
+
+
+def test_trailing_commas_are_dropped():
+    assert extract_json_object('{"departments": ["d1", "d2",], "confidence": 0.7,}') == \
+        {"departments": ["d1", "d2"], "confidence": 0.7}
+
+
+def test_truncated_reply_keeps_complete_members():
+    assert extract_json_object('{"departments": ["d2"], "confidence": 0.9, "reason": "Mentions inv') == \
+        {"departments": ["d2"], "confidence": 0.9, "reason": "Mentions inv"}
+    assert extract_json_object('{"departments": ["d2"], "confidence": 0.') == {"departments": ["d2"]}
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    assert extract_json_object('{"reason": "see {ticket}", "confidence": 0.5} trailing }') == \
+        {"reason": "see {ticket}", "confidence": 0.5}
+
+
+def test_no_object():
+    assert extract_json_object("") is None
+    assert extract_json_object("I could not classify this email.") is None
+    assert extract_json_object('["d1"]') is None
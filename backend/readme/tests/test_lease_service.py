@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from services import lease_service
+
+
+def emails(*ids):
+    return [{"id": email_id} for email_id in ids]
+
+
+def test_second_worker_skips_emails_leased_by_the_first(database):
+    first, second = lease_service.new_owner(), lease_service.new_owner()
+
+    assert asyncio.run(lease_service.claim(emails("m1", "m2"), first)) == emails("m1", "m2")
+    assert asyncio.run(lease_service.claim(emails("m1", "m2", "m3"), second)) == emails("m3")
+
+    # Deferred emails go back to the pool once the first run releases them
+    asyncio.run(lease_service.release(first))
+    assert asyncio.run(lease_service.claim(emails("m1", "m2"), second)) == emails("m1", "m2")
+
+
+def test_expired_lease_can_be_taken_over(database):
+    database.claim_emails(["m1"], "crashed-worker", -1)
+    owner = lease_service.new_owner()
+    assert asyncio.run(lease_service.claim(emails("m1"), owner)) == emails("m1")
+
+
+def test_keep_alive_extends_leases_after_a_third_of_the_lease(database, monkeypatch):
+    owner = lease_service.new_owner()
+    asyncio.run(lease_service.claim(emails("m1"), owner))
+    with database.get_db() as conn:
+        expires_at = conn.execute("SELECT expires_at FROM email_claims").fetchone()[0]
+
+    asyncio.run(lease_service.keep_alive(owner))
+    with database.get_db() as conn:
+        assert conn.execute("SELECT expires_at FROM email_claims").fetchone()[0] == expires_at
+
+    monkeypatch.setitem(lease_service._renewed_at, owner,
+                        time.monotonic() - lease_service.settings.EMAIL_CLAIM_LEASE_SECONDS)
+    asyncio.run(lease_service.keep_alive(owner))
+    with database.get_db() as conn:
+        assert conn.execute("SELECT expires_at FROM email_claims").fetchone()[0] > expires_at
+    asyncio.run(lease_service.release(owner))
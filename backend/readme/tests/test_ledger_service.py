@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import async_database as adb
+from services import ledger_service
+
+
+def classify(database, email_id, categories):
+    database.save_classification(email_id, "bob@example.com", "Subject", "Body", json.dumps(categories),
+                                 0.9, json.dumps(["team@company.com"]), "auto_replied", source="sender_rule")
+
+
+def test_resume_skips_finished_emails_and_resumes_partial_ones(database):
+    classify(database, "done", ["Sales"])
+    classify(database, "partial", ["Support"])
+    for step in ledger_service.PIPELINE_STEPS:
+        database.record_step("done", step)
+    database.record_step("partial", ledger_service.STEP_CLASSIFIED)
+
+    remaining = asyncio.run(ledger_service.resume([{"id": "done"}, {"id": "partial"}, {"id": "new"}]))
+
+    assert [e["id"] for e in remaining] == ["partial", "new"]
+    partial, new = remaining
+    assert not ledger_service.needs(partial, ledger_service.STEP_CLASSIFIED)
+    assert ledger_service.needs(partial, ledger_service.STEP_REPLIED)
+    assert partial["prior_classification"]["categories"] == ["Support"]
+    assert partial["prior_classification"]["source"] == "sender_rule"
+    assert ledger_service.needs(new, ledger_service.STEP_CLASSIFIED)
+
+
+def test_classified_step_without_a_saved_decision_classifies_again(database):
+    database.record_step("orphan", ledger_service.STEP_CLASSIFIED)
+
+    [email_data] = asyncio.run(ledger_service.resume([{"id": "orphan"}]))
+
+    assert ledger_service.needs(email_data, ledger_service.STEP_CLASSIFIED)
+    assert "prior_classification" not in email_data
+
+
+def test_record_through_the_run_writer_lands_on_flush(database):
+    email_data = {"id": "m1"}
+
+    async def run():
+        writer = adb.BufferedWriter()
+        await ledger_service.record(email_data, ledger_service.STEP_REPLIED, writer)
+        assert database.get_pipeline_progress(["m1"]) == {}
+        await writer.close()
+
+    asyncio.run(run())
+    assert not ledger_service.needs(email_data, ledger_service.STEP_REPLIED)
+    assert database.get_pipeline_progress(["m1"])["m1"]["steps"] == [ledger_service.STEP_REPLIED]
@@ -0,0 +1,40 @@
+from services import routing_service
+from utils.near_duplicates import cluster_by_simhash, hamming_distance, simhash
+
+ALERT = ("Disk usage on db-01 is above 90 percent. The nightly backup job could not finish "
+         "and will retry in one hour. Please check the volume and free some space.")
+
+
+def test_near_identical_bodies_cluster():
+    # Digits-only tokens (counters, ids) are ignored
+    a = simhash(f"Alert 10421 at 0312\n\n{ALERT}", min_shingles=8)
+    b = simhash(f"Alert 10562 at 1740\n\n{ALERT}", min_shingles=8)
+    assert a and hamming_distance(a, b) <= 3
+    assert cluster_by_simhash({"a": a, "b": b}) == {"b": "a"}
+
+
+def test_short_generic_bodies_are_not_fingerprinted():
+    assert simhash("Please see attached.", min_shingles=8) == 0
+    assert cluster_by_simhash({"a": 0, "b": 0}) == {}
+
+
+def test_different_bodies_do_not_cluster():
+    other = ("Could you send the signed contract and the pricing proposal for the enterprise plan "
+             "before Friday so legal can review the partnership terms.")
+    assert cluster_by_simhash({"a": simhash(ALERT), "b": simhash(other)}) == {}
+
+
+def test_short_generic_bodies_with_different_subjects_are_not_merged():
+    emails = [
+        {"id": "a", "subject": "Invoice 4411 overdue", "body": "Please see attached."},
+        {"id": "b", "subject": "Job application: backend engineer", "body": "Please see attached."},
+    ]
+    assert routing_service.cluster_batch(emails) == 0
+    assert not any("cluster_of" in e for e in emails)
+    assert routing_service.cluster_decision(emails[1], {"a": {"categories": ["Finance"]}}) is None
+
+
+def test_wide_distance_compares_every_representative():
+    fingerprints = {"a": 0b1111, "b": 0b1111 ^ (0b11111 << 20), "c": 0b1111 ^ (1 << 40)}
+    assert cluster_by_simhash(fingerprints, max_distance=5) == {"b": "a", "c": "a"}
+    assert cluster_by_simhash(fingerprints, max_distance=1) == {"c": "a"}
@@ -0,0 +1,34 @@
+import asyncio
+
+from services import gmail_service, outbox_service
+
+
+def queue_reply(database):
+    database.save_run_rows([], [], [], [("m1", outbox_service.KIND_REPLY, "lead@example.com", "bob@example.com", "cmF3")])
+
+
+def test_send_that_never_finishes_is_dead_lettered(database):
+    queue_reply(database)
+    # Each claim's lease has already expired by the next one, as if the sender hung or crashed
+    claims = [database.claim_outbox(10, 0, 3) for _ in range(4)]
+    assert [[row['attempts'] for row in rows] for rows in claims] == [[0], [1], [2], []]
+    stats = database.get_outbox_stats()
+    assert stats["counts"] == {"dead": 1}
+    assert stats["dead_letters"][0]["attempts"] == 3
+
+
+def test_send_round_records_failures_and_successes(database, monkeypatch):
+    queue_reply(database)
+    monkeypatch.setattr(gmail_service, "load_token_data", lambda user_email: {"token": "t"})
+    outcomes = [["503 Backend Error"], [None]]
+    monkeypatch.setattr(gmail_service, "send_batch", lambda token_data, messages: outcomes.pop(0))
+
+    assert asyncio.run(outbox_service.send_round()) == 1
+    stats = database.get_outbox_stats()
+    assert stats["counts"] == {"pending": 1}
+
+    with database.get_db() as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0")
+        conn.commit()
+    assert asyncio.run(outbox_service.send_round()) == 1
+    assert database.get_outbox_stats()["counts"] == {"sent": 1}
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+from services import classifier_service, prefilter_service, routing_service
+
+
+@pytest.mark.parametrize("email_data, rule", [
+    ({"headers": {"auto-submitted": "auto-replied"}}, "auto-submitted"),
+    ({"headers": {"x-autoreply": "yes"}}, "autoreply-header"),
+    ({"headers": {"return-path": "<>"}}, "bounce"),
+    ({"headers": {"precedence": "Bulk"}}, "bulk-precedence"),
+    ({"headers": {"list-unsubscribe": "<mailto:u@lists.example.com>"}}, "mailing-list"),
+    ({"sender": "Shop <no-reply@shop.example.com>"}, "noreply-sender"),
+    ({"labels": ["INBOX", "CATEGORY_PROMOTIONS"]}, "gmail-category"),
+])
+def test_automated_mail_is_matched(email_data, rule):
+    email_data.setdefault("sender", "news@example.com")
+    assert prefilter_service.match(email_data)
+    assert email_data["prefilter"] == rule
+
+
+def test_mail_from_a_person_is_not_matched():
+    email_data = {"sender": "Bob <bob@example.com>", "labels": ["INBOX"],
+                  "headers": {"auto-submitted": "no", "precedence": "normal"}}
+    assert not prefilter_service.match(email_data)
+    assert "prefilter" not in email_data
+
+
+def test_prefiltered_mail_uses_the_sender_rule_or_nothing_and_never_the_llm(monkeypatch):
+    async def no_llm(subject, content):
+        raise AssertionError("pre-filtered mail reached the LLM")
+
+    async def rule(email_data):
+        if email_data["sender"] == "billing@vendor.example.com":
+            return {"categories": ["Finance"], "confidence": 0.95, "recipients": ["fay@example.com"],
+                    "reasoning": "Sender rule", "source": "sender_rule"}
+        return None
+
+    monkeypatch.setattr(classifier_service, "classify_email_async", no_llm)
+    monkeypatch.setattr(routing_service, "sender_decision", rule)
+    emails = [
+        {"id": "m1", "sender": "billing@vendor.example.com", "subject": "Invoice", "body": "", "prefilter": "bulk-precedence"},
+        {"id": "m2", "sender": "news@example.com", "subject": "Sale", "body": "", "prefilter": "mailing-list"},
+    ]
+    routed, unrouted = [asyncio.run(routing_service.route_email(e, {})) for e in emails]
+
+    assert routed["source"] == unrouted["source"] == prefilter_service.SOURCE
+    assert routed["recipients"] == ["fay@example.com"]
+    assert unrouted["recipients"] == []
+    assert not prefilter_service.should_archive(routed)
+    monkeypatch.setattr(prefilter_service.settings, "PREFILTER_ARCHIVE", True)
+    assert prefilter_service.should_archive(unrouted)
+    assert not prefilter_service.should_archive(routed)
+
+
+def test_automated_message_in_a_thread_does_not_route_the_reply(database):
+    database.save_classification("person", "bob@example.com", "Ticket 77", "", json.dumps(["Support"]),
+                                 0.95, json.dumps(["sam@example.com"]), "forwarded", thread_id="t1")
+    # The ticket system's acknowledgement is the newest message in the thread
+    database.save_classification("auto", "no-reply@tickets.example.com", "Re: Ticket 77", "", "[]", 1.0, "[]",
+                                 "read", thread_id="t1", source=prefilter_service.SOURCE)
+
+    reply = {"id": "reply", "thread_id": "t1", "sender": "bob@example.com"}
+    decision = asyncio.run(routing_service.thread_decision(reply))
+    assert decision["categories"] == ["Support"]
+    assert decision["recipients"] == ["sam@example.com"]
@@ -0,0 +1,12 @@
+from collections import Counter, deque
+
+from services import profiling_service
+
+
+def test_list_profiles_is_a_copy_oldest_first(monkeypatch):
+    kept = deque([{"id": 1, "stacks": Counter({"a;b": 2})}, {"id": 2, "stacks": Counter({"a;c": 1})}])
+    monkeypatch.setattr(profiling_service, "_profiles", kept)
+    profiles = profiling_service.list_profiles()
+    assert [p["id"] for p in profiles] == [1, 2]
+    profiles.clear()
+    assert len(kept) == 2
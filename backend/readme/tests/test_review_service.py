@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import async_database as adb
+from services import gmail_service, review_service, sender_rules_service
+
+
+def queue_reviews(database, monkeypatch):
+    monkeypatch.setattr(sender_rules_service, "_routes", {})
+    monkeypatch.setattr(sender_rules_service, "_loaded_at", 0.0)
+    database.add_team_member("Fay", "fay@example.com", "Finance")
+    database.add_to_review_queue("m1", "Bob <bob@acme.io>", "Invoice", "Please pay\nby Friday", "Low confidence: 0.4")
+    database.add_to_review_queue("m2", "ann@globex.com", "Refund", "Where is it?", "Low confidence: 0.3")
+    database.add_to_review_queue("m3", "spam@junk.biz", "Win", "Prize", "Low confidence: 0.2")
+    return {r['email_id']: r['id'] for r in database.get_pending_reviews()}
+
+
+def test_bulk_review_forwards_dismisses_and_learns(database, monkeypatch):
+    ids = queue_reviews(database, monkeypatch)
+    sent = []
+
+    def send_batch(token_data, messages):
+        sent.extend(messages)
+        return [None, "400 Invalid To header"]
+
+    monkeypatch.setattr(gmail_service, "send_batch", send_batch)
+    results = asyncio.run(review_service.apply_decisions({}, [
+        {"review_id": ids["m1"], "departments": ["Finance"]},
+        {"review_id": ids["m2"], "recipients": ["not-an-address"]},
+        {"review_id": ids["m3"], "dismiss": True},
+        {"review_id": ids["m3"], "dismiss": True},
+    ]))
+
+    assert [r["status"] for r in results] == ["forwarded", "error", "dismissed", "error"]
+    assert len(sent) == 2
+    assert [r["email_id"] for r in database.get_pending_reviews()] == ["m2"]
+    assert set(database.get_pipeline_progress(["m1", "m2"])) == {"m1"}
+    assert database.get_pipeline_progress(["m1"])["m1"]["steps"] == ["forwarded"]
+    routes = {(r["route_key"], r["department"]): r["hits"] for r in database.get_sender_routes()}
+    assert routes == {("bob@acme.io", "Finance"): 3.0, ("@acme.io", "Finance"): 3.0}
+    assert sender_rules_service._routes["@acme.io"] == {"Finance": 3.0}
+
+    # Retried request: already reviewed items are never forwarded twice
+    again = asyncio.run(review_service.apply_decisions({}, [{"review_id": ids["m1"], "departments": ["Finance"]}]))
+    assert again[0]["status"] == "skipped" and len(sent) == 2
+
+
+def test_failed_commit_leaves_sender_rules_untouched(database, monkeypatch):
+    ids = queue_reviews(database, monkeypatch)
+    monkeypatch.setattr(gmail_service, "send_batch", lambda token_data, messages: [None] * len(messages))
+
+    async def failing_commit(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(adb, "complete_reviews", failing_commit)
+    with pytest.raises(RuntimeError):
+        asyncio.run(review_service.apply_decisions({}, [{"review_id": ids["m1"], "departments": ["Finance"]}]))
+    assert sender_rules_service._routes == {}
+    assert database.get_sender_routes() == []
@@ -0,0 +1,34 @@
+def review_inflow(database):
+    with database.get_db() as conn:
+        row = conn.execute("SELECT reviews FROM trend_rollups WHERE granularity = 'day' AND department = ?",
+                           (database.ROLLUP_ALL,)).fetchone()
+    return row['reviews'] if row else 0
+
+
+def test_requeued_reviewed_item_counts_once(database):
+    database.add_to_review_queue("m1", "bob@example.com", "Invoice", "Please pay", "Low confidence: 0.4")
+    review_id = database.get_pending_reviews()[0]['id']
+    database.mark_review_completed(review_id)
+    # Reprocessed and queued again: INSERT OR REPLACE over the reviewed row
+    database.add_to_review_queue("m1", "bob@example.com", "Invoice", "Please pay", "Low confidence: 0.5")
+    assert review_inflow(database) == 1
+
+
+def test_purged_reviewed_items_still_count_as_inflow(database):
+    database.add_to_review_queue("m1", "bob@example.com", "Invoice", "Please pay", "Low confidence: 0.4")
+    database.add_to_review_queue("m2", "ann@example.com", "Refund", "Where is it?", "Low confidence: 0.3")
+    database.mark_review_completed(database.get_pending_reviews()[0]['id'])
+    assert database.purge_reviewed("9999-12-31", 100) == 1
+    assert len(database.get_pending_reviews()) == 1
+    assert review_inflow(database) == 2
+
+
+def test_replaced_classification_moves_its_contribution(database):
+    for confidence in (0.4, 0.9):
+        database.save_classification("m1", "bob@example.com", "Invoice", "Please pay", '["Finance"]',
+                                     confidence, '["fay@example.com"]')
+    with database.get_db() as conn:
+        rows = {row['department']: (row['emails'], row['confidence_sum']) for row in conn.execute(
+            "SELECT department, emails, confidence_sum FROM trend_rollups WHERE granularity = 'day'")}
+    assert rows["Finance"] == (1, 0.9)
+    assert rows[database.ROLLUP_ALL] == (1, 0.9)
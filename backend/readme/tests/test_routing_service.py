@@ -0,0 +1,36 @@
+import asyncio
+
+import async_database as adb
+from services import classifier_service, routing_service
+
+
+def test_reply_inherits_decision_made_earlier_in_the_same_batch(monkeypatch):
+    calls = []
+
+    async def classify(subject, content):
+        calls.append(subject)
+        return {"categories": ["Finance"], "confidence": 0.9, "recipients": ["fay@example.com"],
+                "reasoning": "Invoice", "source": "llm"}
+
+    async def nothing_saved(thread_id, exclude_email_id=None):
+        # The run's writer has not flushed yet
+        return []
+
+    async def no_rule(email_data):
+        return None
+
+    monkeypatch.setattr(classifier_service, "classify_email_async", classify)
+    monkeypatch.setattr(adb, "get_thread_classifications", nothing_saved)
+    monkeypatch.setattr(routing_service, "sender_decision", no_rule)
+    emails = [
+        {"id": "m1", "thread_id": "t1", "sender": "Bob <bob@example.com>", "subject": "Invoice 4411", "body": "Please pay"},
+        {"id": "m2", "thread_id": "t1", "sender": "bob@example.com", "subject": "Re: Invoice 4411", "body": "Any update?"},
+    ]
+
+    async def route():
+        return [(e["id"], d) async for e, d in routing_service.route_batch(emails, {}, concurrency=4)]
+
+    decisions = dict(asyncio.run(route()))
+    assert calls == ["Invoice 4411"]
+    assert decisions["m2"]["source"] == "thread"
+    assert decisions["m2"]["categories"] == ["Finance"]
@@ -0,0 +1,25 @@
+from services import scheduler_service
+from services.scheduler_service import urgent_pattern
+
+
+def test_urgent_keywords_match_whole_words():
+    pattern = urgent_pattern("urgent, outage ,down")
+    assert pattern.search("URGENT: invoice overdue")
+    assert pattern.search("Site down since 9am")
+    assert not pattern.search("Download the brochure")
+
+
+def test_no_keywords_means_no_pattern():
+    assert urgent_pattern("") is None
+    assert urgent_pattern(" , ,") is None
+
+
+def test_subjects_are_not_urgent_without_keywords(monkeypatch):
+    monkeypatch.setattr(scheduler_service, "_URGENT_RE", urgent_pattern(""))
+    email = {"sender": "bob@example.com", "subject": "Lunch on Friday?", "labels": []}
+    assert scheduler_service.score_email(email, {}, now=0) == 0
+
+
+def test_default_keywords_flag_urgent_subjects():
+    assert scheduler_service._URGENT_RE.search("Production outage in eu-west")
+    assert not scheduler_service._URGENT_RE.search("Weekly newsletter")
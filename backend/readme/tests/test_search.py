@@ -0,0 +1,59 @@
+import json
+
+ALL = ["classifications", "review_queue"]
+
+
+def classify(database, email_id, subject, content, categories=("Sales",), sender="bob@example.com"):
+    database.save_classification(email_id, sender, subject, content, json.dumps(list(categories)),
+                                 0.9, "[]", "forwarded")
+
+
+def test_subject_matches_outrank_body_matches(database):
+    classify(database, "body", "Hello", "Question about the invoice")
+    classify(database, "subject", "Invoice overdue", "Please pay")
+    database.add_to_review_queue("review", "amy@example.com", "Unclear", "Which invoice is this?", "low confidence")
+
+    found = database.search_emails("invoice", ALL)
+
+    assert found["total"] == 3 and found["total_exact"]
+    assert found["results"][0]["email_id"] == "subject"
+    assert {r["kind"] for r in found["results"]} == {"classification", "review"}
+    assert "**Invoice**" in found["results"][0]["snippet"]
+
+
+def test_department_filter_and_prefix_match(database):
+    classify(database, "sales", "Pricing request", "Enterprise plan", ["Sales"])
+    classify(database, "support", "Pricing bug", "Wrong total", ["Support"])
+    database.add_to_review_queue("review", "amy@example.com", "Pricing?", "Unsure", "low confidence")
+
+    found = database.search_emails("pric", ALL, department="Support")
+
+    assert [r["email_id"] for r in found["results"]] == ["support"]
+
+
+def test_query_operators_are_treated_as_text(database):
+    classify(database, "m1", "Refund NOT received", "Order 42")
+
+    assert database.search_emails('refund NOT "received" OR (', ALL)["total"] == 1
+    assert database.search_emails("*) NEAR(", ALL)["total"] == 0
+    assert database.search_emails("", ALL)["results"] == []
+
+
+def test_index_follows_replaced_rows(database):
+    classify(database, "m1", "Original subject", "First body")
+    classify(database, "m1", "Replacement subject", "Second body")
+
+    assert database.search_emails("original", ALL)["total"] == 0
+    assert [r["email_id"] for r in database.search_emails("replacement", ALL)["results"]] == ["m1"]
+
+
+def test_too_many_hits_come_newest_first(database, monkeypatch):
+    monkeypatch.setattr(database, "SEARCH_RANK_MAX_HITS", 2)
+    for n in range(3):
+        classify(database, f"m{n}", f"Invoice {n}", "Body")
+
+    found = database.search_emails("invoice", ["classifications"], limit=2)
+
+    assert not found["total_exact"] and found["order"] == "newest"
+    assert found["total"] == 2
+    assert [r["email_id"] for r in found["results"]] == ["m2", "m1"]
@@ -0,0 +1,39 @@
+import asyncio
+
+import async_database as adb
+from services import sender_rules_service
+
+
+def fresh_rules(monkeypatch):
+    monkeypatch.setattr(sender_rules_service, "_routes", {})
+    monkeypatch.setattr(sender_rules_service, "_loaded_at", 0.0)
+    monkeypatch.setattr(sender_rules_service.settings, "SENDER_RULE_MIN_EMAILS", 3)
+
+
+def test_backfill_learns_history_in_one_write(database, monkeypatch):
+    fresh_rules(monkeypatch)
+    for n in range(3):
+        database.save_classification(f"m{n}", f"Ops <ops{n}@acme.io>", "Invoice", "Please pay",
+                                     '["Finance"]', 0.9, '[]', source="llm")
+    database.save_classification("m9", "bob@gmail.com", "Hi", "Hello", '["Sales"]', 0.9, '[]', source="llm")
+    writes = []
+    write = adb._write
+
+    async def counting_write(fn, *args, **kwargs):
+        writes.append(fn.__name__)
+        return await write(fn, *args, **kwargs)
+
+    monkeypatch.setattr(adb, "_write", counting_write)
+    rule = asyncio.run(sender_rules_service.lookup("billing@acme.io"))
+    assert writes == ["add_sender_routes"]
+    assert rule["department"] == "Finance" and rule["key"] == "@acme.io" and rule["hits"] == 3
+    # Freemail domains only ever match the address
+    assert {row["route_key"] for row in database.get_sender_routes()} == \
+        {"ops0@acme.io", "ops1@acme.io", "ops2@acme.io", "@acme.io", "bob@gmail.com"}
+
+
+def test_inconsistent_address_does_not_fall_through_to_its_domain(database, monkeypatch):
+    fresh_rules(monkeypatch)
+    database.add_sender_routes([("@acme.io", "Finance", 5), ("ann@acme.io", "Finance", 2), ("ann@acme.io", "Sales", 2)])
+    assert asyncio.run(sender_rules_service.lookup("ann@acme.io")) is None
+    assert asyncio.run(sender_rules_service.lookup("joe@acme.io"))["department"] == "Finance"
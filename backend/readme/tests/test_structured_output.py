@@ -0,0 +1,38 @@
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_gemini import FakeGenerationConfig
+from services import classifier_service
+
+
+def test_schema_limits_departments_to_roster_ids(monkeypatch):
+    monkeypatch.setattr(classifier_service, "genai", SimpleNamespace(types=SimpleNamespace(GenerationConfig=FakeGenerationConfig)))
+    config = classifier_service.generation_config(["d1", "d2"])
+    assert config["response_mime_type"] == "application/json"
+    schema = config["response_schema"]
+    assert schema["properties"]["departments"]["items"] == {"type": "STRING", "format": "enum", "enum": ["d1", "d2"]}
+    assert set(schema["required"]) == {"departments", "confidence"}
+
+
+def test_sdk_without_structured_output_gets_no_config(monkeypatch):
+    @dataclasses.dataclass
+    class OldGenerationConfig:
+        temperature: float = None
+
+    monkeypatch.setattr(classifier_service, "genai", SimpleNamespace(types=SimpleNamespace(GenerationConfig=OldGenerationConfig)))
+    assert classifier_service.generation_config(["d1"]) is None
+
+
+def test_pinned_sdk_accepts_the_schema(monkeypatch):
+    genai = pytest.importorskip("google.generativeai")
+    if "response_schema" not in {f.name for f in dataclasses.fields(genai.types.GenerationConfig)}:
+        pytest.skip(f"installed google-generativeai {genai.__version__} is older than requirements.txt")
+    monkeypatch.setattr(classifier_service, "genai", genai)
+    config = classifier_service.generation_config(["d1", "d2"])
+    # Builds the request proto locally; nothing is sent
+    request = genai.GenerativeModel("gemini-2.5-flash-lite")._prepare_request(
+        contents="Classify this", generation_config=config, tools=None, tool_config=None)
+    assert request.generation_config.response_mime_type == "application/json"
+    assert list(request.generation_config.response_schema.properties["departments"].items.enum) == ["d1", "d2"]
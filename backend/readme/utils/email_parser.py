@@ -1,5 +1,7 @@
+import math
 import re
 from html import unescape
+from typing import Optional
 
 def clean_email_content(content: str) -> str:
     """Clean and normalize email content"""
@@ -23,4 +25,121 @@ def truncate_content(content: str, max_length: int = 1000) -> str:
     """Truncate content for classification"""
     if len(content) <= max_length:
         return content
-    return content[:max_length] + "..."
\ No newline at end of file
+    return content[:max_length] + "..."
+
+# ========== CONTENT PREPARATION ==========
+
+# Gemini averages about 4 characters per token on English mail
+CHARS_PER_TOKEN = 4
+# Marks where fit_token_budget() cut text out
+GAP = " [...] "
+
+_HTML_RE = re.compile(r'<(?:html|body|div|p|br|table|span|blockquote)\b', re.I)
+_HTML_DROP_RE = re.compile(r'<(style|script|head|title)\b.*?</\1\s*>', re.I | re.S)
+# Quoted history in HTML mail (Gmail, Outlook, Apple Mail) runs to the end of the body
+_HTML_QUOTE_RE = re.compile(r'<(?:div|blockquote)\b[^>]*(?:gmail_quote|divRplyFwdMsg|type="?cite)[^>]*>.*', re.I | re.S)
+_HTML_BREAK_RE = re.compile(r'<(?:br|/p|/div|/tr|/li|/h\d|/?blockquote)\b[^>]*>', re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLANK_LINES_RE = re.compile(r'\n[ \t]*(?:\n[ \t]*){2,}')
+
+# A line from which everything is quoted history or signature
+_CUT_RE = re.compile(
+    r'(?:-{2,}\s*Original Message\s*-{2,}'                  # Outlook reply
+    r'|_{10,}\s*$'                                          # Outlook's separator line
+    r'|--\s*$'                                               # RFC 3676 signature delimiter
+    r'|(?:Sent from my \w+|Sent from Mail for Windows|Get Outlook for \w+).{0,80}$)',  # mobile footers
+    re.I)
+# A forwarded message is usually what the email is about, so only its header block is skipped
+_FORWARD_RE = re.compile(r'-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:', re.I)
+_HEADER_LINE_RE = re.compile(r'\*?(?:From|Date|Sent|To|Cc|Subject):', re.I)
+# "On <date>, <name> wrote:", possibly wrapped onto a second line
+_REPLY_HEADER_RE = re.compile(r'On\s.{0,200}\s(?:wrote|writes):\s*$', re.I)
+# Outlook quotes start with a From: line followed by Sent: or Date:
+_OUTLOOK_FROM_RE = re.compile(r'\*?From:\*?\s', re.I)
+_OUTLOOK_SENT_RE = re.compile(r'\*?(?:Sent|Date):\*?\s', re.I)
+# Sign-offs close the message; what follows within a few lines is a signature
+_SIGNOFF_RE = re.compile(r'(?:(?:best|kind|warm|many)\s+)?(?:regards|thanks|thank you|cheers|sincerely|best wishes|best)\s*[,.!]?\s*$', re.I)
+SIGNOFF_MAX_TRAILING_LINES = 5
+_URL_RE = re.compile(r'(https?://[^/\s]+)/\S*')
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count, for when the API doesn't report one"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def html_to_text(html: str, keep_quotes: bool = False) -> str:
+    """Readable text of an HTML body, without styles or scripts (or quoted history, unless `keep_quotes`)"""
+    html = _HTML_DROP_RE.sub('', html)
+    if not keep_quotes:
+        html = _HTML_QUOTE_RE.sub('', html)
+    return unescape(_TAG_RE.sub('', _HTML_BREAK_RE.sub('\n', html)))
+
+def readable_text(content: str) -> str:
+    """A stored body as a person should read it: all of it, line breaks intact, HTML reduced to text"""
+    if _HTML_RE.search(content):
+        content = html_to_text(content, keep_quotes=True)
+    return _BLANK_LINES_RE.sub('\n\n', content).strip()
+
+def strip_email_text(content: str, max_chars: Optional[int] = None) -> str:
+    """The part of an email its sender wrote: markup, quoted history and signature removed.
+    
+    One pass over the lines with precompiled patterns: the first line that
+    starts quoted history or a signature ends the text, `>`-quoted lines are
+    skipped, and link paths and runs of whitespace are shortened on the way.
+    With `max_chars`, the pass stops once that much text is kept.
+    """
+    if _HTML_RE.search(content):
+        content = html_to_text(content)
+    
+    lines = content.splitlines()
+    kept = []
+    length = 0
+    forward_header = False
+    for n, line in enumerate(lines):
+        if max_chars is not None and length > max_chars:
+            break
+        stripped = line.strip()
+        if forward_header:
+            if not stripped or _HEADER_LINE_RE.match(stripped):
+                continue
+            forward_header = False
+        if stripped.startswith('>'):
+            continue
+        if _FORWARD_RE.match(stripped):
+            forward_header = True
+            continue
+        if _CUT_RE.match(stripped):
+            break
+        if stripped[:3].lower() == 'on ':
+            wrapped = stripped if n + 1 == len(lines) else f"{stripped} {lines[n + 1].strip()}"
+            if _REPLY_HEADER_RE.match(stripped) or _REPLY_HEADER_RE.match(wrapped):
+                break
+        if _OUTLOOK_FROM_RE.match(stripped) and n + 1 < len(lines) and _OUTLOOK_SENT_RE.match(lines[n + 1].strip()):
+            break
+        if kept and _SIGNOFF_RE.match(stripped) and len(lines) - n - 1 <= SIGNOFF_MAX_TRAILING_LINES:
+            break
+        if '://' in stripped:
+            stripped = _URL_RE.sub(r'\1/...', stripped)
+        # Collapsing whitespace only where there is some to collapse keeps long lines cheap
+        if '  ' in stripped or '\t' in stripped or '\xa0' in stripped:
+            stripped = ' '.join(stripped.split())
+        # At most one blank line in a row
+        if stripped or (kept and kept[-1]):
+            kept.append(stripped)
+            length += len(stripped) + 1
+    return '\n'.join(kept).strip()
+
+def fit_token_budget(text: str, max_tokens: int, tail_tokens: int = 0) -> str:
+    """At most `max_tokens` of `text`: its start, plus up to `tail_tokens` of its end, cut at word boundaries"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    tail_chars = min(tail_tokens, max_tokens // 2) * CHARS_PER_TOKEN
+    head_chars = max_tokens * CHARS_PER_TOKEN - tail_chars - len(GAP)
+    
+    head = text[:head_chars]
+    space = head.rfind(' ', head_chars * 4 // 5)
+    head = head[:space] if space > 0 else head
+    if not tail_chars:
+        return head.rstrip() + GAP.rstrip()
+    tail = text[-tail_chars:]
+    space = tail.find(' ', 0, tail_chars // 5)
+    return head.rstrip() + GAP + (tail[space + 1:] if space >= 0 else tail).lstrip()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+import re
+from typing import List, Optional, Tuple
+
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+_CLOSERS = {'{': '}', '[': ']'}
+# How many trailing members to give up on when closing a truncated reply
+MAX_REPAIR_CUTS = 20
+
+def _scan(text: str, start: int = 0) -> Tuple[Optional[int], List[str], bool]:
+    """Walk a JSON value from `start`: (end index or None if unterminated, open brackets, inside a string)"""
+    stack = []
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+        elif ch in '}]':
+            if stack and _CLOSERS[stack[-1]] == ch:
+                stack.pop()
+            if not stack:
+                return i + 1, [], False
+    return None, stack, in_string
+
+def _loads_object(candidate: str) -> Optional[dict]:
+    for attempt in (candidate, _TRAILING_COMMA_RE.sub(r'\1', candidate)):
+        try:
+            value = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+def _close(fragment: str) -> str:
+    _, stack, in_string = _scan(fragment)
+    if in_string:
+        fragment += '"'
+    return fragment + ''.join(_CLOSERS[opener] for opener in reversed(stack))
+
+def _repair_truncated(fragment: str) -> Optional[dict]:
+    """Close a reply that was cut off mid-object, dropping the half-written member if needed"""
+    cuts = [len(fragment)] + [i for i in range(len(fragment) - 1, 0, -1) if fragment[i] == ','][:MAX_REPAIR_CUTS]
+    for cut in cuts:
+        repaired = _loads_object(_close(fragment[:cut].rstrip()))
+        if repaired is not None:
+            return repaired
+    return None
+
+def extract_json_object(text: str) -> Optional[dict]:
+    """Return the first JSON object in a model reply, repairing common damage.
+
+    Tolerates markdown fences and prose around the object, trailing commas
+    and replies truncated mid-object. Returns None if nothing usable is found.
+    """
+    if not text:
+        return None
+    start = text.find('{')
+    if start < 0:
+        return None
+
+    end, _, _ = _scan(text, start)
+    if end is not None:
+        return _loads_object(text[start:end])
+    return _repair_truncated(text[start:])
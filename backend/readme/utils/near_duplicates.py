@@ -0,0 +1,84 @@
+import re
+import hashlib
+from typing import Dict, List
+from utils.email_parser import clean_email_content
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+# Digits-only tokens (timestamps, counters, ids) differ between otherwise identical alerts
+_NUMERIC_RE = re.compile(r'^\d+$')
+
+def _tokens(content: str) -> List[str]:
+    text = clean_email_content(content).lower()
+    return [t for t in _TOKEN_RE.findall(text) if not _NUMERIC_RE.match(t)]
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def simhash(content: str, min_shingles: int = 0) -> int:
+    """64-bit SimHash of word shingles from the cleaned email body.
+
+    Returns 0 (never clustered) for bodies with fewer than `min_shingles`
+    shingles: short generic text says nothing about what an email is about.
+    """
+    tokens = _tokens(content)
+    if not tokens or len(tokens) - SHINGLE_SIZE + 1 < min_shingles:
+        return 0
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = [' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+def cluster_by_simhash(fingerprints: Dict[str, int], max_distance: int = 3) -> Dict[str, str]:
+    """Map each near-duplicate to the first id (in input order) of its cluster.
+
+    Fingerprints are split into BANDS bands; two fingerprints within
+    `max_distance` < BANDS bits share at least one identical band, so only ids
+    colliding in some band are compared (larger distances compare against every
+    representative). Representatives are not in the result.
+    """
+    mask = (1 << BAND_BITS) - 1
+    banded = max_distance < BANDS
+    buckets: Dict[tuple, List[str]] = {}
+    representatives: List[str] = []
+    representative_of: Dict[str, str] = {}
+
+    for email_id, fingerprint in fingerprints.items():
+        if fingerprint == 0:
+            continue
+        bands = [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+        if banded:
+            candidates = (c for key in bands for c in buckets.get(key, ()))
+        else:
+            candidates = iter(representatives)
+        match = next((c for c in candidates
+                      if hamming_distance(fingerprint, fingerprints[c]) <= max_distance), None)
+
+        if match:
+            representative_of[email_id] = match
+        else:
+            representatives.append(email_id)
+            for key in bands:
+                buckets.setdefault(key, []).append(email_id)
+
+    return representative_of
@@ -90,6 +90,11 @@ export default function ProcessingModal({ isOpen, onClose, userEmail, maxResults
           setCurrentStep(`✅ Auto-reply sent`);
           break;
 
+        case 'reply_queued':
+          setCurrentStep(`📮 Auto-reply queued for sending`);
+          setProgress(75 + (emailsProcessed / totalEmails) * 20); // 75-95%
+          break;
+
         case 'email_complete':
           setEmailsProcessed(data.current);
           setProgress(25 + (data.current / data.total) * 70); // Update overall progress
@@ -100,7 +105,10 @@ export default function ProcessingModal({ isOpen, onClose, userEmail, maxResults
 
         case 'complete':
           setStatus('complete');
-          setCurrentStep(`🎉 Successfully processed ${data.processed} email${data.processed !== 1 ? 's' : ''}!`);
+          // A run stopped by its time budget says how many emails are left for the next one
+          setCurrentStep(data.continuation
+            ? `⏳ ${data.message}`
+            : `🎉 Successfully processed ${data.processed} email${data.processed !== 1 ? 's' : ''}!`);
           setProgress(100);
           eventSource.close();
 